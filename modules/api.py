@@ -0,0 +1,267 @@
+import argparse
+import hmac
+import json
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from .checkout import CheckoutError, LayananCheckout
+from .journal import JurnalCheckout, PemutarJurnal
+from .schema import DB_PATH, init_schema, open_connection
+
+# API checkout HTTP/JSON lokal untuk scanner genggam dan kiosk self-checkout:
+#   python -m modules.api --port 8600
+#
+#   GET    /status
+#   GET    /produk?barcode=...            atau ?id=...
+#   POST   /keranjang                     -> {"cart_id": ...}
+#   GET    /keranjang/<cart_id>           total = harga setelah promosi (?member=1 atau ?customer_id=...)
+#   DELETE /keranjang/<cart_id>           batalkan dan lepas reservasi
+#   POST   /keranjang/<cart_id>/item      {"product_id"|"barcode", "jumlah"}
+#   PUT    /keranjang/<cart_id>/item/<product_id>    {"jumlah"}
+#   DELETE /keranjang/<cart_id>/item/<product_id>
+#   POST   /keranjang/<cart_id>/checkout  {"metode_pembayaran", "jumlah_pembayaran", "cashier_id", "nama_pelanggan", "member", "customer_id"}
+#   POST   /checkout                      {"items": [{"product_id"|"barcode", "jumlah"}], ...pembayaran}
+#
+# Bila POS_API_KEY diset, setiap request wajib membawa header X-API-Key.
+
+API_KEY = os.environ.get("POS_API_KEY")
+JURNAL_API = os.environ.get("POS_API_JOURNAL_PATH", "data/journal/api-checkout.jsonl")
+
+class KoneksiPerThread:
+    """Satu koneksi SQLite per thread handler; SQLite sendiri yang menyerialkan penulisan"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lokal = threading.local()
+
+    def _koneksi(self):
+        conn = getattr(self._lokal, "conn", None)
+        if conn is None:
+            conn = self._lokal.conn = open_connection(self.path)
+        return conn
+
+    @contextmanager
+    def cursor(self):
+        conn = self._koneksi()
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+class PermintaanTidakValid(Exception):
+    """Body/parameter request tidak valid (400)"""
+
+def _angka(data, kunci, tipe=float, wajib=True, bawaan=None):
+    if data.get(kunci) is None:
+        if wajib:
+            raise PermintaanTidakValid(f"'{kunci}' wajib diisi")
+        return bawaan
+    try:
+        return tipe(data[kunci])
+    except (TypeError, ValueError):
+        raise PermintaanTidakValid(f"'{kunci}' harus berupa angka")
+
+def _pembayaran(data):
+    return dict(
+        metode_pembayaran=data.get('metode_pembayaran') or "Tunai",
+        jumlah_pembayaran=_angka(data, 'jumlah_pembayaran'),
+        cashier_id=_angka(data, 'cashier_id', int),
+        nama_pelanggan=data.get('nama_pelanggan'),
+        member=bool(data.get('member')),
+        customer_id=_angka(data, 'customer_id', int, wajib=False),
+    )
+
+def keranjang_json(layanan, keranjang, query):
+    """Keranjang dengan harga setelah promosi, sama dengan yang ditagih checkout
+
+    Harga member dipakai bila query membawa `member=1` atau `customer_id`
+    pelanggan yang punya kode member.
+    """
+    member = query.get('member', '').lower() in ('1', 'true')
+    customer_id = _angka(query, 'customer_id', int, wajib=False)
+    if customer_id is not None:
+        member = member or bool(layanan.pelanggan(customer_id)['member_code'])
+    items, total = layanan.hitung_harga(keranjang, member)
+    return {
+        'cart_id': keranjang.id,
+        'items': items,
+        'total_kotor': keranjang.total,
+        'diskon': sum(item['discount_amount'] for item in items),
+        'total': total,
+    }
+
+RUTE = []
+
+def rute(metode, pola):
+    def daftar(fungsi):
+        RUTE.append((metode, re.compile(f"^{pola}$"), fungsi))
+        return fungsi
+    return daftar
+
+@rute("GET", r"/status")
+def status(layanan, data, query):
+    pemutar = layanan.jurnal
+    return 200, {
+        'keranjang_aktif': layanan.jumlah_keranjang(),
+        'jurnal_tertunda': pemutar.jurnal.jumlah_tertunda(),
+        'jurnal_gagal': pemutar.jurnal.jumlah_gagal(),
+        'jurnal_error_terakhir': pemutar.error_terakhir,
+    }
+
+@rute("GET", r"/produk")
+def produk(layanan, data, query):
+    if 'barcode' in query:
+        hasil = layanan.cari_produk(barcode=query['barcode'])
+    elif 'id' in query:
+        hasil = layanan.cari_produk(product_id=_angka(query, 'id', int))
+    else:
+        raise PermintaanTidakValid("Sertakan parameter 'barcode' atau 'id'")
+    if hasil is None:
+        return 404, {'error': "Produk tidak ditemukan."}
+    return 200, hasil
+
+@rute("POST", r"/keranjang")
+def buat_keranjang(layanan, data, query):
+    return 201, keranjang_json(layanan, layanan.buat_keranjang(), query)
+
+@rute("GET", r"/keranjang/(?P<cart_id>\w+)")
+def lihat_keranjang(layanan, data, query, cart_id):
+    return 200, keranjang_json(layanan, layanan.keranjang(cart_id), query)
+
+@rute("DELETE", r"/keranjang/(?P<cart_id>\w+)")
+def batalkan_keranjang(layanan, data, query, cart_id):
+    layanan.batalkan(layanan.keranjang(cart_id))
+    return 200, {'cart_id': cart_id, 'dibatalkan': True}
+
+@rute("POST", r"/keranjang/(?P<cart_id>\w+)/item")
+def tambah_item(layanan, data, query, cart_id):
+    keranjang = layanan.keranjang(cart_id)
+    layanan.tambah(
+        keranjang,
+        product_id=_angka(data, 'product_id', int, wajib=False),
+        barcode=data.get('barcode'),
+        jumlah=_angka(data, 'jumlah', int, wajib=False, bawaan=1),
+    )
+    return 200, keranjang_json(layanan, keranjang, query)
+
+@rute("PUT", r"/keranjang/(?P<cart_id>\w+)/item/(?P<product_id>\d+)")
+def ubah_item(layanan, data, query, cart_id, product_id):
+    keranjang = layanan.keranjang(cart_id)
+    layanan.ubah_jumlah(keranjang, int(product_id), _angka(data, 'jumlah', int))
+    return 200, keranjang_json(layanan, keranjang, query)
+
+@rute("DELETE", r"/keranjang/(?P<cart_id>\w+)/item/(?P<product_id>\d+)")
+def hapus_item(layanan, data, query, cart_id, product_id):
+    keranjang = layanan.keranjang(cart_id)
+    layanan.hapus(keranjang, int(product_id))
+    return 200, keranjang_json(layanan, keranjang, query)
+
+@rute("POST", r"/keranjang/(?P<cart_id>\w+)/checkout")
+def checkout_keranjang(layanan, data, query, cart_id):
+    return 201, layanan.checkout(layanan.keranjang(cart_id), **_pembayaran(data))
+
+@rute("POST", r"/checkout")
+def checkout_langsung(layanan, data, query):
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise PermintaanTidakValid("'items' wajib berupa daftar yang tidak kosong")
+    return 201, layanan.checkout_langsung(items, **_pembayaran(data))
+
+class HandlerAPI(BaseHTTPRequestHandler):
+    layanan = None
+    protocol_version = "HTTP/1.1"  # keep-alive: scanner memakai ulang koneksi TCP
+
+    def log_message(self, format, *args):
+        pass  # tanpa log per request di jalur cepat
+
+    def _kirim(self, kode, isi):
+        body = json.dumps(isi, ensure_ascii=False, default=str).encode("utf-8")
+        self.send_response(kode)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _proses(self, metode):
+        path, _, qs = self.path.partition("?")
+        query = dict(parse_qsl(qs))
+        panjang = int(self.headers.get("Content-Length") or 0)
+        mentah = self.rfile.read(panjang) if panjang else b""
+
+        if API_KEY and not hmac.compare_digest(self.headers.get("X-API-Key", ""), API_KEY):
+            return self._kirim(401, {'error': "API key tidak valid."})
+
+        for m, pola, fungsi in RUTE:
+            cocok = pola.match(path.rstrip("/") or "/")
+            if m == metode and cocok:
+                break
+        else:
+            return self._kirim(404, {'error': "Endpoint tidak ditemukan."})
+
+        try:
+            data = json.loads(mentah) if mentah else {}
+            if not isinstance(data, dict):
+                raise PermintaanTidakValid("Body harus berupa objek JSON")
+            kode, isi = fungsi(self.layanan, data, query, **cocok.groupdict())
+        except (PermintaanTidakValid, ValueError) as e:
+            kode, isi = 400, {'error': str(e)}
+        except CheckoutError as e:
+            kode, isi = 409, {'error': str(e)}
+        except sqlite3.OperationalError as e:
+            kode, isi = 503, {'error': f"Database tidak tersedia: {e}"}
+        except Exception as e:
+            kode, isi = 500, {'error': f"Error dalam transaksi: {e}"}
+        self._kirim(kode, isi)
+
+    def do_GET(self):
+        self._proses("GET")
+
+    def do_POST(self):
+        self._proses("POST")
+
+    def do_PUT(self):
+        self._proses("PUT")
+
+    def do_DELETE(self):
+        self._proses("DELETE")
+
+def buat_server(host="127.0.0.1", port=8600, db_path=None, jurnal_path=JURNAL_API):
+    """Buat server API beserta layanan checkout dan pemutar jurnalnya sendiri"""
+    db_path = db_path or DB_PATH
+    koneksi = KoneksiPerThread(db_path)
+    with koneksi.cursor() as cursor:
+        init_schema(cursor)
+
+    pemutar = PemutarJurnal(JurnalCheckout(jurnal_path), lambda: open_connection(db_path))
+    pemutar.start()
+    handler = type("Handler", (HandlerAPI,), {'layanan': LayananCheckout(koneksi.cursor, jurnal=pemutar)})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="API checkout POS (HTTP/JSON)")
+    parser.add_argument("--host", default=os.environ.get("POS_API_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("POS_API_PORT", "8600")))
+    parser.add_argument("--db", help="path database (default: POS_DB_PATH)")
+    args = parser.parse_args(argv)
+
+    server = buat_server(args.host, args.port, args.db)
+    print(f"API checkout berjalan di http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+import argparse
+import calendar
+import os
+from datetime import date
+
+import pandas as pd
+
+from .report_engine import KUERI_BARIS, ketik_bingkai
+from .schema import DB_PATH, init_schema, open_connection
+
+# Arsip analitik Parquet untuk bulan yang sudah tutup:
+#   python -m modules.archive                # arsipkan semua bulan tutup yang belum/basi
+#   python -m modules.archive --paksa        # tulis ulang semua
+#
+# Satu file per bulan (penjualan/year=YYYY/month=MM/data.parquet) berisi baris
+# item yang di-join dengan headernya, bertipe dan ber-dictionary encoding.
+# Mesin laporan membaca partisi yang masih segar dari sini (hanya kolom yang
+# dipakai, dengan filter tanggal di level file/row group) dan sisanya dari
+# SQLite. pyarrow opsional: tanpa pyarrow semua laporan membaca SQLite.
+
+ARSIP_DIR = os.environ.get("POS_ARCHIVE_DIR", "data/archive")
+
+KUERI_ARSIP = """
+    SELECT
+        ti.transaction_id AS invoice_number,
+        t.created_at,
+        t.total_amount,
+        t.discount_amount AS transaction_discount,
+        t.payment_method,
+        t.cashier_id,
+        u.username AS cashier,
+        t.customer_id,
+        ti.product_id,
+        ti.product_name,
+        ti.category,
+        ti.barcode,
+        ti.quantity,
+        ti.price_per_unit,
+        ti.discount_amount,
+        ti.promotion_id,
+        ti.subtotal
+    FROM transaction_items ti
+    JOIN transactions t ON t.invoice_number = ti.transaction_id
+    LEFT JOIN users u ON u.id = t.cashier_id
+    WHERE ti.created_at BETWEEN ? AND ?
+"""
+
+TIPE_ARSIP = {
+    'invoice_number': 'string',
+    'total_amount': 'float64',
+    'transaction_discount': 'float64',
+    'payment_method': 'category',
+    'cashier_id': 'Int64',
+    'cashier': 'category',
+    'customer_id': 'Int64',
+    'product_id': 'int64',
+    'product_name': 'category',
+    'category': 'category',
+    'barcode': 'string',
+    'quantity': 'int64',
+    'price_per_unit': 'float64',
+    'discount_amount': 'float64',
+    'promotion_id': 'Int64',
+    'subtotal': 'float64',
+}
+
+def tersedia():
+    """Apakah pyarrow terpasang"""
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+def _skema():
+    import pyarrow as pa
+
+    teks_berulang = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([
+        ('invoice_number', pa.string()),
+        ('created_at', pa.timestamp('us')),
+        ('total_amount', pa.float64()),
+        ('transaction_discount', pa.float64()),
+        ('payment_method', teks_berulang),
+        ('cashier_id', pa.int64()),
+        ('cashier', teks_berulang),
+        ('customer_id', pa.int64()),
+        ('product_id', pa.int64()),
+        ('product_name', teks_berulang),
+        ('category', teks_berulang),
+        ('barcode', pa.string()),
+        ('quantity', pa.int64()),
+        ('price_per_unit', pa.float64()),
+        ('discount_amount', pa.float64()),
+        ('promotion_id', pa.int64()),
+        ('subtotal', pa.float64()),
+    ])
+
+def batas_bulan(tahun, bulan):
+    """(tanggal pertama, tanggal terakhir) satu bulan sebagai 'YYYY-MM-DD'"""
+    terakhir = calendar.monthrange(tahun, bulan)[1]
+    return f"{tahun:04d}-{bulan:02d}-01", f"{tahun:04d}-{bulan:02d}-{terakhir:02d}"
+
+def path_partisi(tahun, bulan):
+    """Path relatif terhadap direktori arsip"""
+    return os.path.join("penjualan", f"year={tahun:04d}", f"month={bulan:02d}", "data.parquet")
+
+def bulan_perlu_diarsip(cursor, paksa=False, hari_ini=None):
+    """Bulan tutup (sebelum bulan berjalan) yang belum diarsip atau partisinya basi"""
+    awal_bulan_ini = (hari_ini or date.today()).strftime("%Y-%m-01")
+    cursor.execute(
+        "SELECT DISTINCT substr(created_at, 1, 7) FROM transactions WHERE created_at < ?",
+        (awal_bulan_ini,)
+    )
+    semua = sorted(tuple(int(x) for x in row[0].split("-")) for row in cursor.fetchall())
+    if paksa:
+        return semua
+    cursor.execute("SELECT year, month FROM archive_partitions WHERE stale = 0")
+    segar = {(row[0], row[1]) for row in cursor.fetchall()}
+    return [bulan for bulan in semua if bulan not in segar]
+
+def arsipkan_bulan(connection, tahun, bulan, direktori=ARSIP_DIR, ukuran_chunk=50_000):
+    """Tulis satu bulan ke Parquet per chunk (memori tetap); mengembalikan jumlah baris"""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    mulai, akhir = batas_bulan(tahun, bulan)
+    params = (mulai, akhir + " 23:59:59")
+    relatif = path_partisi(tahun, bulan)
+    path = os.path.join(direktori, relatif)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    sementara = path + ".tmp"
+
+    skema = _skema()
+    jumlah = 0
+    with pq.ParquetWriter(sementara, skema, compression="zstd") as writer:
+        for chunk in pd.read_sql_query(KUERI_ARSIP, connection, params=params, chunksize=ukuran_chunk):
+            df = chunk.astype(TIPE_ARSIP)
+            df['created_at'] = pd.to_datetime(df['created_at'], format='ISO8601')
+            writer.write_table(pa.Table.from_pandas(df, preserve_index=False).cast(skema))
+            jumlah += len(df)
+    os.replace(sementara, path)
+
+    with connection:
+        # Penjualan yang masuk ke bulan ini selama ekspor berjalan membuat
+        # jumlahnya berbeda; partisi langsung ditandai basi
+        total = connection.execute(f"SELECT COUNT(*) FROM ({KUERI_ARSIP})", params).fetchone()[0]
+        connection.execute("""
+            INSERT OR REPLACE INTO archive_partitions (year, month, path, row_count, stale, archived_at)
+            VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        """, (tahun, bulan, relatif, jumlah, int(total != jumlah)))
+    return jumlah
+
+def arsipkan(connection, direktori=ARSIP_DIR, paksa=False):
+    """Arsipkan semua bulan tutup yang perlu; mengembalikan [(tahun, bulan, baris)]"""
+    hasil = []
+    for tahun, bulan in bulan_perlu_diarsip(connection.cursor(), paksa):
+        hasil.append((tahun, bulan, arsipkan_bulan(connection, tahun, bulan, direktori)))
+    return hasil
+
+def _bulan_dalam(tanggal_mulai, tanggal_akhir):
+    tahun, bulan = int(tanggal_mulai[:4]), int(tanggal_mulai[5:7])
+    akhir = (int(tanggal_akhir[:4]), int(tanggal_akhir[5:7]))
+    while (tahun, bulan) <= akhir:
+        yield tahun, bulan
+        tahun, bulan = (tahun + 1, 1) if bulan == 12 else (tahun, bulan + 1)
+
+def rencana_baca(connection, tanggal_mulai, tanggal_akhir, direktori=ARSIP_DIR):
+    """Bagi rentang: (path partisi Parquet segar, [(mulai, akhir)] yang dibaca dari SQLite)"""
+    if not tersedia():
+        return [], [(tanggal_mulai, tanggal_akhir)]
+    segar = {
+        (row[0], row[1]): os.path.join(direktori, row[2])
+        for row in connection.execute("SELECT year, month, path FROM archive_partitions WHERE stale = 0")
+    }
+
+    partisi, rentang_sqlite = [], []
+    bulan_lalu_dari_sqlite = False
+    for tahun, bulan in _bulan_dalam(tanggal_mulai, tanggal_akhir):
+        path = segar.get((tahun, bulan))
+        if path and os.path.exists(path):
+            partisi.append(path)
+            bulan_lalu_dari_sqlite = False
+            continue
+        mulai, akhir = batas_bulan(tahun, bulan)
+        mulai, akhir = max(mulai, tanggal_mulai), min(akhir, tanggal_akhir)
+        if bulan_lalu_dari_sqlite:
+            # Bulan berurutan yang tidak diarsip digabung jadi satu kueri
+            rentang_sqlite[-1] = (rentang_sqlite[-1][0], akhir)
+        else:
+            rentang_sqlite.append((mulai, akhir))
+        bulan_lalu_dari_sqlite = True
+    return partisi, rentang_sqlite
+
+def baca_partisi(paths, kolom, tanggal_mulai, tanggal_akhir):
+    """Baca hanya `kolom` dari partisi, dengan filter tanggal didorong ke pembaca Parquet"""
+    import pyarrow.dataset as ds
+
+    dataset = ds.dataset(paths, format="parquet")
+    filter_tanggal = (
+        (ds.field("created_at") >= pd.Timestamp(tanggal_mulai))
+        & (ds.field("created_at") <= pd.Timestamp(tanggal_akhir + " 23:59:59"))
+    )
+    df = dataset.to_table(columns=kolom, filter=filter_tanggal).to_pandas()
+    df['created_at'] = df['created_at'].astype('datetime64[ns]')
+    return df
+
+def muat_baris_arsip(connection, tanggal_mulai, tanggal_akhir, kolom, direktori=ARSIP_DIR):
+    """Bingkai mentah per bagian rentang: partisi Parquet segar + sisa dari SQLite"""
+    partisi, rentang_sqlite = rencana_baca(connection, tanggal_mulai, tanggal_akhir, direktori)
+    bagian = [
+        ketik_bingkai(pd.read_sql_query(KUERI_BARIS, connection, params=(mulai, akhir + " 23:59:59")))
+        for mulai, akhir in rentang_sqlite
+    ]
+    if partisi:
+        bagian.append(baca_partisi(partisi, kolom, tanggal_mulai, tanggal_akhir))
+    return bagian
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Arsipkan bulan tutup ke Parquet untuk laporan")
+    parser.add_argument("--db", help="path database (default: POS_DB_PATH)")
+    parser.add_argument("--dir", default=ARSIP_DIR, help="direktori arsip (default: POS_ARCHIVE_DIR)")
+    parser.add_argument("--paksa", action="store_true", help="tulis ulang semua bulan tutup")
+    args = parser.parse_args(argv)
+
+    if not tersedia():
+        parser.error("pyarrow belum terpasang (pip install pyarrow)")
+    conn = open_connection(args.db or DB_PATH)
+    try:
+        with conn:
+            init_schema(conn.cursor())
+        hasil = arsipkan(conn, args.dir, args.paksa)
+    finally:
+        conn.close()
+    for tahun, bulan, baris in hasil:
+        print(f"{tahun:04d}-{bulan:02d}: {baris:,} baris")
+    print(f"{len(hasil)} partisi ditulis ke {args.dir}")
+
+if __name__ == "__main__":
+    main()
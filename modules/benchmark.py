@@ -0,0 +1,303 @@
+import argparse
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+from .checkout import CheckoutError, GeneratorInvoice, LayananCheckout
+from .hooks import RegistriHook
+from .schema import init_schema, open_connection
+
+# Benchmark checkout tanpa Streamlit:
+#   python -m modules.benchmark --kasir 4 --transaksi 500 --json hasil.json
+#   python -m modules.benchmark --kasir 4 --transaksi 500 --bandingkan hasil.json
+# Setiap kasir adalah thread dengan koneksi sendiri ke database sementara, jadi
+# persaingan lock antar terminal ikut terukur. Checkout berjalan lewat
+# LayananCheckout.checkout_langsung, jalur yang sama dengan API: harga promosi,
+# nomor invoice di transaksi penjualan, pembersihan reservasi, dan hook.
+
+METODE = ["Tunai", "QRIS", "Kartu Debit"]
+
+def persentil(data, p):
+    """Persentil ke-p (0-100) dengan interpolasi linear; None bila data kosong"""
+    if not data:
+        return None
+    urut = sorted(data)
+    posisi = (len(urut) - 1) * p / 100
+    bawah = int(posisi)
+    atas = min(bawah + 1, len(urut) - 1)
+    return urut[bawah] + (urut[atas] - urut[bawah]) * (posisi - bawah)
+
+def ringkas(data_detik):
+    """p50/p95/p99/maks/rata-rata dalam milidetik"""
+    ms = [d * 1000 for d in data_detik]
+    return {
+        'p50_ms': persentil(ms, 50),
+        'p95_ms': persentil(ms, 95),
+        'p99_ms': persentil(ms, 99),
+        'maks_ms': max(ms) if ms else None,
+        'rata_ms': statistics.fmean(ms) if ms else None,
+    }
+
+def ukuran_db(path):
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+def siapkan_database(path, jumlah_produk, jumlah_kasir, seed):
+    """Buat database sementara berisi produk dan kasir"""
+    rng = random.Random(seed)
+    conn = open_connection(path)
+    with conn:
+        cursor = conn.cursor()
+        init_schema(cursor)
+        cursor.executemany(
+            "INSERT INTO users (id, username, password, role) VALUES (?, ?, 'x', 'cashier')",
+            [(i + 1, f"kasir{i + 1}") for i in range(jumlah_kasir)]
+        )
+        cursor.executemany(
+            "INSERT INTO products (name, price, stock, category, barcode) VALUES (?, ?, ?, ?, ?)",
+            [
+                (f"Produk {i:05d}", rng.choice([2500, 3500, 5000, 7500, 12000, 25000, 48000]),
+                 10 ** 9, f"Kategori {i % 20}", f"899{i:010d}")
+                for i in range(jumlah_produk)
+            ]
+        )
+        cursor.execute("SELECT id, name, price FROM products ORDER BY id")
+        produk = [dict(row) for row in cursor.fetchall()]
+    conn.close()
+    return produk
+
+class GeneratorTerukur(GeneratorInvoice):
+    """GeneratorInvoice yang mencatat lama `ambil`
+
+    Pencadangan nomor adalah statement tulis pertama checkout, jadi lamanya
+    adalah waktu menunggu lock tulis database.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.durasi_terakhir = None
+
+    def ambil(self, cursor, sekarang=None):
+        t0 = time.perf_counter()
+        try:
+            return super().ambil(cursor, sekarang)
+        finally:
+            self.durasi_terakhir = time.perf_counter() - t0
+
+class Kasir(threading.Thread):
+    """Satu terminal kasir: checkout_langsung LayananCheckout di koneksi sendiri"""
+
+    def __init__(self, nomor, path, produk, bobot, transaksi, rata_keranjang, timeout, seed, mulai, hooks=None):
+        super().__init__(name=f"kasir-{nomor}")
+        self.nomor = nomor
+        self.path = path
+        self.hooks = hooks
+        self.produk = produk
+        self.bobot = bobot
+        self.transaksi = transaksi
+        self.rata_keranjang = rata_keranjang
+        self.timeout = timeout
+        self.rng = random.Random(seed)
+        self.mulai = mulai
+        self.latensi = []
+        self.tunggu_lock = []
+        self.ukuran_keranjang = []
+        self.gagal = {'terkunci': 0, 'checkout': 0}
+
+    def keranjang(self):
+        # Ukuran keranjang condong ke kecil dengan ekor panjang (lognormal),
+        # produk dipilih dengan popularitas ala Zipf
+        ukuran = min(40, max(1, round(self.rng.lognormvariate(0, 0.7) * self.rata_keranjang)))
+        dipilih = self.rng.choices(self.produk, cum_weights=self.bobot, k=ukuran)
+        return [{'product_id': p['id'], 'jumlah': self.rng.choice((1, 1, 1, 2, 3))} for p in dipilih]
+
+    def run(self):
+        conn = open_connection(self.path, timeout=self.timeout)
+        harga = {p['id']: p['price'] for p in self.produk}
+
+        @contextmanager
+        def buka_cursor():
+            # Sama dengan DatabaseConnection.get_cursor: commit atau rollback saat keluar
+            cursor = conn.cursor()
+            try:
+                yield cursor
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                cursor.close()
+
+        generator = GeneratorTerukur(terminal_id=f"{self.nomor:02d}")
+        layanan = LayananCheckout(buka_cursor, generator=generator, hooks=self.hooks)
+        self.mulai.wait()
+        for _ in range(self.transaksi):
+            baris = self.keranjang()
+            # Tanpa promosi di database sementara, total neto = total kotor
+            total = sum(harga[b['product_id']] * b['jumlah'] for b in baris)
+            generator.durasi_terakhir = None
+            t0 = time.perf_counter()
+            try:
+                layanan.checkout_langsung(baris, self.rng.choice(METODE), total, cashier_id=self.nomor)
+            except sqlite3.OperationalError:
+                self.gagal['terkunci'] += 1
+                continue
+            except CheckoutError:
+                self.gagal['checkout'] += 1
+                continue
+            self.latensi.append(time.perf_counter() - t0)
+            self.tunggu_lock.append(generator.durasi_terakhir)
+            self.ukuran_keranjang.append(len(baris))
+        conn.close()
+
+def jalankan(kasir=4, transaksi=250, produk=2000, rata_keranjang=4, seed=42, path=None,
+             timeout=30.0, journal_mode=None):
+    """Jalankan benchmark; mengembalikan dict hasil yang bisa di-dump ke JSON"""
+    sementara = None
+    if path is None:
+        sementara = tempfile.TemporaryDirectory(prefix="pos-bench-")
+        path = os.path.join(sementara.name, "bench.db")
+    try:
+        daftar_produk = siapkan_database(path, produk, kasir, seed)
+        if journal_mode:
+            conn = open_connection(path)
+            conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+            conn.close()
+        conn = open_connection(path)
+        mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+        conn.close()
+
+        kumulatif, total_bobot = [], 0.0
+        for peringkat in range(1, len(daftar_produk) + 1):
+            total_bobot += 1 / peringkat ** 1.1
+            kumulatif.append(total_bobot)
+
+        # Hook pasca-commit ringan seperti skor typeahead, supaya biaya
+        # penjadwalan hook ikut terukur
+        hooks = RegistriHook()
+        terjual = {}
+
+        @hooks.daftar("checkout", nama="hitung_terjual")
+        def hitung_terjual(penjualan):
+            for item in penjualan['items']:
+                terjual[item['id']] = terjual.get(item['id'], 0) + item['quantity']
+
+        ukuran_awal = ukuran_db(path)
+        mulai = threading.Event()
+        pekerja = [
+            Kasir(i + 1, path, daftar_produk, kumulatif, transaksi, rata_keranjang,
+                  timeout, seed + i + 1, mulai, hooks)
+            for i in range(kasir)
+        ]
+        for p in pekerja:
+            p.start()
+        t0 = time.perf_counter()
+        mulai.set()
+        for p in pekerja:
+            p.join()
+        durasi = time.perf_counter() - t0
+        hooks.tutup()
+        ukuran_akhir = ukuran_db(path)
+
+        latensi = [x for p in pekerja for x in p.latensi]
+        tunggu = [x for p in pekerja for x in p.tunggu_lock]
+        keranjang = [x for p in pekerja for x in p.ukuran_keranjang]
+        return {
+            'waktu': datetime.now().isoformat(timespec="seconds"),
+            'konfigurasi': {
+                'kasir': kasir, 'transaksi_per_kasir': transaksi, 'produk': produk,
+                'rata_keranjang': rata_keranjang, 'seed': seed, 'journal_mode': mode,
+                'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version,
+            },
+            'checkout': len(latensi),
+            'gagal': {k: sum(p.gagal[k] for p in pekerja) for k in ('terkunci', 'checkout')},
+            'durasi_s': durasi,
+            'throughput_per_s': len(latensi) / durasi if durasi else None,
+            'latensi': ringkas(latensi),
+            'tunggu_lock': dict(ringkas(tunggu), total_s=sum(tunggu)),
+            'rata_item_per_keranjang': statistics.fmean(keranjang) if keranjang else None,
+            'ukuran_db': {
+                'awal_bytes': ukuran_awal,
+                'akhir_bytes': ukuran_akhir,
+                'bytes_per_checkout': (ukuran_akhir - ukuran_awal) / len(latensi) if latensi else None,
+            },
+        }
+    finally:
+        if sementara:
+            sementara.cleanup()
+
+METRIK_UTAMA = [
+    ('throughput_per_s', "Throughput (checkout/s)", True),
+    ('latensi.p50_ms', "Latensi p50 (ms)", False),
+    ('latensi.p95_ms', "Latensi p95 (ms)", False),
+    ('latensi.p99_ms', "Latensi p99 (ms)", False),
+    ('tunggu_lock.p95_ms', "Tunggu lock p95 (ms)", False),
+    ('tunggu_lock.total_s', "Tunggu lock total (s)", False),
+    ('ukuran_db.bytes_per_checkout', "Bytes DB per checkout", False),
+]
+
+def ambil(hasil, kunci):
+    for bagian in kunci.split("."):
+        hasil = hasil.get(bagian) if isinstance(hasil, dict) else None
+    return hasil
+
+def format_laporan(hasil, pembanding=None):
+    k = hasil['konfigurasi']
+    baris = [
+        f"{k['kasir']} kasir x {k['transaksi_per_kasir']} transaksi, {k['produk']} produk, "
+        f"journal_mode={k['journal_mode']}, sqlite {k['sqlite']}",
+        f"Checkout berhasil: {hasil['checkout']}  gagal: {hasil['gagal']}",
+        f"Rata-rata item per keranjang: {hasil['rata_item_per_keranjang'] or 0:.2f}",
+        "",
+    ]
+    for kunci, label, naik_lebih_baik in METRIK_UTAMA:
+        nilai = ambil(hasil, kunci)
+        teks = f"{label:<28}{nilai:>12.2f}" if nilai is not None else f"{label:<28}{'-':>12}"
+        lama = ambil(pembanding, kunci) if pembanding else None
+        if nilai is not None and lama:
+            perubahan = (nilai - lama) / lama * 100
+            lebih_baik = (perubahan > 0) == naik_lebih_baik
+            teks += f"   vs {lama:>10.2f} ({perubahan:+.1f}% {'lebih baik' if lebih_baik else 'lebih buruk'})"
+        baris.append(teks)
+    return "\n".join(baris)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark checkout POS tanpa Streamlit")
+    parser.add_argument("--kasir", type=int, default=4, help="jumlah kasir (thread) bersamaan")
+    parser.add_argument("--transaksi", type=int, default=250, help="transaksi per kasir")
+    parser.add_argument("--produk", type=int, default=2000, help="jumlah produk di katalog")
+    parser.add_argument("--rata-keranjang", type=float, default=4, help="median jumlah baris per keranjang")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--timeout", type=float, default=30.0, help="busy timeout SQLite (detik)")
+    parser.add_argument("--journal-mode", choices=["delete", "wal"], help="paksa journal_mode database")
+    parser.add_argument("--db", help="path database (default: file sementara yang dihapus)")
+    parser.add_argument("--json", help="simpan hasil sebagai JSON ke path ini")
+    parser.add_argument("--bandingkan", help="file JSON hasil sebelumnya untuk dibandingkan")
+    args = parser.parse_args(argv)
+
+    if args.db and os.path.exists(args.db):
+        parser.error(f"{args.db} sudah ada; benchmark butuh database kosong")
+
+    hasil = jalankan(
+        kasir=args.kasir, transaksi=args.transaksi, produk=args.produk,
+        rata_keranjang=args.rata_keranjang, seed=args.seed, path=args.db,
+        timeout=args.timeout, journal_mode=args.journal_mode
+    )
+    pembanding = None
+    if args.bandingkan:
+        with open(args.bandingkan) as f:
+            pembanding = json.load(f)
+    print(format_laporan(hasil, pembanding))
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(hasil, f, indent=2)
+
+if __name__ == "__main__":
+    main()
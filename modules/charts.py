@@ -0,0 +1,82 @@
+import hashlib
+import io
+
+import plotly.graph_objects as go
+
+from .report_engine import CacheLaporan
+
+# Grafik laporan dikirim ke browser sebagai spesifikasi Plotly (dirender di
+# klien). PNG hanya dibuat bila diminta (ekspor), dengan matplotlib yang
+# diimpor saat itu juga dan hasil di-cache berdasarkan hash isinya.
+
+def _tata_letak(fig, judul, label_x=None, label_y=None):
+    fig.update_layout(
+        title=judul, xaxis_title=label_x, yaxis_title=label_y,
+        margin=dict(l=40, r=20, t=60, b=40), separators=",.",
+    )
+    return fig
+
+def grafik_batang(data, x_col, y_col, judul, label_x, label_y):
+    """Grafik batang Plotly dari dataframe"""
+    fig = go.Figure(go.Bar(x=data[x_col], y=data[y_col]))
+    fig.update_xaxes(tickangle=-45, type='category')
+    return _tata_letak(fig, judul, label_x, label_y)
+
+def grafik_pie(data, values_col, labels_col, judul):
+    """Grafik pie Plotly dari dataframe"""
+    fig = go.Figure(go.Pie(
+        values=data[values_col], labels=data[labels_col], sort=False, textinfo='percent+label'
+    ))
+    return _tata_letak(fig, judul)
+
+def grafik_garis(data, x_col, y_col, judul, label_x, label_y):
+    """Grafik garis Plotly dari dataframe"""
+    fig = go.Figure(go.Scatter(x=data[x_col], y=data[y_col], mode='lines+markers'))
+    return _tata_letak(fig, judul, label_x, label_y)
+
+GRAFIK = {
+    'batang': grafik_batang,
+    'pie': grafik_pie,
+    'garis': grafik_garis,
+}
+
+_cache_png = CacheLaporan(maks_entri=128, maks_bytes=32 * 1024 * 1024)
+
+def hash_grafik(jenis, data, *args):
+    """Hash isi grafik: jenis, parameter, dan nilai kolom yang dipakai"""
+    kolom = [a for a in args if a in data.columns]
+    h = hashlib.sha256(repr((jenis, args)).encode("utf-8"))
+    h.update(data[kolom].to_csv(index=False).encode("utf-8"))
+    return h.hexdigest()
+
+def png_grafik(jenis, data, *args):
+    """PNG grafik (bytes) untuk ekspor; grafik yang isinya sama tidak dirender ulang"""
+    return _cache_png.ambil(hash_grafik(jenis, data, *args), None, lambda: _render_png(jenis, data, *args))
+
+def _render_png(jenis, data, *args):
+    from matplotlib.figure import Figure  # berat; hanya dimuat saat ekspor PNG
+
+    if jenis == 'pie':
+        values_col, labels_col, judul = args
+        fig = Figure(figsize=(8, 8))
+        ax = fig.subplots()
+        ax.pie(data[values_col], labels=data[labels_col], autopct='%1.1f%%', startangle=90)
+        ax.axis('equal')
+    else:
+        x_col, y_col, judul, label_x, label_y = args
+        fig = Figure(figsize=(10, 6))
+        ax = fig.subplots()
+        if jenis == 'batang':
+            ax.bar(data[x_col].astype(str), data[y_col])
+            ax.tick_params(axis='x', labelrotation=45)
+        else:
+            ax.plot(data[x_col], data[y_col], marker='o', linestyle='-')
+            ax.grid(True, linestyle='--', alpha=0.7)
+        ax.set_xlabel(label_x)
+        ax.set_ylabel(label_y)
+    ax.set_title(judul)
+    fig.tight_layout()
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
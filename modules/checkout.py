@@ -0,0 +1,625 @@
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from .customers import ambil_pelanggan
+from .promotions import MesinPromosi, muat_mesin_promosi, versi_promosi
+
+TERMINAL_ID = os.environ.get("POS_TERMINAL_ID", "01")
+TTL_RESERVASI = timedelta(minutes=int(os.environ.get("POS_RESERVATION_MINUTES", "15")))
+FORMAT_WAKTU = "%Y-%m-%d %H:%M:%S"
+
+class CheckoutError(Exception):
+    """Checkout ditolak: keranjang kosong, stok tidak cukup, pembayaran kurang, dst."""
+
+# Pesan OperationalError yang berarti database terkunci/sibuk atau tidak bisa
+# dibuka; error lain (SQL/skema) adalah bug dan tidak boleh disembunyikan jurnal
+PESAN_DB_TIDAK_TERSEDIA = ("locked", "unable to open", "disk i/o error")
+
+def database_tidak_tersedia(error):
+    """Apakah `error` berarti database sedang terkunci, sibuk, atau tidak bisa dihubungi"""
+    return isinstance(error, sqlite3.OperationalError) and any(
+        pesan in str(error).lower() for pesan in PESAN_DB_TIDAK_TERSEDIA
+    )
+
+def cadangkan_nomor(cursor, scope, jumlah=1):
+    """Cadangkan `jumlah` nomor urut berikutnya untuk `scope`; kembalikan nomor pertama"""
+    cursor.execute(
+        "INSERT INTO invoice_sequences (scope, last_value) VALUES (?, 0) ON CONFLICT (scope) DO NOTHING",
+        (scope,)
+    )
+    cursor.execute(
+        "UPDATE invoice_sequences SET last_value = last_value + ? WHERE scope = ?",
+        (jumlah, scope)
+    )
+    cursor.execute("SELECT last_value FROM invoice_sequences WHERE scope = ?", (scope,))
+    return cursor.fetchone()[0] - jumlah + 1
+
+class GeneratorInvoice:
+    """Nomor invoice pendek dan naik monoton per terminal per hari
+
+    Format: TRX-<terminal>-<YYMMDD>-<urut 5 digit>, mis. TRX-01-251019-00042.
+    Urutan disimpan di tabel invoice_sequences (satu baris per terminal per
+    hari), jadi insert ke indeks UNIQUE invoice_number selalu di ujung B-tree.
+
+    `ambil` mengambil nomor di dalam transaksi penjualan: penjualan yang
+    ditolak (stok, pembayaran) di-rollback beserta nomornya, jadi nomor tanpa
+    celah.
+    """
+
+    def __init__(self, terminal_id=TERMINAL_ID, awalan="TRX"):
+        self.terminal_id = terminal_id
+        self.awalan = awalan
+
+    def _format(self, hari, nomor):
+        return f"{self.awalan}-{self.terminal_id}-{hari}-{nomor:05d}"
+
+    def ambil(self, cursor, sekarang=None):
+        """Nomor invoice berikutnya, dicadangkan di transaksi penjualan milik `cursor`"""
+        hari = (sekarang or datetime.now()).strftime("%y%m%d")
+        return self._format(hari, cadangkan_nomor(cursor, f"{self.terminal_id}-{hari}"))
+
+    def nomor_offline(self, sekarang=None):
+        """Nomor invoice saat database tidak bisa dihubungi (tanpa tabel urutan)
+
+        Akhiran "OFF" + waktu tetap unik per terminal dan tersusun setelah nomor
+        berurutan hari yang sama.
+        """
+        sekarang = sekarang or datetime.now()
+        return f"{self.awalan}-{self.terminal_id}-{sekarang:%y%m%d}-OFF{sekarang:%H%M%S%f}"
+
+def terminal_dari_invoice(invoice_number):
+    """Bagian terminal dari nomor buatan GeneratorInvoice (juga nomor offline); None bila formatnya lain"""
+    bagian = str(invoice_number).split("-")
+    return "-".join(bagian[1:-2]) if len(bagian) >= 4 else None
+
+class Keranjang:
+    """Keranjang belanja: satu baris per produk, total berjalan, snapshot produk
+
+    Menambahkan produk yang sudah ada di keranjang hanya menaikkan jumlahnya.
+    Total diperbarui secara inkremental pada setiap perubahan, dan data produk
+    disimpan sebagai snapshot saat pertama ditambahkan sehingga scan berikutnya
+    tidak perlu membaca database. Stok divalidasi ulang sekaligus saat checkout.
+    """
+
+    def __init__(self):
+        self.id = uuid.uuid4().hex  # pemilik reservasi stok
+        self.lock = threading.RLock()  # layanan mengubah keranjang di bawah lock ini
+        self._baris = {}   # product_id -> baris keranjang
+        self.produk = {}   # product_id -> snapshot produk
+        self.total = 0
+
+    def __len__(self):
+        return len(self._baris)
+
+    def __bool__(self):
+        return bool(self._baris)
+
+    def __iter__(self):
+        return iter(self._baris.values())
+
+    def __contains__(self, product_id):
+        return product_id in self._baris
+
+    def items(self):
+        """Daftar baris keranjang (format yang dipakai simpan_checkout)"""
+        return list(self._baris.values())
+
+    def jumlah(self, product_id):
+        baris = self._baris.get(product_id)
+        return baris['quantity'] if baris else 0
+
+    def tambah(self, produk, jumlah=1, periksa_stok=True):
+        """Tambahkan produk; baris untuk produk yang sama digabung
+
+        Snapshot yang sudah ada dipertahankan (mis. scan barcode yang membaca
+        produk lagi), jadi harga baris dan subtotalnya tetap konsisten.
+        """
+        product_id = produk['id']
+        self.produk.setdefault(product_id, produk)
+        return self.ubah_jumlah(product_id, self.jumlah(product_id) + jumlah, periksa_stok)
+
+    def ubah_jumlah(self, product_id, jumlah, periksa_stok=True):
+        """Set jumlah satu baris (0 menghapus baris)
+
+        Stok dicek terhadap snapshot, kecuali `periksa_stok=False` (stok sudah
+        dipastikan lewat reservasi di database).
+        """
+        if jumlah <= 0:
+            self.hapus(product_id)
+            return None
+
+        produk = self.produk[product_id]
+        if periksa_stok and produk['stock'] < jumlah:
+            raise CheckoutError(f"Stok tidak mencukupi. Tersedia: {produk['stock']}")
+
+        baris = self._baris.get(product_id)
+        if baris is None:
+            baris = self._baris[product_id] = {
+                'id': product_id,
+                'name': produk['name'],
+                'category': produk.get('category'),
+                'barcode': produk.get('barcode'),
+                'price': produk['price'],
+                'quantity': 0,
+                'subtotal': 0
+            }
+        subtotal = produk['price'] * jumlah
+        self.total += subtotal - baris['subtotal']
+        baris['quantity'] = jumlah
+        baris['subtotal'] = subtotal
+        return baris
+
+    def hapus(self, product_id):
+        """Hapus satu baris dari keranjang"""
+        baris = self._baris.pop(product_id, None)
+        self.produk.pop(product_id, None)
+        if baris:
+            self.total -= baris['subtotal']
+        return baris is not None
+
+    def kosongkan(self):
+        """Hapus semua baris"""
+        self._baris.clear()
+        self.produk.clear()
+        self.total = 0
+
+def gabungkan_kebutuhan(items):
+    """Jumlahkan kuantitas per produk (baris ganda untuk produk yang sama digabung)"""
+    kebutuhan = {}
+    for item in items:
+        kebutuhan[item['id']] = kebutuhan.get(item['id'], 0) + item['quantity']
+    return kebutuhan
+
+def _waktu(sekarang=None):
+    return (sekarang or datetime.now()).strftime(FORMAT_WAKTU)
+
+def reservasi_stok(cursor, cart_id, product_id, jumlah, ttl=TTL_RESERVASI, sekarang=None):
+    """Tahan `jumlah` unit produk untuk sebuah keranjang (nilai absolut, bukan tambahan)
+
+    Pengecekan ketersediaan (stok dikurangi reservasi aktif keranjang lain) dan
+    penulisan reservasi terjadi dalam satu statement, jadi dua terminal yang
+    berebut unit terakhir tidak bisa sama-sama berhasil. Kedaluwarsa reservasi
+    diperpanjang setiap kali baris keranjang berubah.
+    """
+    sekarang = sekarang or datetime.now()
+    if jumlah <= 0:
+        lepas_reservasi(cursor, cart_id, product_id)
+        return
+
+    cursor.execute("""
+        INSERT INTO stock_reservations (cart_id, product_id, quantity, expires_at)
+        SELECT ?, p.id, ?, ?
+        FROM products p
+        WHERE p.id = ?
+          AND p.stock - COALESCE((
+                SELECT SUM(r.quantity) FROM stock_reservations r
+                WHERE r.product_id = p.id AND r.cart_id != ? AND r.expires_at > ?
+              ), 0) >= ?
+        ON CONFLICT (cart_id, product_id)
+        DO UPDATE SET quantity = excluded.quantity, expires_at = excluded.expires_at
+    """, (cart_id, jumlah, _waktu(sekarang + ttl), product_id, cart_id, _waktu(sekarang), jumlah))
+
+    if cursor.rowcount == 0:
+        tersedia = stok_tersedia(cursor, [product_id], cart_id, sekarang).get(product_id)
+        if tersedia is None:
+            raise CheckoutError(f"Produk dengan ID {product_id} tidak ditemukan.")
+        raise CheckoutError(f"Stok tidak mencukupi. Tersedia: {tersedia}")
+
+def lepas_reservasi(cursor, cart_id, product_id=None):
+    """Lepas reservasi satu baris, atau seluruh keranjang bila product_id None"""
+    if product_id is None:
+        cursor.execute("DELETE FROM stock_reservations WHERE cart_id = ?", (cart_id,))
+    else:
+        cursor.execute(
+            "DELETE FROM stock_reservations WHERE cart_id = ? AND product_id = ?",
+            (cart_id, product_id)
+        )
+
+def bersihkan_reservasi_kedaluwarsa(cursor, sekarang=None):
+    """Hapus reservasi yang sudah lewat waktu (keranjang ditinggal)"""
+    cursor.execute("DELETE FROM stock_reservations WHERE expires_at <= ?", (_waktu(sekarang),))
+    return cursor.rowcount
+
+def stok_tersedia(cursor, ids, cart_id=None, sekarang=None):
+    """Stok dikurangi reservasi aktif keranjang lain, untuk banyak produk sekaligus"""
+    placeholders = ', '.join(['?'] * len(ids))
+    cursor.execute(f"""
+        SELECT p.id, p.stock - COALESCE(SUM(r.quantity), 0) AS tersedia
+        FROM products p
+        LEFT JOIN stock_reservations r
+          ON r.product_id = p.id AND r.cart_id != ? AND r.expires_at > ?
+        WHERE p.id IN ({placeholders})
+        GROUP BY p.id
+    """, [cart_id or '', _waktu(sekarang)] + list(ids))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def cek_stok(cursor, kebutuhan, cart_id=None, sekarang=None):
+    """Validasi stok seluruh keranjang dengan satu kueri IN (...)
+
+    Unit yang sedang direservasi keranjang lain tidak dihitung tersedia.
+    Melempar CheckoutError bila ada produk yang tidak ditemukan atau stoknya
+    tidak mencukupi.
+    """
+    tersedia = stok_tersedia(cursor, list(kebutuhan), cart_id, sekarang)
+
+    for product_id, jumlah in kebutuhan.items():
+        if product_id not in tersedia:
+            raise CheckoutError(f"Produk dengan ID {product_id} tidak ditemukan.")
+        if tersedia[product_id] < jumlah:
+            raise CheckoutError(
+                f"Stok produk ID {product_id} tidak mencukupi. "
+                f"Tersedia: {tersedia[product_id]}"
+            )
+    return tersedia
+
+def kebutuhan_tanpa_reservasi(cursor, cart_id, kebutuhan, sekarang=None):
+    """Baris keranjang yang tidak (lagi) tertutup reservasi aktif
+
+    Hanya membaca tabel reservasi milik keranjang ini, bukan tabel produk.
+    """
+    cursor.execute(
+        "SELECT product_id, quantity FROM stock_reservations WHERE cart_id = ? AND expires_at > ?",
+        (cart_id, _waktu(sekarang))
+    )
+    ditahan = {row[0]: row[1] for row in cursor.fetchall()}
+    return {
+        product_id: jumlah
+        for product_id, jumlah in kebutuhan.items()
+        if ditahan.get(product_id, 0) < jumlah
+    }
+
+def validasi_penjualan(items, jumlah_pembayaran):
+    """Periksa keranjang dan pembayaran tanpa database; mengembalikan (total neto, total diskon)
+
+    Dipakai sebelum penjualan ditulis, baik ke database maupun ke jurnal
+    offline, supaya penjualan yang ditolak online juga ditolak offline.
+    """
+    if not items:
+        raise CheckoutError("Keranjang belanja kosong.")
+    for item in items:
+        jumlah, harga, diskon = item.get('quantity'), item.get('price'), item.get('discount_amount', 0)
+        if (item.get('id') is None or not isinstance(jumlah, int) or jumlah <= 0
+                or harga is None or harga < 0
+                or abs(item.get('subtotal', -1) - harga * jumlah) > 0.005
+                or not 0 <= diskon <= item['subtotal']):
+            raise CheckoutError(f"Baris keranjang tidak valid: {item.get('name') or item.get('id')}")
+
+    # Baris yang sudah dihitung MesinPromosi membawa discount_amount; subtotal
+    # yang disimpan adalah nilai neto baris
+    total_diskon = sum(item.get('discount_amount', 0) for item in items)
+    total_belanja = sum(item['subtotal'] for item in items) - total_diskon
+    if jumlah_pembayaran < total_belanja:
+        raise CheckoutError("Pembayaran kurang dari total belanja.")
+    return total_belanja, total_diskon
+
+def simpan_checkout(cursor, items, invoice_number, metode_pembayaran, jumlah_pembayaran,
+                    cashier_id, nama_pelanggan=None, tanggal=None, cart_id=None,
+                    penjualan_offline=False, customer_id=None):
+    """Tulis satu penjualan lengkap dalam transaksi milik `cursor`
+
+    Header, seluruh baris item (executemany) dan pengurangan stok ditulis di
+    transaksi yang sama; pemanggil yang melakukan commit atau rollback. Jumlah
+    statement tetap (1 SELECT + 3 penulisan) berapa pun ukuran keranjang;
+    rollup penjualan harian/per jam ikut diperbarui trigger di transaksi ini.
+
+    Dengan `cart_id`, baris yang tertutup reservasi aktif tidak dibaca ulang
+    dari tabel produk; reservasi keranjang dilepas dalam transaksi yang sama.
+
+    `penjualan_offline=True` dipakai saat memutar ulang jurnal: barang sudah
+    diserahkan ke pelanggan, jadi stok tidak divalidasi dan dikurangi paling
+    rendah sampai 0.
+    """
+    total_belanja, total_diskon = validasi_penjualan(items, jumlah_pembayaran)
+
+    kebutuhan = gabungkan_kebutuhan(items)
+    if not penjualan_offline:
+        perlu_dicek = kebutuhan_tanpa_reservasi(cursor, cart_id, kebutuhan) if cart_id else kebutuhan
+        if perlu_dicek:
+            cek_stok(cursor, perlu_dicek, cart_id)
+
+    tanggal_transaksi = tanggal or datetime.now().strftime(FORMAT_WAKTU)
+
+    cursor.execute("""
+        INSERT INTO transactions
+        (invoice_number, customer_id, customer_name, total_amount, discount_amount, payment_amount,
+         payment_method, cashier_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, (invoice_number, customer_id, nama_pelanggan or None, total_belanja, total_diskon,
+          jumlah_pembayaran, metode_pembayaran, cashier_id, tanggal_transaksi))
+
+    cursor.executemany("""
+        INSERT INTO transaction_items
+        (transaction_id, product_id, product_name, category, barcode,
+         quantity, price_per_unit, subtotal, discount_amount, promotion_id, created_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [
+        (invoice_number, item['id'], item.get('name'), item.get('category'), item.get('barcode'),
+         item['quantity'], item['price'], item['subtotal'] - item.get('discount_amount', 0),
+         item.get('discount_amount', 0), item.get('promotion_id'), tanggal_transaksi)
+        for item in items
+    ])
+
+    if penjualan_offline:
+        cursor.executemany("""
+            UPDATE products
+            SET stock = MAX(stock - ?, 0), updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, [(jumlah, product_id) for product_id, jumlah in kebutuhan.items()])
+    else:
+        # Guard `stock >= ?` menangkap penjualan lain yang terjadi setelah validasi
+        cursor.executemany("""
+            UPDATE products
+            SET stock = stock - ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ? AND stock >= ?
+        """, [
+            (jumlah, product_id, jumlah)
+            for product_id, jumlah in kebutuhan.items()
+        ])
+        if cursor.rowcount != len(kebutuhan):
+            raise CheckoutError("Stok berubah saat transaksi diproses. Silakan coba lagi.")
+
+    if cart_id:
+        lepas_reservasi(cursor, cart_id)
+
+    return {
+        'id_transaksi': invoice_number,
+        'total': total_belanja,
+        'diskon': total_diskon,
+        'pembayaran': jumlah_pembayaran,
+        'kembalian': jumlah_pembayaran - total_belanja,
+        'tanggal': tanggal_transaksi
+    }
+
+KOLOM_PRODUK = "id, name, price, stock, category, barcode"
+
+def ambil_produk(cursor, product_id=None, barcode=None):
+    """Snapshot produk berdasarkan ID atau barcode; None bila tidak ada"""
+    if product_id is not None:
+        cursor.execute(f"SELECT {KOLOM_PRODUK} FROM products WHERE id = ?", (product_id,))
+    else:
+        cursor.execute(f"SELECT {KOLOM_PRODUK} FROM products WHERE barcode = ?", (barcode,))
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+class LayananCheckout:
+    """Layanan penjualan tanpa Streamlit: keranjang, harga, dan commit
+
+    Dipakai oleh UI Streamlit (keranjang disimpan di session_state) dan oleh
+    API HTTP (keranjang disimpan di registri layanan ini). Kesalahan bisnis
+    dilempar sebagai CheckoutError; pemanggil yang memutuskan cara
+    menampilkannya.
+
+    - `buka_cursor`: callable yang mengembalikan context manager cursor
+      (commit saat keluar normal, rollback saat exception)
+    - `jurnal`: opsional, objek dengan `tulis(entri)`; bila ada, penjualan
+      yang gagal karena database terkunci/tidak tersedia dicatat ke sana
+    - `hooks`: opsional, RegistriHook yang dipicu dengan peristiwa "checkout"
+    """
+
+    def __init__(self, buka_cursor, generator=None, jurnal=None, hooks=None, ttl=TTL_RESERVASI):
+        self.buka_cursor = buka_cursor
+        self.generator = generator or GeneratorInvoice()
+        self.jurnal = jurnal
+        self.hooks = hooks
+        self.ttl = ttl
+        self._mesin = None  # MesinPromosi terkompilasi, diganti saat versi promosi berubah
+        self._keranjang = {}  # cart_id -> (Keranjang, terakhir dipakai)
+        self._lock = threading.Lock()
+
+    # Registri keranjang (untuk klien tanpa session, mis. API)
+
+    def buat_keranjang(self):
+        """Buat keranjang baru di registri; keranjang yang lama tidak dipakai dibuang"""
+        sekarang = time.monotonic()
+        batas_idle = self.ttl.total_seconds()
+        keranjang = Keranjang()
+        with self._lock:
+            for cart_id, (_, dipakai) in list(self._keranjang.items()):
+                if sekarang - dipakai > batas_idle:
+                    del self._keranjang[cart_id]
+            self._keranjang[keranjang.id] = (keranjang, sekarang)
+        return keranjang
+
+    def keranjang(self, cart_id):
+        """Ambil keranjang dari registri; CheckoutError bila tidak ada"""
+        with self._lock:
+            if cart_id not in self._keranjang:
+                raise CheckoutError("Keranjang tidak ditemukan atau sudah kedaluwarsa.")
+            keranjang, _ = self._keranjang[cart_id]
+            self._keranjang[cart_id] = (keranjang, time.monotonic())
+        return keranjang
+
+    def jumlah_keranjang(self):
+        with self._lock:
+            return len(self._keranjang)
+
+    def _lupakan(self, keranjang):
+        with self._lock:
+            self._keranjang.pop(keranjang.id, None)
+
+    # Operasi keranjang
+
+    def cari_produk(self, product_id=None, barcode=None):
+        with self.buka_cursor() as cursor:
+            return ambil_produk(cursor, product_id, barcode)
+
+    def tambah(self, keranjang, product_id=None, jumlah=1, barcode=None):
+        """Tambahkan produk (berdasarkan ID atau barcode) dan tahan stoknya"""
+        if jumlah <= 0:
+            raise CheckoutError("Jumlah harus lebih dari 0.")
+        with keranjang.lock:
+            # Produk yang sudah di keranjang memakai snapshot, tanpa baca database
+            produk = keranjang.produk.get(product_id) if product_id is not None else None
+            with self.buka_cursor() as cursor:
+                if produk is None:
+                    produk = ambil_produk(cursor, product_id, barcode)
+                    if produk is None:
+                        raise CheckoutError("Produk tidak ditemukan.")
+                # Unit ditahan di database agar terminal lain tidak menjual unit yang sama
+                reservasi_stok(
+                    cursor, keranjang.id, produk['id'], keranjang.jumlah(produk['id']) + jumlah, self.ttl
+                )
+            return keranjang.tambah(produk, jumlah, periksa_stok=False)
+
+    def ubah_jumlah(self, keranjang, product_id, jumlah):
+        """Set jumlah satu baris (0 menghapus baris) dan sesuaikan reservasinya"""
+        with keranjang.lock:
+            if product_id not in keranjang:
+                raise CheckoutError("Produk tidak ada di keranjang.")
+            with self.buka_cursor() as cursor:
+                reservasi_stok(cursor, keranjang.id, product_id, jumlah, self.ttl)
+            return keranjang.ubah_jumlah(product_id, jumlah, periksa_stok=False)
+
+    def hapus(self, keranjang, product_id):
+        """Hapus satu baris dan lepas reservasinya"""
+        with keranjang.lock:
+            with self.buka_cursor() as cursor:
+                lepas_reservasi(cursor, keranjang.id, product_id)
+            return keranjang.hapus(product_id)
+
+    def batalkan(self, keranjang):
+        """Kosongkan keranjang dan lepas semua reservasinya"""
+        with keranjang.lock:
+            if keranjang:
+                with self.buka_cursor() as cursor:
+                    lepas_reservasi(cursor, keranjang.id)
+            keranjang.kosongkan()
+        self._lupakan(keranjang)
+
+    # Harga
+
+    def mesin_promosi(self, cursor):
+        """Mesin promosi terkompilasi; dikompilasi ulang hanya bila versi promosi berubah"""
+        mesin = self._mesin
+        if mesin is None or mesin.versi != versi_promosi(cursor):
+            mesin = self._mesin = muat_mesin_promosi(cursor)
+        return mesin
+
+    def hitung_harga(self, keranjang, member=False, sekarang=None):
+        """Baris keranjang setelah promosi (discount_amount, promotion_id) dan total neto"""
+        with self.buka_cursor() as cursor:
+            mesin = self.mesin_promosi(cursor)
+        return mesin.hitung(keranjang.items(), sekarang, member)
+
+    # Commit
+
+    def pelanggan(self, customer_id):
+        """Data pelanggan; CheckoutError bila tidak ada"""
+        with self.buka_cursor() as cursor:
+            pelanggan = ambil_pelanggan(cursor, customer_id)
+        if pelanggan is None:
+            raise CheckoutError(f"Pelanggan dengan ID {customer_id} tidak ditemukan.")
+        return pelanggan
+
+    def checkout(self, keranjang, metode_pembayaran, jumlah_pembayaran, cashier_id, nama_pelanggan=None,
+                 member=False, customer_id=None):
+        """Simpan penjualan keranjang dalam satu transaksi lalu kosongkan keranjang
+
+        Dengan `customer_id`, nama pelanggan diambil dari tabel customers dan
+        harga member berlaku bila pelanggan punya kode member. Hasil berisi
+        `offline: True` bila penjualan dicatat ke jurnal karena database tidak
+        tersedia. Penjualan pelanggan tidak bisa dicatat offline bila data
+        pelanggannya belum terbaca, karena harga member dan namanya tidak pasti.
+        """
+        with keranjang.lock:
+            if not keranjang:
+                raise CheckoutError("Keranjang belanja kosong.")
+            pelanggan = None
+            try:
+                if customer_id is not None:
+                    pelanggan = self.pelanggan(customer_id)
+                    nama_pelanggan = pelanggan['name']
+                    member = member or bool(pelanggan['member_code'])
+                items, _ = self.hitung_harga(keranjang, member)
+            except sqlite3.OperationalError as e:
+                if self.jurnal is None or not database_tidak_tersedia(e):
+                    raise
+                if customer_id is not None and pelanggan is None:
+                    raise CheckoutError(
+                        "Database tidak tersedia sehingga data pelanggan tidak bisa dibaca. "
+                        "Coba lagi, atau lanjutkan tanpa pelanggan."
+                    ) from e
+                # Tanpa database: pakai promosi terakhir yang sudah dikompilasi
+                items, _ = (self._mesin or MesinPromosi()).hitung(keranjang.items(), member=member)
+
+            # Penjualan yang akan ditolak tidak boleh lolos lewat jurnal offline
+            validasi_penjualan(items, jumlah_pembayaran)
+
+            try:
+                # Nomor invoice, header, item, dan stok ditulis dalam satu
+                # transaksi (satu commit); penolakan mengembalikan nomornya
+                with self.buka_cursor() as cursor:
+                    invoice = self.generator.ambil(cursor)
+                    hasil = simpan_checkout(
+                        cursor, items,
+                        invoice_number=invoice,
+                        metode_pembayaran=metode_pembayaran,
+                        jumlah_pembayaran=jumlah_pembayaran,
+                        cashier_id=cashier_id,
+                        nama_pelanggan=nama_pelanggan,
+                        cart_id=keranjang.id,
+                        customer_id=customer_id
+                    )
+                    bersihkan_reservasi_kedaluwarsa(cursor)
+            except sqlite3.OperationalError as e:
+                if self.jurnal is None or not database_tidak_tersedia(e):
+                    raise
+                # Database terkunci/tidak tersedia: penjualan tetap jalan lewat jurnal lokal
+                hasil = self._catat_ke_jurnal(
+                    keranjang.id, items, self.generator.nomor_offline(), metode_pembayaran, jumlah_pembayaran,
+                    cashier_id, nama_pelanggan, customer_id
+                )
+            keranjang.kosongkan()  # reservasi sudah dilepas di transaksi checkout
+        self._lupakan(keranjang)
+
+        # Pekerjaan non-transaksional berjalan di latar, bukan di jalur commit
+        if self.hooks is not None:
+            self.hooks.picu("checkout", dict(hasil, items=items, customer_id=customer_id))
+        return hasil
+
+    def checkout_langsung(self, baris, metode_pembayaran, jumlah_pembayaran, cashier_id, nama_pelanggan=None,
+                          member=False, customer_id=None):
+        """Checkout sekali jalan tanpa keranjang tersimpan (kiosk/scanner)
+
+        `baris` berisi dict dengan `product_id` atau `barcode` dan `jumlah`.
+        Stok divalidasi saat commit, tanpa reservasi.
+        """
+        keranjang = Keranjang()
+        with self.buka_cursor() as cursor:
+            for b in baris:
+                produk = ambil_produk(cursor, b.get('product_id'), b.get('barcode'))
+                if produk is None:
+                    raise CheckoutError(f"Produk tidak ditemukan: {b.get('product_id') or b.get('barcode')}")
+                keranjang.tambah(produk, int(b.get('jumlah', 1)), periksa_stok=False)
+        return self.checkout(
+            keranjang, metode_pembayaran, jumlah_pembayaran, cashier_id, nama_pelanggan, member, customer_id
+        )
+
+    def _catat_ke_jurnal(self, cart_id, items, invoice, metode_pembayaran, jumlah_pembayaran,
+                         cashier_id, nama_pelanggan, customer_id=None):
+        total, diskon = validasi_penjualan(items, jumlah_pembayaran)
+        tanggal = _waktu()
+        self.jurnal.tulis({
+            'invoice_number': invoice,
+            'items': items,
+            'metode_pembayaran': metode_pembayaran,
+            'jumlah_pembayaran': jumlah_pembayaran,
+            'cashier_id': cashier_id,
+            'nama_pelanggan': nama_pelanggan,
+            'customer_id': customer_id,
+            'tanggal': tanggal,
+            'cart_id': cart_id,
+        })
+        return {
+            'id_transaksi': invoice,
+            'total': total,
+            'diskon': diskon,
+            'pembayaran': jumlah_pembayaran,
+            'kembalian': jumlah_pembayaran - total,
+            'tanggal': tanggal,
+            'offline': True,
+        }
@@ -0,0 +1,10 @@
+import streamlit as st
+
+# st.fragment (>= 1.37) / st.experimental_fragment (1.33 - 1.36). On older
+# Streamlit versions the decorated function simply runs as part of the full rerun.
+_fragment_st = getattr(st, "fragment", None) or getattr(st, "experimental_fragment", None)
+fragment = _fragment_st or (lambda func: func)
+
+def fragment_berkala(detik):
+    """Dekorator fragment yang dijalankan ulang sendiri tiap `detik`; None bila tidak didukung"""
+    return _fragment_st(run_every=detik) if _fragment_st else None
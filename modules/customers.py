@@ -0,0 +1,52 @@
+import re
+
+KOLOM_PELANGGAN = "id, name, phone, member_code"
+
+def normalisasi_telepon(telepon):
+    """Nomor HP hanya angka, awalan 62 diganti 0 (0812..., +62 812... dan 62812... sama)"""
+    angka = re.sub(r"\D", "", telepon or "")
+    if angka.startswith("62"):
+        angka = "0" + angka[2:]
+    return angka or None
+
+def ambil_pelanggan(cursor, customer_id):
+    cursor.execute(f"SELECT {KOLOM_PELANGGAN} FROM customers WHERE id = ?", (customer_id,))
+    row = cursor.fetchone()
+    return dict(row) if row else None
+
+def simpan_pelanggan(cursor, nama, telepon=None, kode_member=None, customer_id=None):
+    """Tambah (atau ubah bila customer_id diisi) pelanggan; mengembalikan id-nya"""
+    data = (nama.strip(), normalisasi_telepon(telepon), (kode_member or "").strip() or None)
+    if customer_id is None:
+        cursor.execute("INSERT INTO customers (name, phone, member_code) VALUES (?, ?, ?)", data)
+        return cursor.lastrowid
+    cursor.execute("""
+        UPDATE customers SET name = ?, phone = ?, member_code = ?, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, data + (customer_id,))
+    return customer_id
+
+def riwayat_pembelian(cursor, customer_id, setelah=None, batas=10):
+    """Transaksi terbaru satu pelanggan, terbaru dulu
+
+    Dibaca seluruhnya dari indeks covering idx_transactions_customer (tanpa
+    menyentuh tabel), jadi tetap instan berapa pun umur datanya. `setelah`
+    adalah created_at baris terakhir halaman sebelumnya.
+    """
+    if setelah:
+        cursor.execute("""
+            SELECT invoice_number, created_at, total_amount, payment_method
+            FROM transactions
+            WHERE customer_id = ? AND created_at < ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (customer_id, setelah, batas))
+    else:
+        cursor.execute("""
+            SELECT invoice_number, created_at, total_amount, payment_method
+            FROM transactions
+            WHERE customer_id = ?
+            ORDER BY created_at DESC
+            LIMIT ?
+        """, (customer_id, batas))
+    return [dict(row) for row in cursor.fetchall()]
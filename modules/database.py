@@ -1,8 +1,9 @@
-import os
 import sqlite3
+import threading
 import streamlit as st
 from contextlib import contextmanager
 from typing import Optional, Dict, Any
+from .schema import DB_PATH, DB_TIMEOUT, init_schema, open_connection
 
 class DatabaseConnection:
     _instance = None
@@ -19,82 +20,35 @@ class DatabaseConnection:
 
     def _initialize_connection(self):
         """Initialize database connection"""
-        os.makedirs('data', exist_ok=True)
-        self._connection = sqlite3.connect('data/pos_database.db', check_same_thread=False)
-        self._connection.row_factory = sqlite3.Row
+        self._connection = open_connection()
+        # The connection is shared by every Streamlit session thread; serialize
+        # transactions so one session's commit/rollback never splits another's
+        self._lock = threading.RLock()
         self._init_database()
 
     def _init_database(self):
         """Initialize database schema"""
         with self.get_cursor() as cursor:
-            # Create users table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                role TEXT NOT NULL CHECK (role IN ('admin', 'cashier')),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
+            init_schema(cursor)
 
-            # Create products table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                price REAL NOT NULL CHECK (price >= 0),
-                stock INTEGER NOT NULL DEFAULT 0 CHECK (stock >= 0),
-                category TEXT NOT NULL,
-                description TEXT,
-                barcode TEXT UNIQUE,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-            ''')
-
-            # Create transactions table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transactions (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                invoice_number TEXT UNIQUE NOT NULL,
-                customer_name TEXT,
-                total_amount REAL NOT NULL CHECK (total_amount >= 0),
-                payment_amount REAL NOT NULL CHECK (payment_amount >= 0),
-                payment_method TEXT NOT NULL,
-                cashier_id INTEGER NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (cashier_id) REFERENCES users (id)
-            )
-            ''')
-
-            # Create transaction_items table
-            cursor.execute('''
-            CREATE TABLE IF NOT EXISTS transaction_items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                transaction_id TEXT NOT NULL,
-                product_id INTEGER NOT NULL,
-                quantity INTEGER NOT NULL CHECK (quantity > 0),
-                price_per_unit REAL NOT NULL CHECK (price_per_unit >= 0),
-                subtotal REAL NOT NULL CHECK (subtotal >= 0),
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (transaction_id) REFERENCES transactions (invoice_number),
-                FOREIGN KEY (product_id) REFERENCES products (id)
-            )
-            ''')
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """The underlying sqlite3 connection (for pandas.read_sql_query and friends)"""
+        return self._connection
 
     @contextmanager
     def get_cursor(self):
-        """Context manager for database cursor"""
-        cursor = self._connection.cursor()
-        try:
-            yield cursor
-            self._connection.commit()
-        except Exception as e:
-            self._connection.rollback()
-            raise e
-        finally:
-            cursor.close()
+        """Context manager for database cursor (one transaction per block)"""
+        with self._lock:
+            cursor = self._connection.cursor()
+            try:
+                yield cursor
+                self._connection.commit()
+            except Exception as e:
+                self._connection.rollback()
+                raise e
+            finally:
+                cursor.close()
 
     def execute_query(self, query: str, params: tuple = ()) -> Optional[list]:
         """Execute a query and return results"""
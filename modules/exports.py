@@ -0,0 +1,188 @@
+import csv
+import gzip
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from .schema import open_connection
+
+# Ekspor laporan dibuat hanya saat diminta, di thread latar, langsung ke file
+# di disk: baris dialirkan per chunk dari database (atau dari DataFrame yang
+# sudah ada) ke CSV/CSV gzip/xlsxwriter mode constant_memory, jadi memori
+# tetap kecil berapa pun jumlah barisnya.
+
+EKSPOR_DIR = os.environ.get("POS_EXPORT_DIR", "data/exports")
+
+FORMAT_EKSPOR = {
+    'csv': ("CSV", ".csv", "text/csv"),
+    'csv.gz': ("CSV (gzip)", ".csv.gz", "application/gzip"),
+    'xlsx': ("Excel", ".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+BARIS_MAKS_XLSX = 1_048_575  # batas baris satu sheet Excel, tanpa header
+
+class SumberKueri:
+    """Baris hasil kueri SQL, dibaca per chunk lewat koneksi milik thread ekspor"""
+
+    def __init__(self, sql, params=(), db_path=None, ukuran_chunk=5000):
+        self.sql = sql
+        self.params = tuple(params)
+        self.db_path = db_path
+        self.ukuran_chunk = ukuran_chunk
+
+    def baca(self):
+        """Generator: (kolom, total) lebih dulu, lalu daftar baris per chunk"""
+        conn = open_connection(self.db_path)
+        try:
+            total = conn.execute(f"SELECT COUNT(*) FROM ({self.sql})", self.params).fetchone()[0]
+            cursor = conn.execute(self.sql, self.params)
+            yield [d[0] for d in cursor.description], total
+            while True:
+                chunk = cursor.fetchmany(self.ukuran_chunk)
+                if not chunk:
+                    break
+                yield [tuple(row) for row in chunk]
+        finally:
+            conn.close()
+
+class SumberBingkai:
+    """Baris DataFrame yang sudah ada di memori (mis. hasil agregat laporan)"""
+
+    def __init__(self, df, ukuran_chunk=5000):
+        self.df = df
+        self.ukuran_chunk = ukuran_chunk
+
+    def baca(self):
+        yield [str(k) for k in self.df.columns], len(self.df)
+        for mulai in range(0, len(self.df), self.ukuran_chunk):
+            bagian = self.df.iloc[mulai:mulai + self.ukuran_chunk].astype(object)
+            yield list(bagian.where(bagian.notna(), None).itertuples(index=False, name=None))
+
+def tulis_csv(path, kolom, chunks, progres, kompres=False):
+    buka = gzip.open if kompres else open
+    with buka(path, "wt", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(kolom)
+        for chunk in chunks:
+            writer.writerows(chunk)
+            progres(len(chunk))
+
+def tulis_xlsx(path, kolom, chunks, progres):
+    import xlsxwriter
+
+    # constant_memory: setiap baris langsung ditulis ke file sementara
+    workbook = xlsxwriter.Workbook(path, {
+        'constant_memory': True,
+        'nan_inf_to_errors': True,
+        'remove_timezone': True,
+        'default_date_format': 'yyyy-mm-dd hh:mm:ss',
+    })
+    try:
+        sheet, nomor_sheet, baris = None, 0, BARIS_MAKS_XLSX
+        for chunk in chunks:
+            for row in chunk:
+                if baris >= BARIS_MAKS_XLSX:
+                    nomor_sheet += 1
+                    sheet = workbook.add_worksheet("Laporan" if nomor_sheet == 1 else f"Laporan {nomor_sheet}")
+                    sheet.write_row(0, 0, kolom)
+                    baris = 0
+                baris += 1
+                sheet.write_row(baris, 0, row)
+            progres(len(chunk))
+        if sheet is None:
+            workbook.add_worksheet("Laporan").write_row(0, 0, kolom)
+    finally:
+        workbook.close()
+
+class TugasEkspor:
+    """Status satu ekspor: antri -> berjalan -> selesai/gagal"""
+
+    def __init__(self, nama_file, format_ekspor, path):
+        self.id = uuid.uuid4().hex
+        self.nama_file = nama_file
+        self.format = format_ekspor
+        self.mime = FORMAT_EKSPOR[format_ekspor][2]
+        self.path = path
+        self.status = 'antri'
+        self.baris = 0
+        self.total = None
+        self.error = None
+        self.dibuat = time.time()
+
+    @property
+    def selesai(self):
+        return self.status in ('selesai', 'gagal')
+
+    @property
+    def progres(self):
+        if self.status == 'selesai':
+            return 1.0
+        return min(self.baris / self.total, 1.0) if self.total else 0.0
+
+class PekerjaEkspor:
+    """Thread pool ekspor dengan registri tugas yang bisa dipantau UI
+
+    File ditulis ke `<path>.tmp` lalu di-rename setelah lengkap, jadi yang
+    diunduh tidak pernah file setengah jadi. File dan tugas yang lebih tua
+    dari `umur_maks` detik dihapus saat tugas baru dikirim.
+    """
+
+    def __init__(self, direktori=EKSPOR_DIR, maks_pekerja=2, umur_maks=3600):
+        self.direktori = direktori
+        self.umur_maks = umur_maks
+        self._executor = ThreadPoolExecutor(max_workers=maks_pekerja, thread_name_prefix="ekspor")
+        self._tugas = {}
+        self._lock = threading.Lock()
+        os.makedirs(direktori, exist_ok=True)
+
+    def kirim(self, sumber, nama_dasar, format_ekspor='csv'):
+        """Jadwalkan ekspor `sumber` ke `nama_dasar` + ekstensi format; mengembalikan TugasEkspor"""
+        ekstensi = FORMAT_EKSPOR[format_ekspor][1]
+        self._bersihkan_lama()
+        tugas = TugasEkspor(nama_dasar + ekstensi, format_ekspor, None)
+        tugas.path = os.path.join(self.direktori, f"{tugas.id}{ekstensi}")
+        with self._lock:
+            self._tugas[tugas.id] = tugas
+        self._executor.submit(self._jalankan, tugas, sumber)
+        return tugas
+
+    def tugas(self, tugas_id):
+        with self._lock:
+            return self._tugas.get(tugas_id)
+
+    def _jalankan(self, tugas, sumber):
+        sementara = tugas.path + ".tmp"
+        tugas.status = 'berjalan'
+        try:
+            chunks = sumber.baca()
+            kolom, tugas.total = next(chunks)
+
+            def progres(n):
+                tugas.baris += n
+
+            if tugas.format == 'xlsx':
+                tulis_xlsx(sementara, kolom, chunks, progres)
+            else:
+                tulis_csv(sementara, kolom, chunks, progres, kompres=tugas.format == 'csv.gz')
+            os.replace(sementara, tugas.path)
+            tugas.status = 'selesai'
+        except Exception as e:
+            tugas.error = str(e)
+            tugas.status = 'gagal'
+            if os.path.exists(sementara):
+                os.remove(sementara)
+
+    def _bersihkan_lama(self):
+        batas = time.time() - self.umur_maks
+        with self._lock:
+            lama = [t for t in self._tugas.values() if t.selesai and t.dibuat < batas]
+            for t in lama:
+                del self._tugas[t.id]
+        for t in lama:
+            if os.path.exists(t.path):
+                os.remove(t.path)
+
+    def tutup(self, tunggu=True):
+        self._executor.shutdown(wait=tunggu)
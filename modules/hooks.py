@@ -0,0 +1,95 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+class RegistriHook:
+    """Registri hook pasca-commit yang dijalankan di thread pool terbatas
+
+    Hook didaftarkan per peristiwa (mis. "checkout") dan dipanggil dengan satu
+    argumen payload setelah transaksi database selesai di-commit, sehingga
+    kasir tidak menunggu pekerjaan yang tidak wajib transaksional.
+
+    - Backpressure: paling banyak `maks_antrean` pekerjaan menunggu/berjalan;
+      bila penuh, pekerjaan baru ditolak (dan dicatat) alih-alih menumpuk.
+    - Retry: hook yang melempar exception dicoba lagi dengan backoff
+      eksponensial sampai `percobaan` kali.
+    - Metrik: jumlah sukses/gagal/retry/ditolak dan durasi per hook.
+    """
+
+    def __init__(self, maks_pekerja=2, maks_antrean=100, percobaan=3, jeda_awal=0.5):
+        self._executor = ThreadPoolExecutor(max_workers=maks_pekerja, thread_name_prefix="hook")
+        self._slot = threading.BoundedSemaphore(maks_antrean)
+        self._hooks = {}
+        self._lock = threading.Lock()
+        self._metrik = {}
+        self.percobaan = percobaan
+        self.jeda_awal = jeda_awal
+
+    def daftar(self, peristiwa, fungsi=None, nama=None, percobaan=None):
+        """Daftarkan hook untuk `peristiwa`; bisa dipakai sebagai dekorator"""
+        def _daftar(fungsi):
+            hook = (nama or fungsi.__name__, fungsi, percobaan or self.percobaan)
+            with self._lock:
+                self._hooks.setdefault(peristiwa, []).append(hook)
+                self._metrik.setdefault(hook[0], {
+                    'sukses': 0, 'gagal': 0, 'retry': 0, 'ditolak': 0,
+                    'durasi_total': 0.0, 'durasi_maks': 0.0, 'error_terakhir': None,
+                })
+            return fungsi
+        return _daftar(fungsi) if fungsi else _daftar
+
+    def picu(self, peristiwa, payload):
+        """Jadwalkan semua hook `peristiwa` tanpa menunggu; mengembalikan jumlah yang dijadwalkan"""
+        dijadwalkan = 0
+        for nama, fungsi, percobaan in self._hooks.get(peristiwa, ()):
+            if not self._slot.acquire(blocking=False):
+                self._catat(nama, ditolak=1)
+                logger.warning("Antrean hook penuh, %s untuk %s dilewati", nama, peristiwa)
+                continue
+            self._executor.submit(self._jalankan, nama, fungsi, percobaan, payload)
+            dijadwalkan += 1
+        return dijadwalkan
+
+    def _jalankan(self, nama, fungsi, percobaan, payload):
+        try:
+            jeda = self.jeda_awal
+            for ke in range(1, percobaan + 1):
+                mulai = time.perf_counter()
+                try:
+                    fungsi(payload)
+                except Exception as e:
+                    if ke == percobaan:
+                        self._catat(nama, gagal=1, error=str(e))
+                        logger.exception("Hook %s gagal setelah %d percobaan", nama, percobaan)
+                        return
+                    self._catat(nama, retry=1, error=str(e))
+                    time.sleep(jeda)
+                    jeda *= 2
+                else:
+                    self._catat(nama, sukses=1, durasi=time.perf_counter() - mulai)
+                    return
+        finally:
+            self._slot.release()
+
+    def _catat(self, nama, sukses=0, gagal=0, retry=0, ditolak=0, durasi=0.0, error=None):
+        with self._lock:
+            m = self._metrik[nama]
+            m['sukses'] += sukses
+            m['gagal'] += gagal
+            m['retry'] += retry
+            m['ditolak'] += ditolak
+            m['durasi_total'] += durasi
+            m['durasi_maks'] = max(m['durasi_maks'], durasi)
+            if error:
+                m['error_terakhir'] = error
+
+    def metrik(self):
+        """Salinan metrik per hook"""
+        with self._lock:
+            return {nama: dict(m) for nama, m in self._metrik.items()}
+
+    def tutup(self, tunggu=True):
+        self._executor.shutdown(wait=tunggu)
@@ -0,0 +1,254 @@
+import json
+import os
+import threading
+from datetime import datetime
+
+from .checkout import database_tidak_tersedia, simpan_checkout
+
+JURNAL_PATH = os.environ.get("POS_JOURNAL_PATH", "data/journal/checkout.jsonl")
+
+class JurnalCheckout:
+    """Jurnal penjualan append-only di disk lokal
+
+    Setiap penjualan yang gagal ditulis ke database ditambahkan sebagai satu
+    baris JSON lalu di-fsync sebelum kasir melihat hasilnya. Posisi (byte
+    offset) entri yang sudah diterapkan disimpan di file `.offset` terpisah
+    yang diganti secara atomik, jadi pemutaran ulang bisa dilanjutkan setelah
+    aplikasi mati di tengah jalan. Entri yang terus ditolak database dipindah
+    ke file `.gagal` (dead letter) beserta errornya untuk ditangani manual.
+    """
+
+    def __init__(self, path=JURNAL_PATH):
+        self.path = path
+        self.path_offset = path + ".offset"
+        self.path_gagal = path + ".gagal"
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    def _tambahkan(self, path, objek):
+        data = (json.dumps(objek, separators=(",", ":"), ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(path, "ab") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def tulis(self, entri):
+        """Tambahkan satu entri dan pastikan sudah sampai ke disk"""
+        self._tambahkan(self.path, entri)
+
+    def tulis_gagal(self, entri, error):
+        """Pindahkan entri yang tidak bisa diterapkan ke file dead letter"""
+        self._tambahkan(self.path_gagal, {
+            'entri': entri,
+            'error': f"{type(error).__name__}: {error}",
+            'waktu': datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
+
+    def offset(self):
+        try:
+            with open(self.path_offset) as f:
+                offset = int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        # Offset di luar ukuran file berarti jurnal sudah dikosongkan tetapi
+        # aplikasi mati sebelum offset direset
+        ukuran = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        return offset if offset <= ukuran else 0
+
+    def _tulis_offset(self, offset):
+        sementara = self.path_offset + ".tmp"
+        with open(sementara, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(sementara, self.path_offset)
+
+    def baca_tertunda(self, batas=200):
+        """Entri yang belum diterapkan: daftar (offset_akhir, entri), urut sesuai jurnal
+
+        Baris terakhir yang belum lengkap (aplikasi mati saat menulis) diabaikan.
+        """
+        hasil = []
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset())
+                for baris in f:
+                    if not baris.endswith(b"\n"):
+                        break
+                    hasil.append((f.tell(), json.loads(baris)))
+                    if len(hasil) >= batas:
+                        break
+        except FileNotFoundError:
+            pass
+        return hasil
+
+    def tandai_diterapkan(self, offset):
+        """Simpan offset entri terakhir yang sudah di-commit ke database"""
+        with self._lock:
+            self._tulis_offset(offset)
+            # Jurnal yang sudah habis diputar dikosongkan agar tidak tumbuh terus
+            if os.path.getsize(self.path) == offset:
+                os.truncate(self.path, 0)
+                self._tulis_offset(0)
+
+    def jumlah_tertunda(self):
+        """Jumlah entri lengkap yang belum diterapkan (tanpa parsing JSON)"""
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset())
+                return f.read().count(b"\n")
+        except FileNotFoundError:
+            return 0
+
+    def jumlah_gagal(self):
+        """Jumlah entri di file dead letter"""
+        try:
+            with open(self.path_gagal, "rb") as f:
+                return f.read().count(b"\n")
+        except FileNotFoundError:
+            return 0
+
+def terapkan_batch(cursor, entri_list):
+    """Terapkan sekumpulan entri jurnal dalam transaksi milik `cursor` (idempoten)
+
+    Invoice yang sudah ada di database dilewati (dicek dengan satu kueri IN),
+    jadi entri yang terputar dua kali tidak tercatat ganda.
+    """
+    invoices = [e['invoice_number'] for e in entri_list]
+    placeholders = ', '.join(['?'] * len(invoices))
+    cursor.execute(
+        f"SELECT invoice_number FROM transactions WHERE invoice_number IN ({placeholders})",
+        invoices
+    )
+    sudah_ada = {row[0] for row in cursor.fetchall()}
+
+    diterapkan = 0
+    for entri in entri_list:
+        if entri['invoice_number'] in sudah_ada:
+            continue
+        simpan_checkout(
+            cursor,
+            entri['items'],
+            invoice_number=entri['invoice_number'],
+            metode_pembayaran=entri['metode_pembayaran'],
+            jumlah_pembayaran=entri['jumlah_pembayaran'],
+            cashier_id=entri['cashier_id'],
+            nama_pelanggan=entri.get('nama_pelanggan'),
+            tanggal=entri['tanggal'],
+            cart_id=entri.get('cart_id'),
+            penjualan_offline=True,
+            customer_id=entri.get('customer_id')
+        )
+        sudah_ada.add(entri['invoice_number'])
+        diterapkan += 1
+    return diterapkan
+
+class PemutarJurnal(threading.Thread):
+    """Thread latar yang memutar ulang jurnal ke database secara berurutan
+
+    Entri diterapkan per batch dalam satu transaksi; offset baru dicatat
+    setelah commit berhasil. Saat database masih terkunci/tidak tersedia,
+    pemutar menunggu dengan backoff lalu mencoba lagi.
+
+    Bila batch ditolak karena hal lain (CheckoutError, IntegrityError, ...),
+    entrinya diterapkan satu per satu: entri yang ditolak dicoba lagi dengan
+    backoff dan setelah `maks_percobaan` kali dipindah ke file dead letter,
+    jadi penjualan sesudahnya tidak ikut tertahan. Pemindahan dilaporkan
+    lewat `error_terakhir`.
+    """
+
+    def __init__(self, jurnal, buka_koneksi, ukuran_batch=200, interval=2.0, backoff_maks=60.0,
+                 maks_percobaan=3):
+        super().__init__(name="pemutar-jurnal", daemon=True)
+        self.jurnal = jurnal
+        self.buka_koneksi = buka_koneksi
+        self.ukuran_batch = ukuran_batch
+        self.interval = interval
+        self.backoff_maks = backoff_maks
+        self.maks_percobaan = maks_percobaan
+        self.total_diterapkan = 0
+        self.total_gagal = 0
+        self.error_terakhir = None
+        self._pesan_gagal = None  # tetap dilaporkan setelah putaran yang berhasil
+        self._percobaan = {}  # invoice -> jumlah percobaan yang ditolak
+        self._berhenti = threading.Event()
+        self._bangun = threading.Event()
+
+    def tulis(self, entri):
+        """Tulis entri ke jurnal lalu segera coba putar ulang"""
+        self.jurnal.tulis(entri)
+        self.bangunkan()
+
+    def bangunkan(self):
+        """Minta pemutaran segera (mis. setelah entri baru ditulis)"""
+        self._bangun.set()
+
+    def hentikan(self):
+        self._berhenti.set()
+        self._bangun.set()
+
+    def putar_sekali(self):
+        """Terapkan semua entri tertunda; mengembalikan jumlah entri yang diterapkan"""
+        total = 0
+        conn = self.buka_koneksi()
+        try:
+            while True:
+                batch = self.jurnal.baca_tertunda(self.ukuran_batch)
+                if not batch:
+                    return total
+                try:
+                    with conn:
+                        cursor = conn.cursor()
+                        total += terapkan_batch(cursor, [entri for _, entri in batch])
+                except Exception as e:
+                    if database_tidak_tersedia(e):
+                        raise
+                    total += self._putar_per_entri(conn, batch)
+                    continue
+                self.jurnal.tandai_diterapkan(batch[-1][0])
+                self.total_diterapkan += len(batch)
+        finally:
+            conn.close()
+
+    def _putar_per_entri(self, conn, batch):
+        """Terapkan batch satu entri per transaksi untuk memisahkan entri yang ditolak"""
+        total = 0
+        for offset, entri in batch:
+            invoice = entri.get('invoice_number')
+            try:
+                with conn:
+                    total += terapkan_batch(conn.cursor(), [entri])
+            except Exception as e:
+                if database_tidak_tersedia(e):
+                    raise
+                percobaan = self._percobaan.get(invoice, 0) + 1
+                if percobaan < self.maks_percobaan:
+                    # Urutan jurnal dipertahankan: dicoba lagi setelah backoff
+                    self._percobaan[invoice] = percobaan
+                    raise
+                self.jurnal.tulis_gagal(entri, e)
+                self.total_gagal += 1
+                self._pesan_gagal = (
+                    f"Transaksi {invoice} dipindah ke {self.jurnal.path_gagal} "
+                    f"setelah {percobaan} percobaan: {e}"
+                )
+            else:
+                self.total_diterapkan += 1
+            self._percobaan.pop(invoice, None)
+            self.jurnal.tandai_diterapkan(offset)
+        return total
+
+    def run(self):
+        jeda = self.interval
+        while not self._berhenti.is_set():
+            try:
+                self.putar_sekali()
+                self.error_terakhir = self._pesan_gagal
+                jeda = self.interval
+            except Exception as e:
+                # Apa pun errornya thread tetap hidup; entri dicoba lagi nanti
+                self.error_terakhir = str(e)
+                jeda = min(jeda * 2, self.backoff_maks)
+            self._bangun.wait(jeda)
+            self._bangun.clear()
@@ -1,23 +1,36 @@
 import streamlit as st
 import pandas as pd
+from .compat import fragment
 from .database import get_db_connection
+from .search import perbarui_indeks_produk
+from .stock_take import stock_take_page
+from .sync import adalah_terminal
+
+PRODUCT_PAGES = {
+    "Daftar Produk": lambda: display_product_list(),
+    "Tambah Produk": lambda: add_product_form(),
+    "Update Stok": lambda: update_stock_form(),
+    "Ubah Harga Massal": lambda: bulk_repricing_form(),
+    "Stock Opname": lambda: stock_take_page(),
+}
+
+REPRICING_RULES = {
+    "Persentase (%)": "percent",
+    "Selisih Tetap (Rp)": "delta",
+}
+
+ROUNDING_OPTIONS = [0, 100, 500, 1000]
 
 def product_management():
     """Manage products - add, update, delete, view"""
     st.title("Manajemen Produk")
     
-    # Create tabs for different product management operations
-    tab1, tab2, tab3 = st.tabs(["Daftar Produk", "Tambah Produk", "Update Stok"])
-    
-    with tab1:
-        display_product_list()
-    
-    with tab2:
-        add_product_form()
-    
-    with tab3:
-        update_stock_form()
+    # Only the active page is rendered; st.tabs would run (and query) all of them
+    page = st.radio("Menu Produk", list(PRODUCT_PAGES.keys()), horizontal=True,
+                    label_visibility="collapsed", key="product_page")
+    PRODUCT_PAGES[page]()
 
+@fragment
 def display_product_list():
     """Display the list of products with search and filter options"""
     st.subheader("Daftar Produk")
@@ -69,6 +82,7 @@ def display_product_list():
             name = st.text_input("Nama Produk", st.session_state.edit_product_data['name'])
             price = st.number_input("Harga (Rp)", min_value=0.0, value=float(st.session_state.edit_product_data['price']))
             stock = st.number_input("Stok", min_value=0, value=int(st.session_state.edit_product_data['stock']))
+            reorder_level = st.number_input("Batas Stok Minimum", min_value=0, value=int(st.session_state.edit_product_data.get('reorder_level', 10)))
             category = st.text_input("Kategori", st.session_state.edit_product_data['category'])
             description = st.text_area("Deskripsi", st.session_state.edit_product_data.get('description', ''))
             barcode = st.text_input("Barcode (Opsional)", st.session_state.edit_product_data.get('barcode', ''))
@@ -80,6 +94,7 @@ def display_product_list():
                     'name': name,
                     'price': price,
                     'stock': stock,
+                    'reorder_level': reorder_level,
                     'category': category,
                     'description': description,
                     'barcode': barcode
@@ -93,6 +108,7 @@ def display_product_list():
                 del st.session_state.edit_product_data
                 st.experimental_rerun()
 
+@fragment
 def add_product_form():
     """Form to add a new product"""
     st.subheader("Tambah Produk Baru")
@@ -101,6 +117,7 @@ def add_product_form():
         name = st.text_input("Nama Produk")
         price = st.number_input("Harga (Rp)", min_value=0.0, step=1000.0)
         stock = st.number_input("Stok Awal", min_value=0)
+        reorder_level = st.number_input("Batas Stok Minimum", min_value=0, value=10)
         category = st.text_input("Kategori")
         description = st.text_area("Deskripsi (Opsional)")
         barcode = st.text_input("Barcode (Opsional)")
@@ -115,66 +132,127 @@ def add_product_form():
                     'name': name,
                     'price': price,
                     'stock': stock,
+                    'reorder_level': reorder_level,
                     'category': category,
                     'description': description,
                     'barcode': barcode
                 }
                 
-                add_product(product_data)
-                st.success(f"Produk {name} berhasil ditambahkan")
-                st.experimental_rerun()
+                success, message = add_product(product_data)
+                if success:
+                    st.success(f"Produk {name} berhasil ditambahkan")
+                    st.experimental_rerun()
+                else:
+                    st.error(message)
 
+@fragment
 def update_stock_form():
     """Form to update product stock"""
     st.subheader("Update Stok Produk")
     
-    products = get_products()
-    if not products:
-        st.info("Tidak ada produk yang terdaftar.")
+    # Server-side lookup: only the matching page of products is loaded
+    search_term = st.text_input("Cari Produk (nama, barcode, atau ID)", key="stock_search")
+    if not search_term:
+        st.info("Ketik nama, barcode, atau ID produk untuk mencari.")
         return
     
-    # Convert to list of dictionaries with id and name for the selectbox
-    product_options = [{"id": p["id"], "name": p["name"]} for p in products]
+    products = search_products(search_term)
+    if not products:
+        st.info("Tidak ada produk yang ditemukan.")
+        return
     
-    # Create a selectbox with product names
     selected_product = st.selectbox(
         "Pilih Produk",
-        options=range(len(product_options)),
-        format_func=lambda i: product_options[i]["name"]
+        options=range(len(products)),
+        format_func=lambda i: f"{products[i]['name']} (ID {products[i]['id']})"
     )
     
-    # Get the selected product ID
-    product_id = product_options[selected_product]["id"]
+    product = products[selected_product]
+    product_id = product["id"]
     
-    # Get the current product details
-    product = ambil_produk_berdasarkan_id(product_id)
+    st.write(f"Stok Saat Ini: {product['stock']}")
     
-    if product:
-        st.write(f"Stok Saat Ini: {product['stock']}")
-        
-        # Options for stock adjustment
-        action = st.radio("Tindakan", ["Tambah Stok", "Kurangi Stok"])
-        
-        # Amount to adjust
-        amount = st.number_input("Jumlah", min_value=1, value=1)
-        
-        # Reason for adjustment
-        reason = st.text_input("Alasan Penyesuaian (Opsional)")
+    # Options for stock adjustment
+    action = st.radio("Tindakan", ["Tambah Stok", "Kurangi Stok"])
+    
+    # Amount to adjust
+    amount = st.number_input("Jumlah", min_value=1, value=1)
+    
+    # Reason for adjustment
+    reason = st.text_input("Alasan Penyesuaian (Opsional)")
+    
+    if st.button("Update Stok"):
+        # Determine the adjustment (positive for addition, negative for reduction);
+        # the stock check happens in the UPDATE itself
+        adjustment = amount if action == "Tambah Stok" else -amount
         
-        if st.button("Update Stok"):
-            # Determine the adjustment (positive for addition, negative for reduction)
-            adjustment = amount if action == "Tambah Stok" else -amount
-            
-            # Check if reduction would result in negative stock
-            if action == "Kurangi Stok" and product["stock"] < amount:
-                st.error("Stok tidak mencukupi untuk pengurangan!")
-            else:
-                success, message = perbarui_stok_produk(product_id, adjustment, reason)
-                if success:
-                    st.success(message)
-                    st.experimental_rerun()
-                else:
-                    st.error(message)
+        success, message = perbarui_stok_produk(product_id, adjustment, reason)
+        if success:
+            st.success(message)
+            st.experimental_rerun()
+        else:
+            st.error(message)
+
+@fragment
+def bulk_repricing_form():
+    """Preview and apply a price change to every product matching a filter"""
+    st.subheader("Ubah Harga Massal")
+    
+    # Filter
+    col1, col2 = st.columns(2)
+    with col1:
+        category = st.selectbox("Kategori", ["Semua"] + get_product_categories(), key="reprice_category")
+        name_match = st.text_input("Nama Mengandung", key="reprice_name")
+    with col2:
+        min_price = st.number_input("Harga Minimum (Rp)", min_value=0.0, step=1000.0, key="reprice_min")
+        max_price = st.number_input("Harga Maksimum (Rp, 0 = tanpa batas)", min_value=0.0, step=1000.0, key="reprice_max")
+    
+    # Rule
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        rule_label = st.radio("Aturan", list(REPRICING_RULES.keys()), key="reprice_rule")
+    with col2:
+        value = st.number_input("Nilai", value=5.0, step=1.0, key="reprice_value")
+    with col3:
+        round_to = st.selectbox(
+            "Pembulatan",
+            ROUNDING_OPTIONS,
+            index=ROUNDING_OPTIONS.index(500),
+            format_func=lambda x: "Tanpa pembulatan" if x == 0 else f"Rp {x:,}",
+            key="reprice_round"
+        )
+    
+    filters = {
+        'category': category,
+        'name_match': name_match,
+        'min_price': min_price or None,
+        'max_price': max_price or None,
+    }
+    rule = REPRICING_RULES[rule_label]
+    
+    count, total_delta, preview = preview_bulk_repricing(filters, rule, value, round_to)
+    if count == 0:
+        st.info("Tidak ada produk yang harganya berubah dengan aturan ini.")
+        return
+    
+    st.write(f"**{count}** produk akan berubah harga (total selisih Rp {total_delta:,.0f}).")
+    st.dataframe(pd.DataFrame(preview), hide_index=True)
+    if count > len(preview):
+        st.caption(f"Menampilkan {len(preview)} dari {count} produk.")
+    
+    # Without any filter the change hits the whole catalog: require an explicit
+    # confirmation that names the number of affected products
+    confirmed = True
+    if repricing_is_unfiltered(filters):
+        st.warning("Tidak ada filter yang dipilih: perubahan berlaku untuk seluruh katalog.")
+        confirmed = st.checkbox(f"Ya, ubah harga semua {count} produk", key="reprice_all")
+    
+    if st.button("Terapkan Perubahan Harga", type="primary", disabled=not confirmed):
+        success, message = apply_bulk_repricing(dict(filters, all_products=confirmed), rule, value, round_to)
+        if success:
+            st.success(message)
+        else:
+            st.error(message)
 
 def get_products(search_term="", category="Semua"):
     """Get list of products with optional filtering"""
@@ -193,8 +271,6 @@ def get_products(search_term="", category="Semua"):
         response = query.order('name').execute()
         products = response.data
     else:  # SQLite connection
-        cursor = conn.cursor()
-        
         sql = "SELECT * FROM products"
         params = []
         
@@ -214,14 +290,32 @@ def get_products(search_term="", category="Semua"):
         
         sql += " ORDER BY name"
         
-        cursor.execute(sql, params)
-        products = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        products = conn.execute_query(sql, tuple(params)) or []
     
     return products
 
+def search_products(term, limit=20):
+    """Search products by name prefix, exact barcode or ID (bounded result set)"""
+    conn = get_db_connection()
+    term = term.strip()
+    
+    if hasattr(conn, 'table'):  # Supabase client
+        response = conn.table('products').select('*').ilike('name', f'{term}%').order('name').limit(limit).execute()
+        return response.data or []
+    
+    # Plain prefix LIKE (no ESCAPE clause) so SQLite can use idx_products_name
+    product_id = int(term) if term.isdigit() else -1
+    
+    return conn.execute_query("""
+        SELECT * FROM products
+        WHERE name LIKE ? OR barcode = ? OR id = ?
+        ORDER BY name
+        LIMIT ?
+    """, (term + '%', term, product_id, limit)) or []
+
+@st.cache_data(ttl=300, show_spinner=False)
 def get_product_categories():
-    """Get unique list of product categories"""
+    """Get unique list of product categories (cached; cleared whenever products change)"""
     conn = get_db_connection()
     
     # Determine if we're using Supabase or SQLite
@@ -229,10 +323,8 @@ def get_product_categories():
         response = conn.table('products').select('category').execute()
         categories = set(item['category'] for item in response.data)
     else:  # SQLite connection
-        cursor = conn.cursor()
-        cursor.execute("SELECT DISTINCT category FROM products ORDER BY category")
-        categories = set(row['category'] for row in cursor.fetchall())
-        conn.close()
+        rows = conn.execute_query("SELECT DISTINCT category FROM products ORDER BY category") or []
+        categories = set(row['category'] for row in rows)
     
     return sorted(list(categories))
 
@@ -247,13 +339,10 @@ def ambil_produk_berdasarkan_id(product_id):
             return response.data[0]
         return None
     else:  # SQLite connection
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products WHERE id = ?", (product_id,))
-        product = cursor.fetchone()
-        conn.close()
+        product = conn.execute_query("SELECT * FROM products WHERE id = ?", (product_id,))
         
         if product:
-            return dict(product)
+            return product[0]
         return None
 
 def add_product(product_data):
@@ -264,23 +353,27 @@ def add_product(product_data):
         # Determine if we're using Supabase or SQLite
         if hasattr(conn, 'table'):  # Supabase client
             response = conn.table('products').insert(product_data).execute()
+            get_product_categories.clear()
             return True, "Produk berhasil ditambahkan"
         else:  # SQLite connection
-            cursor = conn.cursor()
-            
             columns = ', '.join(product_data.keys())
             placeholders = ', '.join(['?'] * len(product_data))
             
             sql = f"INSERT INTO products ({columns}) VALUES ({placeholders})"
             
-            cursor.execute(sql, list(product_data.values()))
-            conn.commit()
-            conn.close()
+            with conn.get_cursor() as cursor:
+                # A terminal's catalog belongs to the central store; a local
+                # product would collide with the central product of the same id
+                if adalah_terminal(cursor):
+                    return False, "Terminal ini menerima katalog dari pusat; tambahkan produk baru di pusat"
+                cursor.execute(sql, list(product_data.values()))
+                product_id = cursor.lastrowid
+            
+            get_product_categories.clear()
+            perbarui_indeks_produk(product_id)
             
             return True, "Produk berhasil ditambahkan"
     except Exception as e:
-        if not hasattr(conn, 'table'):  # SQLite connection
-            conn.close()
         return False, f"Error: {str(e)}"
 
 def update_product(product_id, product_data):
@@ -291,24 +384,23 @@ def update_product(product_id, product_data):
         # Determine if we're using Supabase or SQLite
         if hasattr(conn, 'table'):  # Supabase client
             response = conn.table('products').update(product_data).eq('id', product_id).execute()
+            get_product_categories.clear()
             return True, "Produk berhasil diupdate"
         else:  # SQLite connection
-            cursor = conn.cursor()
-            
             set_clause = ', '.join([f"{key} = ?" for key in product_data.keys()])
             values = list(product_data.values())
             values.append(product_id)
             
-            sql = f"UPDATE products SET {set_clause} WHERE id = ?"
+            sql = f"UPDATE products SET {set_clause}, updated_at = CURRENT_TIMESTAMP WHERE id = ?"
+            
+            with conn.get_cursor() as cursor:
+                cursor.execute(sql, values)
             
-            cursor.execute(sql, values)
-            conn.commit()
-            conn.close()
+            get_product_categories.clear()
+            perbarui_indeks_produk(product_id)
             
             return True, "Produk berhasil diupdate"
     except Exception as e:
-        if not hasattr(conn, 'table'):  # SQLite connection
-            conn.close()
         return False, f"Error: {str(e)}"
 
 def delete_product(product_id):
@@ -319,75 +411,194 @@ def delete_product(product_id):
         # Determine if we're using Supabase or SQLite
         if hasattr(conn, 'table'):  # Supabase client
             response = conn.table('products').delete().eq('id', product_id).execute()
+            get_product_categories.clear()
             return True, "Produk berhasil dihapus"
         else:  # SQLite connection
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
-            conn.commit()
-            conn.close()
+            with conn.get_cursor() as cursor:
+                cursor.execute("DELETE FROM products WHERE id = ?", (product_id,))
+            
+            get_product_categories.clear()
+            perbarui_indeks_produk(product_id)
             
             return True, "Produk berhasil dihapus"
     except Exception as e:
-        if not hasattr(conn, 'table'):  # SQLite connection
-            conn.close()
         return False, f"Error: {str(e)}"
 
 def perbarui_stok_produk(product_id, adjustment, reason=""):
     """Update product stock by adding or subtracting"""
     conn = get_db_connection()
+    action = "ditambahkan" if adjustment > 0 else "dikurangi"
     
     try:
-        # Get current product info
-        product = ambil_produk_berdasarkan_id(product_id)
-        
-        if not product:
-            return False, "Produk tidak ditemukan"
-        
-        # Calculate new stock
-        new_stock = product['stock'] + adjustment
-        
-        # Prevent negative stock
-        if new_stock < 0:
-            return False, "Stok tidak boleh negatif"
-        
         # Determine if we're using Supabase or SQLite
         if hasattr(conn, 'table'):  # Supabase client
+            product = ambil_produk_berdasarkan_id(product_id)
+            if not product:
+                return False, "Produk tidak ditemukan"
+            
+            new_stock = product['stock'] + adjustment
+            if new_stock < 0:
+                return False, "Stok tidak boleh negatif"
+            
             response = conn.table('products').update({
                 'stock': new_stock,
                 'updated_at': 'now()'
             }).eq('id', product_id).execute()
             
-            action = "ditambahkan" if adjustment > 0 else "dikurangi"
             return True, f"Stok produk berhasil {action} menjadi {new_stock}"
         else:  # SQLite connection
-            cursor = conn.cursor()
+            # One guarded statement: a concurrent sale between reading and
+            # writing the stock can never drive it below zero
+            with conn.get_cursor() as cursor:
+                cursor.execute("""
+                    UPDATE products SET stock = stock + ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND stock + ? >= 0
+                """, (adjustment, product_id, adjustment))
+                updated = cursor.rowcount
+                cursor.execute("SELECT stock FROM products WHERE id = ?", (product_id,))
+                row = cursor.fetchone()
+            
+            if row is None:
+                return False, "Produk tidak ditemukan"
+            if not updated:
+                return False, f"Stok tidak mencukupi untuk pengurangan (stok saat ini {row['stock']})"
+            
+            return True, f"Stok produk berhasil {action} menjadi {row['stock']}"
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+
+def _repricing_filter(filters):
+    """Build the WHERE clause and parameters for a bulk repricing filter"""
+    clauses = []
+    params = []
+    
+    if filters.get('category') and filters['category'] != "Semua":
+        clauses.append("category = ?")
+        params.append(filters['category'])
+    if filters.get('name_match'):
+        clauses.append("name LIKE ?")
+        params.append(f"%{filters['name_match']}%")
+    if filters.get('min_price') is not None:
+        clauses.append("price >= ?")
+        params.append(filters['min_price'])
+    if filters.get('max_price') is not None:
+        clauses.append("price <= ?")
+        params.append(filters['max_price'])
+    
+    return (" AND ".join(clauses) or "1 = 1"), params
+
+def repricing_is_unfiltered(filters):
+    """True when no filter narrows the repricing, i.e. it would change the whole catalog"""
+    # Every filter clause carries a parameter
+    return not _repricing_filter(filters)[1]
+
+def _repricing_expression(rule, value, round_to=0):
+    """Build the SQL expression computing the new price from the current one"""
+    if rule == "percent":
+        expression = "price * (1 + ? / 100.0)"
+    elif rule == "delta":
+        expression = "price + ?"
+    else:
+        raise ValueError(f"Aturan harga tidak dikenal: {rule}")
+    params = [value]
+    
+    if round_to:
+        expression = f"ROUND(({expression}) / ?) * ?"
+        params += [float(round_to), float(round_to)]
+    
+    # Prices can never go negative (products.price has a CHECK constraint)
+    return f"MAX(0, {expression})", params
+
+def preview_bulk_repricing(filters, rule, value, round_to=0, limit=50):
+    """Return (count, total price delta, first rows of the diff) without changing anything"""
+    conn = get_db_connection()
+    where, where_params = _repricing_filter(filters)
+    expression, expression_params = _repricing_expression(rule, value, round_to)
+    
+    changed = f"SELECT id, name, category, price, {expression} AS new_price FROM products WHERE {where}"
+    params = expression_params + where_params
+    
+    summary = conn.execute_query(f"""
+        SELECT COUNT(*) AS count, COALESCE(SUM(new_price - price), 0) AS total_delta
+        FROM ({changed}) WHERE new_price != price
+    """, tuple(params))
+    if not summary:
+        return 0, 0, []
+    
+    rows = conn.execute_query(f"""
+        SELECT id, name, category, price AS harga_lama, new_price AS harga_baru,
+               new_price - price AS selisih
+        FROM ({changed}) WHERE new_price != price
+        ORDER BY name
+        LIMIT ?
+    """, tuple(params + [limit])) or []
+    
+    return summary[0]['count'], summary[0]['total_delta'], rows
+
+def apply_bulk_repricing(filters, rule, value, round_to=0):
+    """Reprice every matching product in a single set-based UPDATE
+
+    Without any filter this refuses unless `filters['all_products']` confirms
+    that the whole catalog is meant.
+    """
+    if repricing_is_unfiltered(filters) and not filters.get('all_products'):
+        return False, "Pilih minimal satu filter, atau konfirmasi perubahan untuk semua produk"
+    
+    conn = get_db_connection()
+    where, where_params = _repricing_filter(filters)
+    expression, expression_params = _repricing_expression(rule, value, round_to)
+    
+    try:
+        with conn.get_cursor() as cursor:
+            # Take the write lock first so the ids read here are exactly the
+            # rows the UPDATE changes
+            cursor.execute("BEGIN IMMEDIATE")
             cursor.execute(
-                "UPDATE products SET stock = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?", 
-                (new_stock, product_id)
+                f"SELECT id FROM products WHERE {where} AND {expression} != price",
+                tuple(where_params + expression_params)
             )
-            conn.commit()
-            conn.close()
-            
-            action = "ditambahkan" if adjustment > 0 else "dikurangi"
-            return True, f"Stok produk berhasil {action} menjadi {new_stock}"
+            changed_ids = [row['id'] for row in cursor.fetchall()]
+            cursor.execute(f"""
+                UPDATE products
+                SET price = {expression}, updated_at = CURRENT_TIMESTAMP
+                WHERE {where} AND {expression} != price
+            """, tuple(expression_params + where_params + expression_params))
+        # Prices are part of the typeahead entries; refresh only the changed ones
+        perbarui_indeks_produk(*changed_ids)
+        return True, f"Harga {len(changed_ids)} produk berhasil diperbarui"
     except Exception as e:
-        if not hasattr(conn, 'table'):  # SQLite connection
-            conn.close()
         return False, f"Error: {str(e)}"
 
-def get_low_stock_products(threshold=10):
-    """Get products with stock below the threshold"""
+def get_low_stock_products(threshold=None):
+    """Get products with stock below the threshold
+
+    Without an explicit threshold each product's own reorder level is used and
+    the result comes straight from the materialized low-stock set.
+    """
     conn = get_db_connection()
     
+    if threshold is None:
+        low_stock = get_low_stock_alerts()
+        return pd.DataFrame(low_stock) if low_stock else pd.DataFrame()
+    
     # Determine if we're using Supabase or SQLite
     if hasattr(conn, 'table'):  # Supabase client
         response = conn.table('products').select('*').lt('stock', threshold).execute()
         low_stock = response.data
         return pd.DataFrame(low_stock) if low_stock else pd.DataFrame()
     else:  # SQLite connection
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM products WHERE stock < ?", (threshold,))
-        low_stock = [dict(row) for row in cursor.fetchall()]
-        conn.close()
+        low_stock = conn.execute_query("SELECT * FROM products WHERE stock < ?", (threshold,)) or []
         
         return pd.DataFrame(low_stock) if low_stock else pd.DataFrame()
+
+def get_low_stock_alerts():
+    """Get the maintained low-stock set (products below their reorder level)"""
+    conn = get_db_connection()
+    
+    if hasattr(conn, 'table'):  # Supabase client
+        response = conn.table('low_stock_alerts').select('*').order('stock').execute()
+        return response.data or []
+    
+    return conn.execute_query(
+        "SELECT product_id AS id, name, stock, reorder_level FROM low_stock_alerts ORDER BY stock, name"
+    ) or []
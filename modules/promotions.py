@@ -0,0 +1,151 @@
+from datetime import datetime
+
+JENIS_PROMOSI = {
+    'persen': "Diskon persen",
+    'potongan': "Potongan harga per unit",
+    'harga_khusus': "Harga khusus per unit",
+    'beli_gratis': "Beli X gratis Y",
+}
+CAKUPAN_PROMOSI = {
+    'produk': "Satu produk",
+    'kategori': "Satu kategori",
+    'semua': "Semua produk",
+}
+
+KOLOM_PROMOSI = """id, name, promo_type, scope, product_id, category, value, buy_qty, free_qty,
+    members_only, start_time, end_time, days, starts_at, ends_at, priority"""
+
+def _menit(jam):
+    """'HH:MM' -> menit sejak tengah malam"""
+    jam, menit = jam.split(":")
+    return int(jam) * 60 + int(menit)
+
+class AturanPromosi:
+    """Satu aturan promosi yang sudah dikompilasi (nilai diparse sekali)"""
+
+    __slots__ = ('id', 'nama', 'jenis', 'nilai', 'beli', 'gratis', 'prioritas', 'hanya_member',
+                 'hari', 'menit_mulai', 'menit_akhir', 'mulai', 'akhir')
+
+    def __init__(self, row):
+        self.id = row['id']
+        self.nama = row['name']
+        self.jenis = row['promo_type']
+        self.nilai = float(row['value'] or 0)
+        self.beli = int(row['buy_qty'] or 0)
+        self.gratis = int(row['free_qty'] or 0)
+        self.prioritas = int(row['priority'] or 0)
+        self.hanya_member = bool(row['members_only'])
+        self.hari = frozenset(int(h) for h in row['days']) if row['days'] else None
+        self.menit_mulai = _menit(row['start_time']) if row['start_time'] else None
+        self.menit_akhir = _menit(row['end_time']) if row['end_time'] else None
+        self.mulai = row['starts_at'] or None
+        self.akhir = row['ends_at'] or None
+
+    def berlaku(self, tanggal, hari, menit, member):
+        """Apakah aturan aktif pada waktu ini (dicek sekali per menit, bukan per baris)"""
+        if self.hanya_member and not member:
+            return False
+        if self.mulai and tanggal < self.mulai:
+            return False
+        if self.akhir and tanggal > self.akhir:
+            return False
+        if self.hari is not None and hari not in self.hari:
+            return False
+        if self.menit_mulai is not None and self.menit_akhir is not None:
+            if self.menit_mulai <= self.menit_akhir:
+                return self.menit_mulai <= menit < self.menit_akhir
+            return menit >= self.menit_mulai or menit < self.menit_akhir  # melewati tengah malam
+        return True
+
+    def diskon(self, harga, jumlah):
+        """Nilai diskon untuk satu baris (harga satuan x jumlah)"""
+        if self.jenis == 'persen':
+            return harga * jumlah * min(self.nilai, 100) / 100
+        if self.jenis == 'potongan':
+            return min(self.nilai, harga) * jumlah
+        if self.jenis == 'harga_khusus':
+            return max(harga - self.nilai, 0) * jumlah
+        if self.jenis == 'beli_gratis' and self.beli > 0 and self.gratis > 0:
+            return (jumlah // (self.beli + self.gratis)) * self.gratis * harga
+        return 0
+
+class MesinPromosi:
+    """Mesin promosi dengan tabel lookup per produk dan per kategori
+
+    Aturan dikompilasi sekali saat daftar promosi berubah. Untuk setiap menit
+    (dan status member) disiapkan tabel aturan yang aktif, sehingga menghitung
+    keranjang hanya berupa dua lookup dict per baris: waktu linear terhadap
+    jumlah baris, tidak bergantung pada jumlah aturan.
+
+    Setiap baris mendapat paling banyak satu promosi: prioritas tertinggi
+    menang, dan bila sama, diskon terbesar.
+    """
+
+    def __init__(self, rows=(), versi=None):
+        self.versi = versi
+        self._aturan = [
+            (row['scope'], row['product_id'], row['category'], AturanPromosi(row))
+            for row in rows
+        ]
+        self._kunci_tabel = None
+        self._tabel = None
+
+    def __len__(self):
+        return len(self._aturan)
+
+    def _tabel_aktif(self, sekarang, member):
+        kunci = (sekarang.strftime("%Y-%m-%d %H:%M"), member)
+        if kunci != self._kunci_tabel:
+            tanggal = sekarang.strftime("%Y-%m-%d")
+            hari, menit = sekarang.weekday(), sekarang.hour * 60 + sekarang.minute
+            per_produk, per_kategori, semua = {}, {}, []
+            for cakupan, product_id, kategori, aturan in self._aturan:
+                if not aturan.berlaku(tanggal, hari, menit, member):
+                    continue
+                if cakupan == 'produk':
+                    per_produk.setdefault(product_id, []).append(aturan)
+                elif cakupan == 'kategori':
+                    per_kategori.setdefault(kategori, []).append(aturan)
+                else:
+                    semua.append(aturan)
+            # Dict diganti utuh (bukan diubah) sehingga aman dibaca thread lain
+            self._tabel = (per_produk, per_kategori, tuple(semua))
+            self._kunci_tabel = kunci
+        return self._tabel
+
+    def hitung(self, items, sekarang=None, member=False):
+        """Salinan baris keranjang dengan discount_amount/promotion_id terisi, plus total neto"""
+        per_produk, per_kategori, semua = self._tabel_aktif(sekarang or datetime.now(), member)
+        hasil = []
+        total = 0
+        for item in items:
+            terbaik, diskon_terbaik = None, 0
+            kandidat = per_produk.get(item['id'], ())
+            if item.get('category') in per_kategori:
+                kandidat = [*kandidat, *per_kategori[item['category']]]
+            if semua:
+                kandidat = [*kandidat, *semua]
+            for aturan in kandidat:
+                diskon = aturan.diskon(item['price'], item['quantity'])
+                if diskon > 0 and (terbaik is None or
+                                   (aturan.prioritas, diskon) > (terbaik.prioritas, diskon_terbaik)):
+                    terbaik, diskon_terbaik = aturan, diskon
+
+            baris = dict(item)
+            baris['discount_amount'] = round(min(diskon_terbaik, item['subtotal']), 2)
+            baris['promotion_id'] = terbaik.id if terbaik else None
+            baris['promotion_name'] = terbaik.nama if terbaik else None
+            total += item['subtotal'] - baris['discount_amount']
+            hasil.append(baris)
+        return hasil, total
+
+def versi_promosi(cursor):
+    cursor.execute("SELECT version FROM promotion_version WHERE id = 1")
+    row = cursor.fetchone()
+    return row[0] if row else 0
+
+def muat_mesin_promosi(cursor):
+    """Kompilasi semua promosi aktif dari database"""
+    versi = versi_promosi(cursor)
+    cursor.execute(f"SELECT {KOLOM_PROMOSI} FROM promotions WHERE active = 1")
+    return MesinPromosi(cursor.fetchall(), versi)
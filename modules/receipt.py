@@ -0,0 +1,204 @@
+import os
+import socket
+from datetime import datetime
+
+NAMA_TOKO = os.environ.get("POS_NAMA_TOKO", "POS Maharani")
+LEBAR_STRUK = int(os.environ.get("POS_LEBAR_STRUK", "32"))  # 32 kolom = kertas 58 mm
+
+# Perintah ESC/POS
+ESC_INIT = b"\x1b@"
+ESC_RATA_KIRI = b"\x1ba\x00"
+ESC_RATA_TENGAH = b"\x1ba\x01"
+ESC_TEBAL_ON = b"\x1bE\x01"
+ESC_TEBAL_OFF = b"\x1bE\x00"
+ESC_UKURAN_GANDA = b"\x1d!\x11"
+ESC_UKURAN_NORMAL = b"\x1d!\x00"
+GS_POTONG = b"\x1dV\x41\x03"  # feed 3 baris lalu potong sebagian
+
+KUERI_STRUK = """
+    SELECT t.invoice_number, t.created_at, t.total_amount, t.discount_amount AS total_discount,
+           t.payment_amount, t.payment_method, t.customer_name, u.username AS cashier,
+           ti.product_id, ti.product_name AS name, ti.quantity, ti.price_per_unit, ti.subtotal,
+           ti.discount_amount
+    FROM transactions t
+    LEFT JOIN users u ON u.id = t.cashier_id
+    LEFT JOIN transaction_items ti ON ti.transaction_id = t.invoice_number
+    WHERE t.invoice_number = ?
+    ORDER BY ti.id
+"""
+
+def ambil_struk(cursor, invoice_number):
+    """Ambil header dan semua baris struk dengan satu kueri; None bila tidak ada"""
+    cursor.execute(KUERI_STRUK, (invoice_number,))
+    baris = cursor.fetchall()
+    if not baris:
+        return None
+
+    pertama = baris[0]
+    return {
+        'invoice_number': pertama['invoice_number'],
+        'created_at': pertama['created_at'],
+        'total_amount': pertama['total_amount'],
+        'total_discount': pertama['total_discount'] or 0,
+        'payment_amount': pertama['payment_amount'],
+        'payment_method': pertama['payment_method'],
+        'customer_name': pertama['customer_name'],
+        'cashier': pertama['cashier'],
+        'items': [
+            {
+                'product_id': b['product_id'],
+                'name': b['name'] or f"Produk #{b['product_id']}",
+                'quantity': b['quantity'],
+                'price_per_unit': b['price_per_unit'],
+                'subtotal': b['subtotal'],
+                'discount_amount': b['discount_amount'] or 0,
+            }
+            for b in baris if b['product_id'] is not None
+        ],
+    }
+
+def format_rupiah(nilai):
+    return f"{nilai:,.0f}"
+
+class TemplateStruk:
+    """Template struk yang dikompilasi sekali
+
+    Semua bagian tetap (nama toko, garis, footer, urutan perintah ESC/POS)
+    dan string format per baris disiapkan di konstruktor, sehingga mencetak
+    satu struk hanya mengisi nilai lalu menggabungkan bytes.
+    """
+
+    def __init__(self, nama_toko=NAMA_TOKO, lebar=LEBAR_STRUK, encoding="cp437",
+                 footer="Terima kasih atas kunjungan Anda"):
+        self.lebar = lebar
+        self.encoding = encoding
+        lebar_nilai = 12
+
+        self._garis = "-" * lebar
+        self._fmt_kiri_kanan = "{:<%d}{:>%d}" % (lebar - lebar_nilai, lebar_nilai)
+        self._fmt_detail = "  {:>4} x {:<%d}{:>%d}" % (lebar - lebar_nilai - 9, lebar_nilai)
+        self._header = [nama_toko.center(lebar)]
+        self._footer = [footer.center(lebar)]
+
+        self._b_init = ESC_INIT + ESC_RATA_TENGAH + ESC_UKURAN_GANDA + ESC_TEBAL_ON
+        self._b_toko = self._enc(nama_toko) + b"\n" + ESC_UKURAN_NORMAL + ESC_TEBAL_OFF
+        self._b_garis = self._enc(self._garis) + b"\n"
+        self._b_kiri = ESC_RATA_KIRI
+        self._b_tebal_on = ESC_TEBAL_ON
+        self._b_tebal_off = ESC_TEBAL_OFF
+        self._b_footer = ESC_RATA_TENGAH + self._enc(footer) + b"\n" + GS_POTONG
+
+    def _enc(self, teks):
+        return teks.encode(self.encoding, errors="replace")
+
+    def _kiri_kanan(self, kiri, kanan):
+        return self._fmt_kiri_kanan.format(kiri[:self.lebar - 13], kanan)
+
+    def _bagian(self, struk):
+        """(info, item, total) sebagai daftar baris teks"""
+        info = [
+            f"No : {struk['invoice_number']}",
+            f"Tgl: {struk['created_at']}",
+            f"Ksr: {struk['cashier'] or '-'}",
+        ]
+        if struk.get('customer_name'):
+            info.append(f"Plg: {struk['customer_name']}")
+
+        item = []
+        for baris in struk['items']:
+            diskon = baris.get('discount_amount') or 0
+            item.append(baris['name'][:self.lebar])
+            item.append(self._fmt_detail.format(
+                baris['quantity'], format_rupiah(baris['price_per_unit']),
+                format_rupiah(baris['subtotal'] + diskon)
+            ))
+            if diskon:
+                item.append(self._kiri_kanan("  Promo", "-" + format_rupiah(diskon)))
+
+        pembayaran = struk.get('payment_amount') or struk['total_amount']
+        total = [
+            self._kiri_kanan("TOTAL", format_rupiah(struk['total_amount'])),
+            self._kiri_kanan(struk['payment_method'], format_rupiah(pembayaran)),
+            self._kiri_kanan("KEMBALI", format_rupiah(pembayaran - struk['total_amount'])),
+        ]
+        if struk.get('total_discount'):
+            total.append(self._kiri_kanan("ANDA HEMAT", format_rupiah(struk['total_discount'])))
+        return info, item, total
+
+    def render_teks(self, struk):
+        """Struk sebagai teks monospace (untuk tampilan layar)"""
+        info, item, total = self._bagian(struk)
+        return "\n".join(
+            self._header + [self._garis] + info + [self._garis] + item +
+            [self._garis] + total + [self._garis] + self._footer
+        )
+
+    def render_escpos(self, struk):
+        """Struk sebagai byte stream ESC/POS siap kirim ke printer thermal"""
+        info, item, total = self._bagian(struk)
+        enc = self._enc
+        return b"".join([
+            self._b_init, self._b_toko, self._b_kiri, self._b_garis,
+            enc("\n".join(info)), b"\n", self._b_garis,
+            enc("\n".join(item)), b"\n", self._b_garis,
+            self._b_tebal_on, enc(total[0]), b"\n", self._b_tebal_off,
+            enc("\n".join(total[1:])), b"\n", self._b_garis,
+            self._b_footer,
+        ])
+
+class PrinterFile:
+    """Tulis ESC/POS ke file/perangkat, mis. /dev/usb/lp0 (di-append)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def cetak(self, data, invoice_number=None):
+        with open(self.path, "ab") as f:
+            f.write(data)
+        return self.path
+
+class PrinterFolder:
+    """Simpan setiap struk sebagai file .escpos terpisah (default bila tanpa printer)"""
+
+    def __init__(self, folder):
+        self.folder = folder
+
+    def cetak(self, data, invoice_number=None):
+        os.makedirs(self.folder, exist_ok=True)
+        nama = invoice_number or datetime.now().strftime("%Y%m%d%H%M%S%f")
+        path = os.path.join(self.folder, f"{nama}.escpos")
+        with open(path, "wb") as f:
+            f.write(data)
+        return path
+
+class PrinterJaringan:
+    """Kirim ESC/POS mentah ke printer jaringan (port 9100/JetDirect)"""
+
+    def __init__(self, host, port=9100, timeout=3.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def cetak(self, data, invoice_number=None):
+        with socket.create_connection((self.host, self.port), timeout=self.timeout) as sock:
+            sock.sendall(data)
+        return f"{self.host}:{self.port}"
+
+def buat_printer(spesifikasi=None):
+    """Buat printer dari spesifikasi POS_PRINTER
+
+    - ``tcp://host:port`` printer jaringan
+    - ``file:/dev/usb/lp0`` file atau perangkat
+    - ``folder:data/struk`` (default) satu file per struk
+    """
+    spesifikasi = spesifikasi or os.environ.get("POS_PRINTER", "folder:data/struk")
+    if spesifikasi.startswith("tcp://"):
+        host, _, port = spesifikasi[len("tcp://"):].partition(":")
+        return PrinterJaringan(host, int(port or 9100))
+    if spesifikasi.startswith("file:"):
+        return PrinterFile(spesifikasi[len("file:"):])
+    if spesifikasi.startswith("folder:"):
+        return PrinterFolder(spesifikasi[len("folder:"):])
+    raise ValueError(f"Spesifikasi printer tidak dikenal: {spesifikasi}")
+
+TEMPLATE_STRUK = TemplateStruk()
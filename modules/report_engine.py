@@ -0,0 +1,383 @@
+import sys
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import pandas as pd
+
+# Agregat harian, per jam, per kategori dan per metode pembayaran dibaca dari
+# tabel rollup (sales_daily/sales_hourly) yang diperbarui trigger saat
+# checkout. Agregat per produk dan daftar transaksi diturunkan dari satu
+# DataFrame baris item yang di-join dengan headernya, jadi satu rentang
+# tanggal = satu scan.
+
+KUERI_BARIS = """
+    SELECT
+        ti.transaction_id AS invoice_number,
+        t.created_at,
+        t.total_amount,
+        t.payment_method,
+        u.username AS cashier,
+        ti.product_id,
+        ti.product_name,
+        ti.category,
+        ti.quantity,
+        ti.subtotal
+    FROM transaction_items ti
+    JOIN transactions t ON t.invoice_number = ti.transaction_id
+    LEFT JOIN users u ON u.id = t.cashier_id
+    WHERE ti.created_at BETWEEN ? AND ?
+"""
+
+TIPE_KOLOM = {
+    'invoice_number': 'category',
+    'total_amount': 'float64',
+    'payment_method': 'category',
+    'cashier': 'category',
+    'product_id': 'int64',
+    'product_name': 'category',
+    'category': 'category',
+    'quantity': 'int64',
+    'subtotal': 'float64',
+}
+
+def bingkai_kosong():
+    df = pd.DataFrame({kolom: pd.Series(dtype=tipe) for kolom, tipe in TIPE_KOLOM.items()})
+    df.insert(1, 'created_at', pd.Series(dtype='datetime64[ns]'))
+    return df
+
+def ketik_bingkai(df):
+    """Terapkan tipe kolom: teks berulang jadi category, created_at jadi datetime"""
+    if df.empty:
+        return bingkai_kosong()
+    df = df.astype(TIPE_KOLOM)
+    df['created_at'] = pd.to_datetime(df['created_at'], format='ISO8601')
+    return df
+
+def muat_baris(connection, tanggal_mulai, tanggal_akhir, direktori_arsip=None):
+    """Baris item + header untuk rentang tanggal (inklusif), dalam satu kueri
+
+    Dengan `direktori_arsip`, bulan tutup yang sudah diarsip dibaca dari
+    Parquet dan hanya sisanya dari SQLite.
+    """
+    if direktori_arsip is None:
+        df = pd.read_sql_query(
+            KUERI_BARIS, connection, params=(tanggal_mulai, tanggal_akhir + " 23:59:59")
+        )
+        return ketik_bingkai(df)
+
+    from .archive import muat_baris_arsip  # archive mengimpor modul ini
+
+    bagian = muat_baris_arsip(
+        connection, tanggal_mulai, tanggal_akhir, list(bingkai_kosong().columns), direktori_arsip
+    )
+    bagian = [b for b in bagian if not b.empty]
+    if not bagian:
+        return bingkai_kosong()
+    # Kategori tiap bagian berbeda; digabung sebagai object lalu dikategorikan ulang
+    teks = {kolom: object for kolom, tipe in TIPE_KOLOM.items() if tipe == 'category'}
+    return pd.concat([b.astype(teks) for b in bagian], ignore_index=True).astype(TIPE_KOLOM)
+
+class _Agregat:
+    """Setiap agregat dihitung sekali dan disimpan di instance"""
+
+    def __init__(self):
+        self._hasil = {}
+
+    def _sekali(self, nama, hitung):
+        if nama not in self._hasil:
+            self._hasil[nama] = hitung()
+        return self._hasil[nama]
+
+class LaporanPenjualan(_Agregat):
+    """Agregat penjualan untuk satu rentang, dihitung dari satu DataFrame baris item
+
+    Agregat per transaksi (jumlah transaksi, total belanja, metode pembayaran,
+    per jam/harian) memakai header yang sudah dideduplikasi; agregat per
+    produk/kategori memakai baris item.
+    """
+
+    def __init__(self, baris):
+        super().__init__()
+        self.baris = baris
+
+    @classmethod
+    def muat(cls, connection, tanggal_mulai, tanggal_akhir, direktori_arsip=None):
+        return cls(muat_baris(connection, tanggal_mulai, tanggal_akhir, direktori_arsip))
+
+    @property
+    def kosong(self):
+        return self.baris.empty
+
+    def transaksi(self):
+        """Satu baris per transaksi, terbaru dulu"""
+        return self._sekali('transaksi', lambda: (
+            self.baris[['invoice_number', 'created_at', 'total_amount', 'payment_method', 'cashier']]
+            .drop_duplicates('invoice_number')
+            .sort_values('created_at', ascending=False, kind='stable')
+            .reset_index(drop=True)
+        ))
+
+    def ringkasan(self):
+        def hitung():
+            transaksi = self.transaksi()
+            total = float(transaksi['total_amount'].sum())
+            jumlah = len(transaksi)
+            return {
+                'total_penjualan': total,
+                'jumlah_transaksi': jumlah,
+                'rata_rata_transaksi': total / jumlah if jumlah else 0,
+            }
+        return self._sekali('ringkasan', hitung)
+
+    def _per_transaksi(self, kunci, nama_kunci):
+        transaksi = self.transaksi()
+        return (
+            transaksi.groupby(kunci, observed=True, sort=True)
+            .agg(jumlah_transaksi=('invoice_number', 'size'), total_belanja=('total_amount', 'sum'))
+            .rename_axis(nama_kunci)
+            .reset_index()
+        )
+
+    def harian(self):
+        """tanggal, jumlah_transaksi, total_belanja"""
+        def hitung():
+            df = self._per_transaksi(self.transaksi()['created_at'].dt.normalize(), 'tanggal')
+            df['tanggal'] = df['tanggal'].dt.strftime('%Y-%m-%d')
+            return df
+        return self._sekali('harian', hitung)
+
+    def perjam(self):
+        """jam ("HH:00"), jumlah_transaksi, total_belanja"""
+        def hitung():
+            df = self._per_transaksi(self.transaksi()['created_at'].dt.hour, 'jam')
+            df['jam'] = df['jam'].map('{:02d}:00'.format)
+            return df
+        return self._sekali('perjam', hitung)
+
+    def metode_pembayaran(self):
+        """payment_method, transaction_count, total_amount"""
+        return self._sekali('metode_pembayaran', lambda: (
+            self.transaksi()
+            .groupby('payment_method', observed=True)
+            .agg(transaction_count=('invoice_number', 'size'), total_amount=('total_amount', 'sum'))
+            .reset_index()
+            .sort_values('total_amount', ascending=False, kind='stable')
+            .reset_index(drop=True)
+        ))
+
+    def kategori(self):
+        """category, total_quantity, total_sales"""
+        return self._sekali('kategori', lambda: (
+            self.baris
+            .groupby('category', observed=True, dropna=False)
+            .agg(total_quantity=('quantity', 'sum'), total_sales=('subtotal', 'sum'))
+            .reset_index()
+            .sort_values('total_sales', ascending=False, kind='stable')
+            .reset_index(drop=True)
+        ))
+
+    def produk(self):
+        """id, product_name, category, total_quantity, total_sales; terlaris dulu"""
+        return self._sekali('produk', lambda: (
+            self.baris
+            .groupby(['product_id', 'product_name', 'category'], observed=True, dropna=False)
+            .agg(total_quantity=('quantity', 'sum'), total_sales=('subtotal', 'sum'))
+            .reset_index()
+            .rename(columns={'product_id': 'id'})
+            .sort_values('total_sales', ascending=False, kind='stable')
+            .reset_index(drop=True)
+        ))
+
+    def ukuran_bytes(self):
+        """Perkiraan memori: bingkai baris plus agregat yang sudah dihitung"""
+        return ukuran_hasil(self.baris) + sum(ukuran_hasil(v) for v in self._hasil.values())
+
+KUERI_ROLLUP_HARIAN = """
+    SELECT date, category, payment_method, count, amount, qty
+    FROM sales_daily
+    WHERE date BETWEEN ? AND ?
+"""
+
+KUERI_ROLLUP_PERJAM = """
+    SELECT hour, SUM(count) AS count, SUM(amount) AS amount
+    FROM sales_hourly
+    WHERE date BETWEEN ? AND ? AND category = '*'
+    GROUP BY hour
+"""
+
+class RingkasanPenjualan(_Agregat):
+    """Agregat harian, per jam, per kategori dan per metode pembayaran dari tabel rollup
+
+    Membaca beberapa ratus baris pra-agregasi alih-alih baris item, dengan
+    hasil dan kolom yang sama seperti metode LaporanPenjualan bernama sama.
+    Baris kategori '*' berisi total per transaksi, baris lainnya total baris
+    item per kategori.
+    """
+
+    def __init__(self, harian, perjam):
+        super().__init__()
+        self.rollup_harian = harian
+        self.rollup_perjam = perjam
+
+    @classmethod
+    def muat(cls, connection, tanggal_mulai, tanggal_akhir):
+        params = (tanggal_mulai, tanggal_akhir)
+        return cls(
+            pd.read_sql_query(KUERI_ROLLUP_HARIAN, connection, params=params),
+            pd.read_sql_query(KUERI_ROLLUP_PERJAM, connection, params=params),
+        )
+
+    @classmethod
+    def kosongan(cls):
+        return cls(
+            pd.DataFrame(columns=['date', 'category', 'payment_method', 'count', 'amount', 'qty']),
+            pd.DataFrame(columns=['hour', 'count', 'amount']),
+        )
+
+    def _transaksi(self):
+        return self.rollup_harian[self.rollup_harian['category'] == '*']
+
+    @property
+    def kosong(self):
+        return self._transaksi().empty
+
+    def ringkasan(self):
+        def hitung():
+            transaksi = self._transaksi()
+            total = float(transaksi['amount'].sum())
+            jumlah = int(transaksi['count'].sum())
+            return {
+                'total_penjualan': total,
+                'jumlah_transaksi': jumlah,
+                'rata_rata_transaksi': total / jumlah if jumlah else 0,
+            }
+        return self._sekali('ringkasan', hitung)
+
+    def harian(self):
+        """tanggal, jumlah_transaksi, total_belanja"""
+        return self._sekali('harian', lambda: (
+            self._transaksi()
+            .groupby('date', sort=True)
+            .agg(jumlah_transaksi=('count', 'sum'), total_belanja=('amount', 'sum'))
+            .rename_axis('tanggal')
+            .reset_index()
+        ))
+
+    def perjam(self):
+        """jam ("HH:00"), jumlah_transaksi, total_belanja"""
+        def hitung():
+            df = (
+                self.rollup_perjam.sort_values('hour')
+                .rename(columns={'hour': 'jam', 'count': 'jumlah_transaksi', 'amount': 'total_belanja'})
+                .reset_index(drop=True)
+            )
+            df['jam'] = df['jam'].map('{:02d}:00'.format)
+            return df
+        return self._sekali('perjam', hitung)
+
+    def metode_pembayaran(self):
+        """payment_method, transaction_count, total_amount"""
+        return self._sekali('metode_pembayaran', lambda: (
+            self._transaksi()
+            .groupby('payment_method')
+            .agg(transaction_count=('count', 'sum'), total_amount=('amount', 'sum'))
+            .reset_index()
+            .sort_values('total_amount', ascending=False, kind='stable')
+            .reset_index(drop=True)
+        ))
+
+    def kategori(self):
+        """category, total_quantity, total_sales"""
+        def hitung():
+            item = self.rollup_harian[self.rollup_harian['category'] != '*']
+            df = (
+                item.groupby('category')
+                .agg(total_quantity=('qty', 'sum'), total_sales=('amount', 'sum'))
+                .reset_index()
+                .sort_values('total_sales', ascending=False, kind='stable')
+                .reset_index(drop=True)
+            )
+            df['category'] = df['category'].replace('', None)  # baris tanpa kategori
+            return df
+        return self._sekali('kategori', hitung)
+
+    def ukuran_bytes(self):
+        return sum(ukuran_hasil(v) for v in (self.rollup_harian, self.rollup_perjam, *self._hasil.values()))
+
+def ukuran_hasil(nilai):
+    if isinstance(nilai, pd.DataFrame):
+        return int(nilai.memory_usage(deep=True).sum())
+    if hasattr(nilai, 'ukuran_bytes'):
+        return nilai.ukuran_bytes()
+    return sys.getsizeof(nilai)
+
+def watermark_laporan(connection):
+    """(id transaksi terakhir, versi penulisan bertanggal lampau) dalam satu kueri murah"""
+    row = connection.execute("""
+        SELECT (SELECT MAX(id) FROM transactions),
+               (SELECT version FROM report_version WHERE id = 1)
+    """).fetchone()
+    return row[0] or 0, row[1] or 0
+
+def kunci_validasi(tanggal_akhir, watermark, hari_ini=None):
+    """Bagian watermark yang menentukan apakah hasil untuk rentang ini masih berlaku
+
+    Rentang yang berakhir sebelum hari ini hanya berubah bila ada penjualan
+    bertanggal lampau (jurnal offline, sinkronisasi terminal), jadi cukup
+    divalidasi dengan versi penulisan mundur. Rentang yang mencakup hari ini
+    ikut berubah di setiap checkout baru.
+    """
+    id_terakhir, versi = watermark
+    if tanggal_akhir < (hari_ini or date.today().isoformat()):
+        return (versi,)
+    return (versi, id_terakhir)
+
+class CacheLaporan:
+    """Cache LRU hasil laporan, dibatasi jumlah entri dan total bytes
+
+    Kunci berbentuk (laporan, tanggal_mulai, tanggal_akhir, parameter); setiap
+    entri menyimpan kunci validasi saat dihitung dan hanya dipakai bila kunci
+    validasi sekarang masih sama. Perhitungan berjalan di luar lock.
+    """
+
+    def __init__(self, maks_entri=32, maks_bytes=256 * 1024 * 1024):
+        self.maks_entri = maks_entri
+        self.maks_bytes = maks_bytes
+        self._data = OrderedDict()  # kunci -> (validasi, nilai, ukuran)
+        self._lock = threading.Lock()
+        self.total_bytes = 0
+        self.hit = 0
+        self.miss = 0
+
+    def ambil(self, kunci, validasi, hitung):
+        with self._lock:
+            entri = self._data.get(kunci)
+            if entri is not None and entri[0] == validasi:
+                self._data.move_to_end(kunci)
+                self.hit += 1
+                return entri[1]
+            self.miss += 1
+
+        nilai = hitung()
+        ukuran = ukuran_hasil(nilai)
+        with self._lock:
+            lama = self._data.pop(kunci, None)
+            if lama is not None:
+                self.total_bytes -= lama[2]
+            if ukuran <= self.maks_bytes:
+                self._data[kunci] = (validasi, nilai, ukuran)
+                self.total_bytes += ukuran
+                while len(self._data) > self.maks_entri or self.total_bytes > self.maks_bytes:
+                    _, (_, _, ukuran_lama) = self._data.popitem(last=False)
+                    self.total_bytes -= ukuran_lama
+        return nilai
+
+    def bersihkan(self):
+        with self._lock:
+            self._data.clear()
+            self.total_bytes = 0
+
+    def statistik(self):
+        with self._lock:
+            return {'entri': len(self._data), 'bytes': self.total_bytes, 'hit': self.hit, 'miss': self.miss}
@@ -1,308 +1,193 @@
 import streamlit as st
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import io
-import base64
+import os
 from datetime import datetime, timedelta
-from modules.database import get_db_connection
+from modules.archive import ARSIP_DIR
+from modules.charts import GRAFIK, png_grafik
+from modules.compat import fragment_berkala
+from modules.database import DB_PATH, get_db_connection
+from modules.exports import FORMAT_EKSPOR, PekerjaEkspor, SumberBingkai, SumberKueri
+from modules.report_engine import (
+    CacheLaporan, LaporanPenjualan, RingkasanPenjualan, bingkai_kosong, kunci_validasi, watermark_laporan
+)
 
-def dapatkan_laporan_penjualan(tanggal_mulai, tanggal_akhir):
-    """Dapatkan laporan penjualan antara dua tanggal"""
+@st.cache_resource(show_spinner=False)
+def get_cache_laporan():
+    """Cache hasil laporan bersama untuk semua sesi (LRU, dibatasi ukuran)"""
+    return CacheLaporan(maks_bytes=int(os.environ.get("POS_REPORT_CACHE_MB", "256")) * 1024 * 1024)
+
+def dapatkan_laporan(tanggal_mulai, tanggal_akhir):
+    """Muat rentang tanggal sekali; semua agregat dashboard diturunkan dari hasilnya
+
+    Hasil di-cache per rentang: rentang yang sudah lewat dipakai ulang terus,
+    rentang yang mencakup hari ini dimuat ulang setelah ada transaksi baru.
+    """
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("""
-            SELECT 
-                t.invoice_number,
-                t.created_at,
-                t.total_amount,
-                t.payment_method,
-                u.username as cashier
-            FROM transactions t
-            JOIN users u ON t.cashier_id = u.id
-            WHERE t.created_at BETWEEN ? AND ?
-            ORDER BY t.created_at DESC
-        """, (tanggal_mulai, tanggal_akhir + " 23:59:59"))
-        
-        transaksi = cursor.fetchall()
-        return [dict(row) for row in transaksi]
-    
+        return get_cache_laporan().ambil(
+            ('penjualan', tanggal_mulai, tanggal_akhir, ()),
+            kunci_validasi(tanggal_akhir, watermark_laporan(conn.connection)),
+            lambda: LaporanPenjualan.muat(conn.connection, tanggal_mulai, tanggal_akhir, ARSIP_DIR)
+        )
     except Exception as e:
         st.error(f"Error: {str(e)}")
-        return []
-    finally:
-        conn.close()
+        return LaporanPenjualan(bingkai_kosong())
 
-def dapatkan_laporan_penjualan_produk(tanggal_mulai, tanggal_akhir):
-    """Dapatkan laporan penjualan produk antara dua tanggal"""
+def dapatkan_ringkasan(tanggal_mulai, tanggal_akhir):
+    """Agregat harian/per jam/kategori/metode pembayaran dari tabel rollup, di-cache seperti laporan"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
     try:
-        cursor.execute("""
-            SELECT 
-                p.id,
-                p.name as product_name,
-                p.category,
-                SUM(ti.quantity) as total_quantity,
-                SUM(ti.subtotal) as total_sales
-            FROM transaction_items ti
-            JOIN transactions t ON ti.transaction_id = t.invoice_number
-            JOIN products p ON ti.product_id = p.id
-            WHERE t.created_at BETWEEN ? AND ?
-            GROUP BY p.id, p.name, p.category
-            ORDER BY total_sales DESC
-        """, (tanggal_mulai, tanggal_akhir + " 23:59:59"))
-        
-        produk = cursor.fetchall()
-        return [dict(row) for row in produk]
-    
+        return get_cache_laporan().ambil(
+            ('rollup', tanggal_mulai, tanggal_akhir, ()),
+            kunci_validasi(tanggal_akhir, watermark_laporan(conn.connection)),
+            lambda: RingkasanPenjualan.muat(conn.connection, tanggal_mulai, tanggal_akhir)
+        )
     except Exception as e:
         st.error(f"Error: {str(e)}")
-        return []
-    finally:
-        conn.close()
+        return RingkasanPenjualan.kosongan()
+
+def dapatkan_laporan_penjualan(tanggal_mulai, tanggal_akhir):
+    """Dapatkan laporan penjualan antara dua tanggal"""
+    return dapatkan_laporan(tanggal_mulai, tanggal_akhir).transaksi().to_dict('records')
+
+def dapatkan_laporan_penjualan_produk(tanggal_mulai, tanggal_akhir):
+    """Dapatkan laporan penjualan produk antara dua tanggal"""
+    return dapatkan_laporan(tanggal_mulai, tanggal_akhir).produk().to_dict('records')
 
 def dapatkan_laporan_penjualan_kategori(tanggal_mulai, tanggal_akhir):
     """Dapatkan laporan penjualan kategori antara dua tanggal"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT 
-                p.category,
-                SUM(ti.quantity) as total_quantity,
-                SUM(ti.subtotal) as total_sales
-            FROM transaction_items ti
-            JOIN transactions t ON ti.transaction_id = t.invoice_number
-            JOIN products p ON ti.product_id = p.id
-            WHERE t.created_at BETWEEN ? AND ?
-            GROUP BY p.category
-            ORDER BY total_sales DESC
-        """, (tanggal_mulai, tanggal_akhir + " 23:59:59"))
-        
-        kategori = cursor.fetchall()
-        return [dict(row) for row in kategori]
-    
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        return []
-    finally:
-        conn.close()
+    return dapatkan_ringkasan(tanggal_mulai, tanggal_akhir).kategori().to_dict('records')
 
 def dapatkan_laporan_metode_pembayaran(tanggal_mulai, tanggal_akhir):
     """Dapatkan laporan distribusi metode pembayaran"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT 
-                payment_method,
-                COUNT(*) as transaction_count,
-                SUM(total_amount) as total_amount
-            FROM transactions
-            WHERE created_at BETWEEN ? AND ?
-            GROUP BY payment_method
-            ORDER BY total_amount DESC
-        """, (tanggal_mulai, tanggal_akhir + " 23:59:59"))
-        
-        metode_pembayaran = cursor.fetchall()
-        return [dict(row) for row in metode_pembayaran]
-    
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        return []
-    finally:
-        conn.close()
+    return dapatkan_ringkasan(tanggal_mulai, tanggal_akhir).metode_pembayaran().to_dict('records')
 
 def dapatkan_laporan_penjualan_harian(tanggal_mulai, tanggal_akhir):
     """Dapatkan laporan tren penjualan harian"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT 
-                DATE(created_at) as tanggal,
-                COUNT(*) as jumlah_transaksi,
-                SUM(total_amount) as total_belanja
-            FROM transactions
-            WHERE created_at BETWEEN ? AND ?
-            GROUP BY DATE(created_at)
-            ORDER BY tanggal
-        """, (tanggal_mulai, tanggal_akhir + " 23:59:59"))
-        
-        penjualan_harian = cursor.fetchall()
-        return [dict(row) for row in penjualan_harian]
-    
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        return []
-    finally:
-        conn.close()
+    return dapatkan_ringkasan(tanggal_mulai, tanggal_akhir).harian().to_dict('records')
 
 def dapatkan_laporan_penjualan_perjam(tanggal_mulai, tanggal_akhir):
     """Dapatkan laporan distribusi penjualan per jam"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT 
-                strftime('%H', created_at) as jam,
-                COUNT(*) as jumlah_transaksi,
-                SUM(total_amount) as total_belanja
-            FROM transactions
-            WHERE created_at BETWEEN ? AND ?
-            GROUP BY strftime('%H', created_at)
-            ORDER BY jam
-        """, (tanggal_mulai, tanggal_akhir + " 23:59:59"))
-        
-        penjualan_perjam = cursor.fetchall()
-        
-        # Format jam untuk tampilan yang lebih baik
-        for entry in penjualan_perjam:
-            entry['jam'] = f"{entry['jam']}:00"
-        
-        return [dict(row) for row in penjualan_perjam]
-    
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        return []
-    finally:
-        conn.close()
+    return dapatkan_ringkasan(tanggal_mulai, tanggal_akhir).perjam().to_dict('records')
 
 def dapatkan_laporan_inventaris():
     """Dapatkan laporan status inventaris terkini"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT 
-                id,
-                name,
-                category,
-                price,
-                stock,
-                price * stock as nilai_inventaris
-            FROM products
-            ORDER BY nilai_inventaris DESC
-        """)
-        
-        inventaris = cursor.fetchall()
-        return [dict(row) for row in inventaris]
-    
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        return []
-    finally:
-        conn.close()
+    return conn.execute_query("""
+        SELECT 
+            id,
+            name,
+            category,
+            price,
+            stock,
+            price * stock as nilai_inventaris
+        FROM products
+        ORDER BY nilai_inventaris DESC
+    """) or []
 
 def dapatkan_laporan_stok_rendah(ambang_batas=10):
     """Dapatkan laporan peringatan stok rendah"""
     conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute("""
-            SELECT 
-                id,
-                name,
-                category,
-                price,
-                stock
-            FROM products
-            WHERE stock <= ?
-            ORDER BY stock
-        """, (ambang_batas,))
-        
-        stok_rendah = cursor.fetchall()
-        return [dict(row) for row in stok_rendah]
-    
-    except Exception as e:
-        st.error(f"Error: {str(e)}")
-        return []
-    finally:
-        conn.close()
+    return conn.execute_query("""
+        SELECT 
+            id,
+            name,
+            category,
+            price,
+            stock
+        FROM products
+        WHERE stock <= ?
+        ORDER BY stock
+    """, (ambang_batas,)) or []
+
+def tampilkan_grafik(jenis, data, *args, nama_file):
+    """Tampilkan grafik Plotly (dirender di browser); PNG hanya dibuat bila diminta"""
+    st.plotly_chart(GRAFIK[jenis](data, *args), use_container_width=True)
+    if st.button("Siapkan PNG", key=f"png_{nama_file}"):
+        st.download_button(
+            "Unduh PNG", png_grafik(jenis, data, *args),
+            file_name=nama_file, mime="image/png", key=f"unduh_{nama_file}"
+        )
+
+KUERI_EKSPOR_TRANSAKSI = """
+    SELECT t.invoice_number, t.created_at, t.customer_name, t.total_amount, t.discount_amount,
+           t.payment_amount, t.payment_method, u.username AS cashier
+    FROM transactions t
+    LEFT JOIN users u ON u.id = t.cashier_id
+    WHERE t.created_at BETWEEN ? AND ?
+    ORDER BY t.created_at DESC
+"""
+
+KUERI_EKSPOR_ITEM = """
+    SELECT transaction_id AS invoice_number, created_at, product_id, product_name, category, barcode,
+           quantity, price_per_unit, discount_amount, subtotal
+    FROM transaction_items
+    WHERE created_at BETWEEN ? AND ?
+    ORDER BY created_at, id
+"""
 
-def buat_grafik_batang(data, x_col, y_col, judul, label_x, label_y):
-    """Membuat grafik batang dari dataframe"""
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x=x_col, y=y_col, data=data)
-    plt.title(judul)
-    plt.xlabel(label_x)
-    plt.ylabel(label_y)
-    plt.xticks(rotation=45)
-    plt.tight_layout()
-    
-    # Simpan gambar ke buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close()
-    
-    return buf
+@st.cache_resource(show_spinner=False)
+def get_pekerja_ekspor():
+    """Pekerja ekspor latar bersama untuk semua sesi"""
+    return PekerjaEkspor()
 
-def buat_grafik_pie(data, values_col, labels_col, judul):
-    """Membuat grafik pie dari dataframe"""
-    plt.figure(figsize=(8, 8))
-    plt.pie(data[values_col], labels=data[labels_col], autopct='%1.1f%%', startangle=90)
-    plt.axis('equal')
-    plt.title(judul)
-    plt.tight_layout()
-    
-    # Simpan gambar ke buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close()
-    
-    return buf
+@st.cache_resource(show_spinner=False, ttl=3600, max_entries=4)
+def isi_file_ekspor(path):
+    """Isi file ekspor, dibaca sekali per tugas (path unik per tugas) alih-alih di setiap rerun"""
+    with open(path, "rb") as f:
+        return f.read()
 
-def buat_grafik_garis(data, x_col, y_col, judul, label_x, label_y):
-    """Membuat grafik garis dari dataframe"""
-    plt.figure(figsize=(10, 6))
-    plt.plot(data[x_col], data[y_col], marker='o', linestyle='-')
-    plt.title(judul)
-    plt.xlabel(label_x)
-    plt.ylabel(label_y)
-    plt.grid(True, linestyle='--', alpha=0.7)
-    plt.tight_layout()
-    
-    # Simpan gambar ke buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png')
-    buf.seek(0)
-    plt.close()
-    
-    return buf
+def _tampilkan_progres(tugas):
+    st.progress(tugas.progres, text=f"Mengekspor {tugas.baris:,} dari {tugas.total or 0:,} baris")
 
-def dapatkan_gambar_base64(buf):
-    """Konversi buffer gambar ke base64 untuk ditampilkan di HTML"""
-    img_str = base64.b64encode(buf.getvalue()).decode()
-    return f"data:image/png;base64,{img_str}"
+def _pantau_ekspor(tugas_id):
+    """Progres ekspor di fragment; rerun penuh begitu selesai supaya tombol unduh tampil"""
+    tugas = get_pekerja_ekspor().tugas(tugas_id)
+    if tugas is None or tugas.selesai:
+        st.rerun()
+    _tampilkan_progres(tugas)
 
-def ekspor_ke_excel(data, nama_file):
-    """Ekspor data ke file Excel"""
-    df = pd.DataFrame(data)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, sheet_name='Laporan', index=False)
-    
-    b64 = base64.b64encode(output.getvalue()).decode()
-    return f'<a href="data:application/vnd.openxmlformats-officedocument.spreadsheetml.sheet;base64,{b64}" download="{nama_file}">Unduh file Excel</a>'
+_pantau_berkala = fragment_berkala(1)
+if _pantau_berkala is not None:
+    _pantau_ekspor = _pantau_berkala(_pantau_ekspor)
+
+def tampilkan_ekspor(buat_sumber, nama_dasar):
+    """Kontrol ekspor: file baru dibuat saat tombol ditekan, di thread latar
+
+    `buat_sumber` dipanggil hanya saat ekspor diminta, jadi rerun biasa tidak
+    menyentuh data ekspor sama sekali.
+    """
+    kunci = f"ekspor_{nama_dasar}"
+    pekerja = get_pekerja_ekspor()
+
+    col1, col2 = st.columns([1, 2])
+    with col1:
+        format_ekspor = st.selectbox(
+            "Format", list(FORMAT_EKSPOR), format_func=lambda f: FORMAT_EKSPOR[f][0], key=f"{kunci}_format"
+        )
+    with col2:
+        if st.button("Buat file ekspor", key=f"{kunci}_mulai"):
+            st.session_state[kunci] = pekerja.kirim(buat_sumber(), nama_dasar, format_ekspor).id
 
-def ekspor_ke_csv(data, nama_file):
-    """Ekspor data ke file CSV"""
-    df = pd.DataFrame(data)
-    csv = df.to_csv(index=False)
-    b64 = base64.b64encode(csv.encode()).decode()
-    return f'<a href="data:text/csv;base64,{b64}" download="{nama_file}">Unduh file CSV</a>'
+    tugas = pekerja.tugas(st.session_state.get(kunci))
+    if tugas is None:
+        return
+    if not tugas.selesai:
+        # Skrip tidak menunggu ekspor: fragment memantau sendiri tiap detik,
+        # tanpa dukungan fragment status diperiksa lagi di rerun berikutnya
+        if _pantau_berkala is not None:
+            _pantau_ekspor(tugas.id)
+        else:
+            _tampilkan_progres(tugas)
+            st.button("Perbarui status", key=f"{kunci}_status")
+        return
+    if tugas.status == 'gagal':
+        st.error(f"Ekspor gagal: {tugas.error}")
+        return
+    st.download_button(
+        f"Unduh {tugas.nama_file}", isi_file_ekspor(tugas.path),
+        file_name=tugas.nama_file, mime=tugas.mime, key=f"{kunci}_unduh"
+    )
 
 def tampilkan_dashboard_penjualan():
     """Tampilkan UI dashboard penjualan di Streamlit"""
@@ -323,25 +208,25 @@ def tampilkan_dashboard_penjualan():
     # Format tanggal untuk kueri SQL
     tanggal_mulai_str = tanggal_mulai.strftime("%Y-%m-%d")
     tanggal_akhir_str = tanggal_akhir.strftime("%Y-%m-%d")
+    rentang = (tanggal_mulai_str, tanggal_akhir_str + " 23:59:59")
     
-    # Ringkasan penjualan
-    data_penjualan = dapatkan_laporan_penjualan(tanggal_mulai_str, tanggal_akhir_str)
-    if not data_penjualan:
+    # Metrik dan grafik agregat dibaca dari rollup; baris item hanya dimuat
+    # untuk grafik/tabel per produk dan daftar transaksi
+    agregat = dapatkan_ringkasan(tanggal_mulai_str, tanggal_akhir_str)
+    if agregat.kosong:
         st.info(f"Tidak ada data penjualan dalam rentang {tanggal_mulai} hingga {tanggal_akhir}")
         return
     
     # Metrik ringkasan
-    total_penjualan = sum(item['total_amount'] for item in data_penjualan)
-    total_transaksi = len(data_penjualan)
-    rata_rata_transaksi = total_penjualan / total_transaksi if total_transaksi > 0 else 0
+    ringkasan = agregat.ringkasan()
     
     col1, col2, col3 = st.columns(3)
     with col1:
-        st.metric("Total Penjualan", f"Rp {total_penjualan:,.0f}")
+        st.metric("Total Penjualan", f"Rp {ringkasan['total_penjualan']:,.0f}")
     with col2:
-        st.metric("Jumlah Transaksi", f"{total_transaksi}")
+        st.metric("Jumlah Transaksi", f"{ringkasan['jumlah_transaksi']}")
     with col3:
-        st.metric("Rata-rata Transaksi", f"Rp {rata_rata_transaksi:,.0f}")
+        st.metric("Rata-rata Transaksi", f"Rp {ringkasan['rata_rata_transaksi']:,.0f}")
     
     # Grafik
     st.subheader("Grafik Penjualan")
@@ -354,59 +239,56 @@ def tampilkan_dashboard_penjualan():
     ])
     
     if jenis_grafik == "Penjualan Harian":
-        penjualan_harian = dapatkan_laporan_penjualan_harian(tanggal_mulai_str, tanggal_akhir_str)
-        if penjualan_harian:
-            df = pd.DataFrame(penjualan_harian)
-            grafik = buat_grafik_garis(
-                df, 'tanggal', 'total_belanja', 
-                'Penjualan Harian', 'Tanggal', 'Total Penjualan (Rp)'
+        df = agregat.harian()
+        if not df.empty:
+            tampilkan_grafik(
+                'garis', df, 'tanggal', 'total_belanja', 
+                'Penjualan Harian', 'Tanggal', 'Total Penjualan (Rp)',
+                nama_file="penjualan_harian.png"
             )
-            st.image(grafik)
     
     elif jenis_grafik == "Distribusi Kategori":
-        penjualan_kategori = dapatkan_laporan_penjualan_kategori(tanggal_mulai_str, tanggal_akhir_str)
-        if penjualan_kategori:
-            df = pd.DataFrame(penjualan_kategori)
-            grafik = buat_grafik_pie(
-                df, 'total_sales', 'category', 
-                'Distribusi Penjualan per Kategori'
+        df = agregat.kategori()
+        if not df.empty:
+            tampilkan_grafik(
+                'pie', df, 'total_sales', 'category', 
+                'Distribusi Penjualan per Kategori',
+                nama_file="distribusi_kategori.png"
             )
-            st.image(grafik)
     
     elif jenis_grafik == "Metode Pembayaran":
-        metode_pembayaran = dapatkan_laporan_metode_pembayaran(tanggal_mulai_str, tanggal_akhir_str)
-        if metode_pembayaran:
-            df = pd.DataFrame(metode_pembayaran)
-            grafik = buat_grafik_batang(
-                df, 'payment_method', 'total_amount', 
-                'Penjualan per Metode Pembayaran', 'Metode Pembayaran', 'Total Penjualan (Rp)'
+        df = agregat.metode_pembayaran()
+        if not df.empty:
+            tampilkan_grafik(
+                'batang', df, 'payment_method', 'total_amount', 
+                'Penjualan per Metode Pembayaran', 'Metode Pembayaran', 'Total Penjualan (Rp)',
+                nama_file="metode_pembayaran.png"
             )
-            st.image(grafik)
     
     elif jenis_grafik == "Penjualan per Jam":
-        penjualan_perjam = dapatkan_laporan_penjualan_perjam(tanggal_mulai_str, tanggal_akhir_str)
-        if penjualan_perjam:
-            df = pd.DataFrame(penjualan_perjam)
-            grafik = buat_grafik_batang(
-                df, 'jam', 'total_belanja', 
-                'Penjualan per Jam', 'Jam', 'Total Penjualan (Rp)'
+        df = agregat.perjam()
+        if not df.empty:
+            tampilkan_grafik(
+                'batang', df, 'jam', 'total_belanja', 
+                'Penjualan per Jam', 'Jam', 'Total Penjualan (Rp)',
+                nama_file="penjualan_perjam.png"
             )
-            st.image(grafik)
     
     elif jenis_grafik == "Produk Terlaris":
-        penjualan_produk = dapatkan_laporan_penjualan_produk(tanggal_mulai_str, tanggal_akhir_str)
-        if penjualan_produk:
-            df = pd.DataFrame(penjualan_produk).head(10)  # 10 produk teratas
-            grafik = buat_grafik_batang(
-                df, 'product_name', 'total_sales', 
-                '10 Produk Terlaris', 'Produk', 'Total Penjualan (Rp)'
+        df = dapatkan_laporan(tanggal_mulai_str, tanggal_akhir_str).produk()
+        if not df.empty:
+            df = df.head(10)  # 10 produk teratas
+            tampilkan_grafik(
+                'batang', df, 'product_name', 'total_sales', 
+                '10 Produk Terlaris', 'Produk', 'Total Penjualan (Rp)',
+                nama_file="produk_terlaris.png"
             )
-            st.image(grafik)
     
     # Tabel data detail
     st.subheader("Laporan Detail")
     jenis_laporan = st.selectbox("Pilih Laporan", [
         "Transaksi", 
+        "Item Transaksi",
         "Penjualan per Produk", 
         "Penjualan per Kategori",
         "Stok Inventaris",
@@ -414,40 +296,38 @@ def tampilkan_dashboard_penjualan():
     ])
     
     if jenis_laporan == "Transaksi":
-        data = data_penjualan
-        if data:
-            df = pd.DataFrame(data)
-            st.dataframe(df)
+        data = dapatkan_laporan(tanggal_mulai_str, tanggal_akhir_str).transaksi()
+        if not data.empty:
+            st.dataframe(data)
             
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(ekspor_ke_excel(data, f"transaksi_{tanggal_mulai_str}_to_{tanggal_akhir_str}.xlsx"), unsafe_allow_html=True)
-            with col2:
-                st.markdown(ekspor_ke_csv(data, f"transaksi_{tanggal_mulai_str}_to_{tanggal_akhir_str}.csv"), unsafe_allow_html=True)
+            tampilkan_ekspor(
+                lambda: SumberKueri(KUERI_EKSPOR_TRANSAKSI, rentang, DB_PATH),
+                f"transaksi_{tanggal_mulai_str}_to_{tanggal_akhir_str}"
+            )
+    
+    elif jenis_laporan == "Item Transaksi":
+        baris = dapatkan_laporan(tanggal_mulai_str, tanggal_akhir_str).baris
+        st.dataframe(baris.head(1000))
+        st.caption(f"Menampilkan 1.000 dari {len(baris):,} baris item; ekspor berisi semuanya.")
+        
+        tampilkan_ekspor(
+            lambda: SumberKueri(KUERI_EKSPOR_ITEM, rentang, DB_PATH),
+            f"item_transaksi_{tanggal_mulai_str}_to_{tanggal_akhir_str}"
+        )
     
     elif jenis_laporan == "Penjualan per Produk":
-        data = dapatkan_laporan_penjualan_produk(tanggal_mulai_str, tanggal_akhir_str)
-        if data:
-            df = pd.DataFrame(data)
-            st.dataframe(df)
+        data = dapatkan_laporan(tanggal_mulai_str, tanggal_akhir_str).produk()
+        if not data.empty:
+            st.dataframe(data)
             
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(ekspor_ke_excel(data, f"produk_{tanggal_mulai_str}_to_{tanggal_akhir_str}.xlsx"), unsafe_allow_html=True)
-            with col2:
-                st.markdown(ekspor_ke_csv(data, f"produk_{tanggal_mulai_str}_to_{tanggal_akhir_str}.csv"), unsafe_allow_html=True)
+            tampilkan_ekspor(lambda: SumberBingkai(data), f"produk_{tanggal_mulai_str}_to_{tanggal_akhir_str}")
     
     elif jenis_laporan == "Penjualan per Kategori":
-        data = dapatkan_laporan_penjualan_kategori(tanggal_mulai_str, tanggal_akhir_str)
-        if data:
-            df = pd.DataFrame(data)
-            st.dataframe(df)
+        data = agregat.kategori()
+        if not data.empty:
+            st.dataframe(data)
             
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(ekspor_ke_excel(data, f"kategori_{tanggal_mulai_str}_to_{tanggal_akhir_str}.xlsx"), unsafe_allow_html=True)
-            with col2:
-                st.markdown(ekspor_ke_csv(data, f"kategori_{tanggal_mulai_str}_to_{tanggal_akhir_str}.csv"), unsafe_allow_html=True)
+            tampilkan_ekspor(lambda: SumberBingkai(data), f"kategori_{tanggal_mulai_str}_to_{tanggal_akhir_str}")
     
     elif jenis_laporan == "Stok Inventaris":
         data = dapatkan_laporan_inventaris()
@@ -455,11 +335,7 @@ def tampilkan_dashboard_penjualan():
             df = pd.DataFrame(data)
             st.dataframe(df)
             
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(ekspor_ke_excel(data, f"inventaris_{datetime.now().strftime('%Y-%m-%d')}.xlsx"), unsafe_allow_html=True)
-            with col2:
-                st.markdown(ekspor_ke_csv(data, f"inventaris_{datetime.now().strftime('%Y-%m-%d')}.csv"), unsafe_allow_html=True)
+            tampilkan_ekspor(lambda: SumberBingkai(df), f"inventaris_{datetime.now().strftime('%Y-%m-%d')}")
     
     elif jenis_laporan == "Stok Menipis":
         ambang_batas = st.number_input("Batas Stok Minimum", min_value=1, value=10)
@@ -468,11 +344,7 @@ def tampilkan_dashboard_penjualan():
             df = pd.DataFrame(data)
             st.dataframe(df)
             
-            col1, col2 = st.columns(2)
-            with col1:
-                st.markdown(ekspor_ke_excel(data, f"stok_menipis_{datetime.now().strftime('%Y-%m-%d')}.xlsx"), unsafe_allow_html=True)
-            with col2:
-                st.markdown(ekspor_ke_csv(data, f"stok_menipis_{datetime.now().strftime('%Y-%m-%d')}.csv"), unsafe_allow_html=True)
+            tampilkan_ekspor(lambda: SumberBingkai(df), f"stok_menipis_{datetime.now().strftime('%Y-%m-%d')}")
 
 def tampilkan_laporan_inventaris():
     """Tampilkan UI laporan inventaris"""
@@ -516,8 +388,10 @@ def tampilkan_laporan_inventaris():
         }).reset_index()
         
         # Buat grafik pie
-        buf = buat_grafik_pie(inventaris_kategori, 'nilai_inventaris', 'category', 'Nilai Inventaris per Kategori')
-        st.image(buf)
+        tampilkan_grafik(
+            'pie', inventaris_kategori, 'nilai_inventaris', 'category', 'Nilai Inventaris per Kategori',
+            nama_file="inventaris_kategori.png"
+        )
         
         # Tampilkan tabel
         st.dataframe(inventaris_kategori)
@@ -527,11 +401,7 @@ def tampilkan_laporan_inventaris():
     st.dataframe(df_inventaris)
     
     # Opsi ekspor
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown(ekspor_ke_excel(data_inventaris, f"inventaris_lengkap_{datetime.now().strftime('%Y-%m-%d')}.xlsx"), unsafe_allow_html=True)
-    with col2:
-        st.markdown(ekspor_ke_csv(data_inventaris, f"inventaris_lengkap_{datetime.now().strftime('%Y-%m-%d')}.csv"), unsafe_allow_html=True)
+    tampilkan_ekspor(lambda: SumberBingkai(df_inventaris), f"inventaris_lengkap_{datetime.now().strftime('%Y-%m-%d')}")
 
 def tampilkan_performa_produk():
     """Tampilkan UI analisis performa produk"""
@@ -554,45 +424,44 @@ def tampilkan_performa_produk():
     tanggal_akhir_str = tanggal_akhir.strftime("%Y-%m-%d")
     
     # Dapatkan data penjualan produk
-    penjualan_produk = dapatkan_laporan_penjualan_produk(tanggal_mulai_str, tanggal_akhir_str)
-    if not penjualan_produk:
+    penjualan_produk = dapatkan_laporan(tanggal_mulai_str, tanggal_akhir_str).produk()
+    if penjualan_produk.empty:
         st.info(f"Tidak ada data penjualan produk dalam rentang {tanggal_mulai} hingga {tanggal_akhir}")
         return
     
     # Produk teratas
     st.subheader("Produk Terlaris")
-    df_produk = pd.DataFrame(penjualan_produk)
+    df_produk = penjualan_produk
     
     # 10 teratas berdasarkan jumlah
     teratas_jumlah = df_produk.sort_values('total_quantity', ascending=False).head(10)
     st.write("Berdasarkan Jumlah Terjual:")
-    buf = buat_grafik_batang(
-        teratas_jumlah, 'product_name', 'total_quantity', 
-        '10 Produk Terlaris (Kuantitas)', 'Produk', 'Jumlah Terjual'
+    tampilkan_grafik(
+        'batang', teratas_jumlah, 'product_name', 'total_quantity', 
+        '10 Produk Terlaris (Kuantitas)', 'Produk', 'Jumlah Terjual',
+        nama_file="produk_terlaris_kuantitas.png"
     )
-    st.image(buf)
     
     # 10 teratas berdasarkan pendapatan
     teratas_pendapatan = df_produk.sort_values('total_sales', ascending=False).head(10)
     st.write("Berdasarkan Penjualan:")
-    buf = buat_grafik_batang(
-        teratas_pendapatan, 'product_name', 'total_sales', 
-        '10 Produk Terlaris (Penjualan)', 'Produk', 'Total Penjualan (Rp)'
+    tampilkan_grafik(
+        'batang', teratas_pendapatan, 'product_name', 'total_sales', 
+        '10 Produk Terlaris (Penjualan)', 'Produk', 'Total Penjualan (Rp)',
+        nama_file="produk_terlaris_penjualan.png"
     )
-    st.image(buf)
     
     # Performa kategori
     st.subheader("Performa Kategori")
-    penjualan_kategori = dapatkan_laporan_penjualan_kategori(tanggal_mulai_str, tanggal_akhir_str)
-    if penjualan_kategori:
-        df_kategori = pd.DataFrame(penjualan_kategori)
+    df_kategori = dapatkan_ringkasan(tanggal_mulai_str, tanggal_akhir_str).kategori()
+    if not df_kategori.empty:
         
         # Grafik pie kategori
-        buf = buat_grafik_pie(
-            df_kategori, 'total_sales', 'category', 
-            'Distribusi Penjualan per Kategori'
+        tampilkan_grafik(
+            'pie', df_kategori, 'total_sales', 'category', 
+            'Distribusi Penjualan per Kategori',
+            nama_file="performa_kategori.png"
         )
-        st.image(buf)
         
         # Tabel kategori
         st.dataframe(df_kategori)
@@ -602,11 +471,7 @@ def tampilkan_performa_produk():
     st.dataframe(df_produk)
     
     # Opsi ekspor
-    col1, col2 = st.columns(2)
-    with col1:
-        st.markdown(ekspor_ke_excel(penjualan_produk, f"performa_produk_{tanggal_mulai_str}_to_{tanggal_akhir_str}.xlsx"), unsafe_allow_html=True)
-    with col2:
-        st.markdown(ekspor_ke_csv(penjualan_produk, f"performa_produk_{tanggal_mulai_str}_to_{tanggal_akhir_str}.csv"), unsafe_allow_html=True)
+    tampilkan_ekspor(lambda: SumberBingkai(penjualan_produk), f"performa_produk_{tanggal_mulai_str}_to_{tanggal_akhir_str}")
 
 def tampilkan_ui_laporan():
     """Fungsi UI utama untuk modul laporan"""
@@ -0,0 +1,39 @@
+import argparse
+
+from .schema import DB_PATH, init_schema, open_connection, rebuild_sales_rollups
+
+# Bangun ulang rollup penjualan (sales_daily, sales_hourly) dari transaksi:
+#   python -m modules.rollup                                  # semua tanggal
+#   python -m modules.rollup --mulai 2026-01-01 --akhir 2026-01-31
+#
+# Rollup diperbarui trigger di setiap penjualan dan diisi otomatis saat
+# tabelnya pertama kali dibuat; perintah ini untuk memperbaiki rentang yang
+# datanya diubah langsung di database.
+
+def bangun_ulang(connection, tanggal_mulai=None, tanggal_akhir=None):
+    """Hitung ulang rollup rentang (inklusif, semua tanggal bila kosong) dalam satu transaksi"""
+    with connection:
+        cursor = connection.cursor()
+        init_schema(cursor)
+        rebuild_sales_rollups(cursor, tanggal_mulai, tanggal_akhir)
+        cursor.execute("SELECT COUNT(*) FROM sales_daily")
+        harian = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM sales_hourly")
+        return harian, cursor.fetchone()[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bangun ulang rollup penjualan harian dan per jam")
+    parser.add_argument("--db", help="path database (default: POS_DB_PATH)")
+    parser.add_argument("--mulai", help="tanggal awal YYYY-MM-DD (default: semua)")
+    parser.add_argument("--akhir", help="tanggal akhir YYYY-MM-DD (default: semua)")
+    args = parser.parse_args(argv)
+
+    conn = open_connection(args.db or DB_PATH)
+    try:
+        harian, perjam = bangun_ulang(conn, args.mulai, args.akhir)
+    finally:
+        conn.close()
+    print(f"Rollup dibangun ulang: {harian:,} baris harian, {perjam:,} baris per jam")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,462 @@
+import os
+import sqlite3
+
+# Schema and connection helpers without Streamlit, shared by DatabaseConnection
+# and headless tools (offline journal replayer, checkout benchmark)
+
+DB_PATH = os.environ.get('POS_DB_PATH', 'data/pos_database.db')
+# Short busy timeout: a locked database should fail fast (and the sale go to
+# the offline journal) rather than keep the cashier waiting
+DB_TIMEOUT = float(os.environ.get('POS_DB_TIMEOUT', '2.0'))
+
+def ensure_column(cursor, table: str, column: str, definition: str) -> bool:
+    """Add a column to an existing table if it is missing; returns True when added"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    if any(row['name'] == column for row in cursor.fetchall()):
+        return False
+    cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+    return True
+
+def rebuild_low_stock_alerts(cursor):
+    """Rebuild the low-stock set from scratch (only needed after a migration)"""
+    cursor.execute("DELETE FROM low_stock_alerts")
+    cursor.execute('''
+    INSERT INTO low_stock_alerts (product_id, name, stock, reorder_level)
+    SELECT id, name, stock, reorder_level FROM products
+    WHERE stock < reorder_level
+    ''')
+
+# Sales rollup tables: (table, time key columns, key expression over a timestamp)
+SALES_ROLLUPS = (
+    ('sales_daily', 'date', "date({0})"),
+    ('sales_hourly', 'date, hour', "date({0}), CAST(strftime('%H', {0}) AS INTEGER)"),
+)
+
+def rebuild_sales_rollups(cursor, start: str = None, end: str = None):
+    """Recompute the sales rollups from the raw sales, for all dates or start..end (inclusive)"""
+    params = (start or '0000-01-01', (end or '9999-12-31') + ' 23:59:59')
+    for table, keys, key_expr in SALES_ROLLUPS:
+        cursor.execute(f"DELETE FROM {table} WHERE date BETWEEN ? AND ?", (params[0], params[1][:10]))
+        cursor.execute(f'''
+        INSERT INTO {table} ({keys}, category, payment_method, count, amount, qty)
+        SELECT {key_expr.format('t.created_at')}, '*', t.payment_method, COUNT(*), SUM(t.total_amount),
+               COALESCE(SUM((SELECT SUM(ti.quantity) FROM transaction_items ti
+                             WHERE ti.transaction_id = t.invoice_number)), 0)
+        FROM transactions t
+        WHERE t.created_at BETWEEN ? AND ?
+        GROUP BY {key_expr.format('t.created_at')}, t.payment_method
+        ''', params)
+        cursor.execute(f'''
+        INSERT INTO {table} ({keys}, category, payment_method, count, amount, qty)
+        SELECT {key_expr.format('t.created_at')}, COALESCE(ti.category, ''), t.payment_method,
+               COUNT(*), SUM(ti.subtotal), SUM(ti.quantity)
+        FROM transaction_items ti
+        JOIN transactions t ON t.invoice_number = ti.transaction_id
+        WHERE t.created_at BETWEEN ? AND ?
+        GROUP BY {key_expr.format('t.created_at')}, COALESCE(ti.category, ''), t.payment_method
+        ''', params)
+
+def init_schema(cursor):
+    """Create or migrate every table, index and trigger (idempotent)"""
+    # Create users table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        role TEXT NOT NULL CHECK (role IN ('admin', 'cashier')),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+
+    # Create products table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS products (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        price REAL NOT NULL CHECK (price >= 0),
+        stock INTEGER NOT NULL DEFAULT 0 CHECK (stock >= 0),
+        category TEXT NOT NULL,
+        description TEXT,
+        barcode TEXT UNIQUE,
+        reorder_level INTEGER NOT NULL DEFAULT 10 CHECK (reorder_level >= 0),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_products_name ON products (name COLLATE NOCASE)")
+    reorder_level_added = ensure_column(
+        cursor, 'products', 'reorder_level',
+        'INTEGER NOT NULL DEFAULT 10 CHECK (reorder_level >= 0)'
+    )
+
+    # Materialized low-stock set, kept up to date by the triggers below
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'low_stock_alerts'")
+    low_stock_table_exists = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS low_stock_alerts (
+        product_id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        stock INTEGER NOT NULL,
+        reorder_level INTEGER NOT NULL,
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_low_stock_insert
+    AFTER INSERT ON products
+    WHEN NEW.stock < NEW.reorder_level
+    BEGIN
+        INSERT OR REPLACE INTO low_stock_alerts (product_id, name, stock, reorder_level)
+        VALUES (NEW.id, NEW.name, NEW.stock, NEW.reorder_level);
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_low_stock_update
+    AFTER UPDATE OF name, stock, reorder_level ON products
+    BEGIN
+        DELETE FROM low_stock_alerts
+        WHERE product_id = OLD.id AND NEW.stock >= NEW.reorder_level;
+        INSERT OR REPLACE INTO low_stock_alerts (product_id, name, stock, reorder_level)
+        SELECT NEW.id, NEW.name, NEW.stock, NEW.reorder_level
+        WHERE NEW.stock < NEW.reorder_level;
+    END
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_products_low_stock_delete
+    AFTER DELETE ON products
+    BEGIN
+        DELETE FROM low_stock_alerts WHERE product_id = OLD.id;
+    END
+    ''')
+    if reorder_level_added or not low_stock_table_exists:
+        rebuild_low_stock_alerts(cursor)
+
+    # Create transactions table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS transactions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        invoice_number TEXT UNIQUE NOT NULL,
+        customer_name TEXT,
+        total_amount REAL NOT NULL CHECK (total_amount >= 0),
+        payment_amount REAL NOT NULL CHECK (payment_amount >= 0),
+        payment_method TEXT NOT NULL,
+        cashier_id INTEGER NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (cashier_id) REFERENCES users (id)
+    )
+    ''')
+
+    # Create transaction_items table
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS transaction_items (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        transaction_id TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL CHECK (quantity > 0),
+        price_per_unit REAL NOT NULL CHECK (price_per_unit >= 0),
+        subtotal REAL NOT NULL CHECK (subtotal >= 0),
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (transaction_id) REFERENCES transactions (invoice_number),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+
+    # Keyset pagination of the transaction history and per-invoice item lookups
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transactions_created_at ON transactions (created_at, id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transaction_items_transaction ON transaction_items (transaction_id)")
+
+    # Product snapshot taken at sale time: receipts, history and reports read
+    # these instead of joining products, so deleted/renamed products keep
+    # their historical lines
+    item_snapshot_added = ensure_column(cursor, 'transaction_items', 'product_name', 'TEXT')
+    ensure_column(cursor, 'transaction_items', 'category', 'TEXT')
+    ensure_column(cursor, 'transaction_items', 'barcode', 'TEXT')
+    if item_snapshot_added:
+        cursor.execute('''
+        UPDATE transaction_items
+        SET product_name = (SELECT p.name FROM products p WHERE p.id = transaction_items.product_id),
+            category = (SELECT p.category FROM products p WHERE p.id = transaction_items.product_id),
+            barcode = (SELECT p.barcode FROM products p WHERE p.id = transaction_items.product_id),
+            created_at = COALESCE(
+                (SELECT t.created_at FROM transactions t WHERE t.invoice_number = transaction_items.transaction_id),
+                created_at
+            )
+        ''')
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_transaction_items_created_at ON transaction_items (created_at)")
+
+    # Stock-take (physical count) sessions
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stock_takes (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        status TEXT NOT NULL DEFAULT 'open' CHECK (status IN ('open', 'approved', 'cancelled')),
+        note TEXT,
+        created_by INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        closed_at TIMESTAMP,
+        FOREIGN KEY (created_by) REFERENCES users (id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stock_take_lines (
+        stock_take_id INTEGER NOT NULL,
+        product_id INTEGER NOT NULL,
+        expected_stock INTEGER NOT NULL,
+        counted_stock INTEGER CHECK (counted_stock >= 0),
+        counted_at TIMESTAMP,
+        PRIMARY KEY (stock_take_id, product_id),
+        FOREIGN KEY (stock_take_id) REFERENCES stock_takes (id),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    ) WITHOUT ROWID
+    ''')
+
+    # Invoice number counters, one row per terminal per day
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS invoice_sequences (
+        scope TEXT PRIMARY KEY,
+        last_value INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID
+    ''')
+
+    # Short-lived stock holds for open carts (one row per cart per product)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS stock_reservations (
+        cart_id TEXT NOT NULL,
+        product_id INTEGER NOT NULL,
+        quantity INTEGER NOT NULL CHECK (quantity > 0),
+        expires_at TIMESTAMP NOT NULL,
+        PRIMARY KEY (cart_id, product_id),
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_stock_reservations_product
+    ON stock_reservations (product_id, expires_at)
+    ''')
+
+    # Promotions; the version row is bumped by triggers so every process can
+    # tell cheaply when its compiled promotion tables are stale
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS promotions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        promo_type TEXT NOT NULL CHECK (promo_type IN ('persen', 'potongan', 'harga_khusus', 'beli_gratis')),
+        scope TEXT NOT NULL CHECK (scope IN ('produk', 'kategori', 'semua')),
+        product_id INTEGER,
+        category TEXT,
+        value REAL NOT NULL DEFAULT 0 CHECK (value >= 0),
+        buy_qty INTEGER CHECK (buy_qty > 0),
+        free_qty INTEGER CHECK (free_qty > 0),
+        members_only INTEGER NOT NULL DEFAULT 0,
+        start_time TEXT,
+        end_time TEXT,
+        days TEXT,
+        starts_at TEXT,
+        ends_at TEXT,
+        priority INTEGER NOT NULL DEFAULT 0,
+        active INTEGER NOT NULL DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        FOREIGN KEY (product_id) REFERENCES products (id)
+    )
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS promotion_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO promotion_version (id, version) VALUES (1, 0)")
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cursor.execute(f'''
+        CREATE TRIGGER IF NOT EXISTS trg_promotions_version_{event.lower()}
+        AFTER {event} ON promotions
+        BEGIN
+            UPDATE promotion_version SET version = version + 1 WHERE id = 1;
+        END
+        ''')
+
+    # Applied discounts: subtotal is the net amount charged for the line
+    ensure_column(cursor, 'transaction_items', 'discount_amount', 'REAL NOT NULL DEFAULT 0')
+    ensure_column(cursor, 'transaction_items', 'promotion_id', 'INTEGER')
+    ensure_column(cursor, 'transactions', 'discount_amount', 'REAL NOT NULL DEFAULT 0')
+
+    # Customers; history per customer is served entirely from the covering index
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS customers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        phone TEXT UNIQUE,
+        member_code TEXT UNIQUE,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    ''')
+    ensure_column(cursor, 'transactions', 'customer_id', 'INTEGER REFERENCES customers (id)')
+    cursor.execute('''
+    CREATE INDEX IF NOT EXISTS idx_transactions_customer
+    ON transactions (customer_id, created_at, invoice_number, total_amount, payment_method)
+    ''')
+
+    # Report cache watermark for closed date ranges: bumped only when a sale is
+    # written with a date before today (journal replay, sync from a terminal)
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS report_version (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        version INTEGER NOT NULL
+    )
+    ''')
+    cursor.execute("INSERT OR IGNORE INTO report_version (id, version) VALUES (1, 0)")
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_report_version
+    AFTER INSERT ON transactions
+    WHEN NEW.created_at < date('now', 'localtime')
+    BEGIN
+        UPDATE report_version SET version = version + 1 WHERE id = 1;
+    END
+    ''')
+
+    # Closed months exported to the Parquet archive; a sale written later into
+    # an archived month marks its partition stale so reports read SQLite again
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS archive_partitions (
+        year INTEGER NOT NULL,
+        month INTEGER NOT NULL,
+        path TEXT NOT NULL,
+        row_count INTEGER NOT NULL,
+        stale INTEGER NOT NULL DEFAULT 0,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        PRIMARY KEY (year, month)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_archive_stale
+    AFTER INSERT ON transactions
+    WHEN NEW.created_at < strftime('%Y-%m-01', 'now', 'localtime')
+    BEGIN
+        UPDATE archive_partitions SET stale = 1
+        WHERE year = CAST(strftime('%Y', NEW.created_at) AS INTEGER)
+          AND month = CAST(strftime('%m', NEW.created_at) AS INTEGER);
+    END
+    ''')
+
+    # Daily and hourly sales rollups for the reports, kept up to date by the
+    # triggers below in the same transaction as the sale. Category '*' holds
+    # per-sale totals (count = sales, amount = total_amount); the other rows
+    # hold item lines per category (count = lines, amount = net subtotal),
+    # with '' for lines without a category
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sales_daily'")
+    sales_rollups_exist = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales_daily (
+        date TEXT NOT NULL,
+        category TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        amount REAL NOT NULL DEFAULT 0,
+        qty INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (date, category, payment_method)
+    ) WITHOUT ROWID
+    ''')
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sales_hourly (
+        date TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        category TEXT NOT NULL,
+        payment_method TEXT NOT NULL,
+        count INTEGER NOT NULL DEFAULT 0,
+        amount REAL NOT NULL DEFAULT 0,
+        qty INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (date, hour, category, payment_method)
+    ) WITHOUT ROWID
+    ''')
+    sale_rollups, line_rollups = [], []
+    for table, keys, key_expr in SALES_ROLLUPS:
+        insert = f"INSERT INTO {table} ({keys}, category, payment_method, count, amount, qty)"
+        upsert = f"""ON CONFLICT ({keys}, category, payment_method) DO UPDATE SET
+            count = count + excluded.count, amount = amount + excluded.amount, qty = qty + excluded.qty"""
+        sale_rollups.append(f"""
+        {insert}
+        VALUES ({key_expr.format('NEW.created_at')}, '*', NEW.payment_method, 1, NEW.total_amount, 0)
+        {upsert};""")
+        # Item lines take the date and payment method of their sale; the
+        # sale's '*' row only gains the quantity
+        for category, count, amount in (("'*'", 0, 0), ("COALESCE(NEW.category, '')", 1, 'NEW.subtotal')):
+            line_rollups.append(f"""
+        {insert}
+        SELECT {key_expr.format('t.created_at')}, {category}, t.payment_method, {count}, {amount}, NEW.quantity
+        FROM transactions t WHERE t.invoice_number = NEW.transaction_id
+        {upsert};""")
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_transactions_sales_rollup
+    AFTER INSERT ON transactions
+    BEGIN{''.join(sale_rollups)}
+    END
+    ''')
+    cursor.execute(f'''
+    CREATE TRIGGER IF NOT EXISTS trg_transaction_items_sales_rollup
+    AFTER INSERT ON transaction_items
+    BEGIN{''.join(line_rollups)}
+    END
+    ''')
+    if not sales_rollups_exist:
+        rebuild_sales_rollups(cursor)
+
+    # Change log for delta sync: one row per changed record (INSERT OR REPLACE
+    # moves it to a fresh sequence number), so the log stays bounded by the
+    # number of distinct rows touched since the last acknowledged sync
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'change_log'")
+    change_log_exists = cursor.fetchone() is not None
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        op TEXT NOT NULL CHECK (op IN ('I', 'U', 'D')),
+        UNIQUE (table_name, row_id)
+    )
+    ''')
+    for table, events in (
+        ('transactions', ('INSERT',)),
+        ('customers', ('INSERT', 'UPDATE')),
+        ('products', ('INSERT', 'UPDATE', 'DELETE')),
+        ('promotions', ('INSERT', 'UPDATE', 'DELETE')),
+    ):
+        for event in events:
+            row = 'OLD.id' if event == 'DELETE' else 'NEW.id'
+            cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_change_log_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+                INSERT OR REPLACE INTO change_log (table_name, row_id, op)
+                VALUES ('{table}', {row}, '{event[0]}');
+            END
+            ''')
+        if not change_log_exists:
+            # Rows written before the log existed are shipped on the first sync
+            cursor.execute(f"INSERT INTO change_log (table_name, row_id, op) SELECT '{table}', id, 'I' FROM {table}")
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sync_state (
+        peer TEXT PRIMARY KEY,
+        last_sent_seq INTEGER NOT NULL DEFAULT 0,
+        last_received_seq INTEGER NOT NULL DEFAULT 0,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) WITHOUT ROWID
+    ''')
+    # Central side: ids a terminal uses for its rows -> ids in this database
+    cursor.execute('''
+    CREATE TABLE IF NOT EXISTS sync_id_map (
+        peer TEXT NOT NULL,
+        table_name TEXT NOT NULL,
+        remote_id INTEGER NOT NULL,
+        local_id INTEGER NOT NULL,
+        PRIMARY KEY (peer, table_name, remote_id)
+    ) WITHOUT ROWID
+    ''')
+
+def open_connection(path: str = None, timeout: float = None) -> sqlite3.Connection:
+    """Open a new sqlite3 connection (for background workers that need their own)"""
+    path = path or DB_PATH
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    connection = sqlite3.connect(path, timeout=timeout or DB_TIMEOUT, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    return connection
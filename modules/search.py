@@ -0,0 +1,254 @@
+import heapq
+import re
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+import streamlit as st
+from .customers import KOLOM_PELANGGAN, normalisasi_telepon
+from .database import get_db_connection
+
+# Above this many matching keys (short prefixes, shared barcode prefixes) it is
+# cheaper to walk entries in rank order and stop at the first `batas` matches
+# than to rank the whole candidate range.
+BATAS_RENTANG = 2048
+
+def normalisasi(teks):
+    """Normalisasi teks pencarian (huruf kecil, spasi dirapikan)"""
+    return " ".join(str(teks).lower().split())
+
+class IndeksPrefiks:
+    """Indeks prefiks in-memory berbasis array terurut (bisect)
+
+    Setiap entri punya beberapa kunci, dihasilkan `buat_kunci(entri)`;
+    pencarian prefiks mengambil rentang kunci dengan dua bisect lalu
+    mengurutkan kandidat berdasarkan skor. Entri ditambah/diubah/dihapus satu
+    per satu tanpa membangun ulang indeks.
+    """
+
+    def __init__(self, buat_kunci):
+        self.buat_kunci = buat_kunci
+        self._keys = []      # kunci terurut
+        self._ids = []       # id entri, sejajar dengan _keys
+        self._entry_keys = {}
+        self._peringkat = []  # (-skor, label, id) terurut: urutan hasil
+        self._urut = {}       # id -> tuple (-skor, label, id) yang sedang berlaku
+        self.entries = {}
+        self.skor = {}
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def label(self, entri):
+        return normalisasi(entri.get('name', ''))
+
+    def _hitung_urutan(self, entri_id):
+        urutan = (-self.skor.get(entri_id, 0), self.label(self.entries[entri_id]), entri_id)
+        self._urut[entri_id] = urutan
+        return urutan
+
+    def upsert(self, entri_id, entri):
+        """Tambah atau perbarui satu entri"""
+        with self._lock:
+            self._hapus_kunci(entri_id)
+            kunci = {k for k in self.buat_kunci(entri) if k}
+            for k in kunci:
+                posisi = bisect_left(self._keys, k)
+                self._keys.insert(posisi, k)
+                self._ids.insert(posisi, entri_id)
+            self._entry_keys[entri_id] = kunci
+            self.entries[entri_id] = entri
+            insort(self._peringkat, self._hitung_urutan(entri_id))
+
+    def hapus(self, entri_id):
+        """Hapus satu entri dari indeks"""
+        with self._lock:
+            self._hapus_kunci(entri_id)
+            self.entries.pop(entri_id, None)
+
+    def _hapus_kunci(self, entri_id):
+        if entri_id in self._urut:
+            posisi = bisect_left(self._peringkat, self._urut.pop(entri_id))
+            del self._peringkat[posisi]
+        for k in self._entry_keys.pop(entri_id, ()):
+            posisi = bisect_left(self._keys, k)
+            while posisi < len(self._keys) and self._keys[posisi] == k:
+                if self._ids[posisi] == entri_id:
+                    del self._keys[posisi]
+                    del self._ids[posisi]
+                    break
+                posisi += 1
+
+    def muat(self, entries):
+        """Bangun ulang indeks dari iterable (id, entri) sekaligus"""
+        with self._lock:
+            pasangan = []
+            self._entry_keys = {}
+            self.entries = {}
+            for entri_id, entri in entries:
+                kunci = {k for k in self.buat_kunci(entri) if k}
+                self._entry_keys[entri_id] = kunci
+                self.entries[entri_id] = entri
+                pasangan.extend((k, entri_id) for k in kunci)
+            pasangan.sort()
+            self._keys = [k for k, _ in pasangan]
+            self._ids = [i for _, i in pasangan]
+            self._urut = {}
+            self._peringkat = sorted(self._hitung_urutan(i) for i in self.entries)
+
+    def atur_skor(self, skor):
+        """Ganti seluruh skor peringkat sekaligus"""
+        with self._lock:
+            self.skor = dict(skor)
+            self._peringkat = sorted(self._hitung_urutan(i) for i in self.entries)
+
+    def tambah_skor(self, entri_id, nilai=1):
+        """Naikkan skor peringkat (mis. frekuensi penjualan) satu entri"""
+        with self._lock:
+            if entri_id not in self.entries:
+                return
+            posisi = bisect_left(self._peringkat, self._urut[entri_id])
+            del self._peringkat[posisi]
+            self.skor[entri_id] = self.skor.get(entri_id, 0) + nilai
+            insort(self._peringkat, self._hitung_urutan(entri_id))
+
+    def cari(self, kueri, batas=10):
+        """Kembalikan entri dengan kunci berawalan `kueri`, skor tertinggi dulu"""
+        prefiks = normalisasi(kueri)
+        if not prefiks:
+            return []
+
+        with self._lock:
+            awal = bisect_left(self._keys, prefiks)
+            akhir = bisect_left(self._keys, prefiks + "\uffff", awal)
+
+            if akhir - awal <= BATAS_RENTANG:
+                kandidat = set(self._ids[awal:akhir])
+                urut = self._urut
+                hasil = heapq.nsmallest(batas, (urut[i] for i in kandidat))
+                return [self.entries[i] for _, _, i in hasil]
+
+            # Rentang besar: prefiks ini padat, jadi kecocokan berperingkat
+            # tinggi cepat ditemukan dengan menelusuri urutan peringkat
+            hasil = []
+            for _, _, i in self._peringkat:
+                if any(k.startswith(prefiks) for k in self._entry_keys[i]):
+                    hasil.append(self.entries[i])
+                    if len(hasil) == batas:
+                        break
+            return hasil
+
+def kunci_kata(teks):
+    """Teks ternormalisasi mulai dari awal setiap kata ("kopi susu" -> kopi susu, susu)"""
+    teks = normalisasi(teks)
+    return [teks[i:] for i in range(len(teks)) if i == 0 or teks[i - 1] == " "]
+
+def kunci_produk(produk):
+    """Kunci typeahead produk: nama (dari awal setiap kata), barcode, dan kode/ID"""
+    kunci = kunci_kata(produk.get('name', ''))
+    if produk.get('barcode'):
+        kunci.append(normalisasi(produk['barcode']))
+    kunci.append(str(produk['id']))
+    return kunci
+
+def kunci_pelanggan(pelanggan):
+    """Kunci autocomplete pelanggan: nama (dari awal setiap kata), nomor HP, dan kode member"""
+    kunci = kunci_kata(pelanggan.get('name', ''))
+    telepon = normalisasi_telepon(pelanggan.get('phone'))
+    if telepon:
+        # "0812..." dan "812..." sama-sama cocok
+        kunci += [telepon, telepon.lstrip("0")]
+    if pelanggan.get('member_code'):
+        kunci.append(normalisasi(pelanggan['member_code']))
+    return kunci
+
+# Tanpa stok: stok berubah di setiap penjualan dan dibaca langsung dari
+# database saat produk masuk keranjang
+KOLOM_INDEKS_PRODUK = "id, name, price, category, barcode"
+
+def bangun_indeks_produk(conn, hari_penjualan=30):
+    """Bangun indeks produk dari database beserta frekuensi penjualan terakhir"""
+    indeks = IndeksPrefiks(kunci_produk)
+    produk = conn.execute_query(f"SELECT {KOLOM_INDEKS_PRODUK} FROM products") or []
+    indeks.muat((p['id'], p) for p in produk)
+
+    sejak = (datetime.now() - timedelta(days=hari_penjualan)).strftime("%Y-%m-%d")
+    penjualan = conn.execute_query("""
+        SELECT product_id, SUM(quantity) AS qty
+        FROM transaction_items
+        WHERE created_at >= ?
+        GROUP BY product_id
+    """, (sejak,)) or []
+    indeks.atur_skor({row['product_id']: row['qty'] for row in penjualan})
+    return indeks
+
+@st.cache_resource(show_spinner=False)
+def get_product_index():
+    """Indeks produk bersama untuk seluruh sesi (dibangun sekali per proses)"""
+    return bangun_indeks_produk(get_db_connection())
+
+def perbarui_indeks_produk(*product_ids, ukuran_batch=500):
+    """Sinkronkan produk tertentu ke indeks setelah ditambah, diubah, atau dihapus
+
+    Hanya id yang disebut yang dibaca ulang (per batch) dan di-upsert; id yang
+    sudah tidak ada di database dihapus dari indeks.
+    """
+    conn = get_db_connection()
+    indeks = get_product_index()
+    for mulai in range(0, len(product_ids), ukuran_batch):
+        batch = product_ids[mulai:mulai + ukuran_batch]
+        rows = conn.execute_query(
+            f"SELECT {KOLOM_INDEKS_PRODUK} FROM products WHERE id IN ({', '.join(['?'] * len(batch))})",
+            tuple(batch)
+        )
+        if rows is None:
+            continue  # error sudah ditampilkan; indeks tidak diubah
+        ditemukan = {row['id']: row for row in rows}
+        for product_id in batch:
+            if product_id in ditemukan:
+                indeks.upsert(product_id, ditemukan[product_id])
+            else:
+                indeks.hapus(product_id)
+
+def cari_produk_typeahead(kueri, batas=10):
+    """Saran produk untuk kotak pencarian POS"""
+    return get_product_index().cari(kueri, batas)
+
+def bangun_indeks_pelanggan(conn, hari_kunjungan=90):
+    """Bangun indeks pelanggan; pelanggan yang sering belanja diurutkan lebih dulu"""
+    indeks = IndeksPrefiks(kunci_pelanggan)
+    pelanggan = conn.execute_query(f"SELECT {KOLOM_PELANGGAN} FROM customers") or []
+    indeks.muat((p['id'], p) for p in pelanggan)
+
+    sejak = (datetime.now() - timedelta(days=hari_kunjungan)).strftime("%Y-%m-%d")
+    kunjungan = conn.execute_query("""
+        SELECT customer_id, COUNT(*) AS n
+        FROM transactions
+        WHERE customer_id IS NOT NULL AND created_at >= ?
+        GROUP BY customer_id
+    """, (sejak,)) or []
+    indeks.atur_skor({row['customer_id']: row['n'] for row in kunjungan})
+    return indeks
+
+@st.cache_resource(show_spinner=False)
+def get_customer_index():
+    """Indeks pelanggan bersama untuk seluruh sesi (dibangun sekali per proses)"""
+    return bangun_indeks_pelanggan(get_db_connection())
+
+def perbarui_indeks_pelanggan(customer_id):
+    """Sinkronkan satu pelanggan ke indeks setelah ditambah atau diubah"""
+    rows = get_db_connection().execute_query(
+        f"SELECT {KOLOM_PELANGGAN} FROM customers WHERE id = ?", (customer_id,)
+    )
+    indeks = get_customer_index()
+    if rows:
+        indeks.upsert(customer_id, rows[0])
+    else:
+        indeks.hapus(customer_id)
+
+def cari_pelanggan_typeahead(kueri, batas=8):
+    """Saran pelanggan untuk kotak pencarian POS"""
+    if re.fullmatch(r"[\d\s+\-]+", kueri.strip()):
+        kueri = normalisasi_telepon(kueri) or kueri  # "+62 812-34" -> "081234"
+    return get_customer_index().cari(kueri, batas)
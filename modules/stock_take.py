@@ -0,0 +1,298 @@
+import streamlit as st
+import pandas as pd
+from .compat import fragment
+from .database import get_db_connection
+
+def get_open_stock_take():
+    """Get the currently open stock-take session, if any"""
+    conn = get_db_connection()
+    rows = conn.execute_query(
+        "SELECT * FROM stock_takes WHERE status = 'open' ORDER BY id DESC LIMIT 1"
+    )
+    return rows[0] if rows else None
+
+def start_stock_take(user_id=None, note=""):
+    """Open a stock-take session and snapshot the expected stock of every product"""
+    conn = get_db_connection()
+
+    try:
+        with conn.get_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO stock_takes (note, created_by) VALUES (?, ?)",
+                (note, user_id)
+            )
+            stock_take_id = cursor.lastrowid
+
+            # One statement for the whole catalog
+            cursor.execute("""
+                INSERT INTO stock_take_lines (stock_take_id, product_id, expected_stock)
+                SELECT ?, id, stock FROM products
+            """, (stock_take_id,))
+        return True, stock_take_id
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+
+LOOKUP_CHUNK = 500  # stays well below SQLite's bound-parameter limit
+
+def _lookup_products(cursor, column, values):
+    """Map the given barcodes/ids to product ids, querying only those values"""
+    found = {}
+    values = list(values)
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        chunk = values[start:start + LOOKUP_CHUNK]
+        cursor.execute(
+            f"SELECT id, {column} AS value FROM products WHERE {column} IN ({', '.join(['?'] * len(chunk))})",
+            chunk
+        )
+        found.update((row['value'], row['id']) for row in cursor.fetchall())
+    return found
+
+def resolve_counts(counts):
+    """Map uploaded/scanned rows to product ids
+
+    `counts` is a DataFrame with a `counted` column and either `product_id` or
+    `barcode`. Only the barcodes and ids present in `counts` are looked up, so a
+    single scan does not read the whole catalog. Rows whose barcode or id is not
+    a product end up in the unknown frame.
+    Returns (resolved DataFrame[product_id, counted], unknown DataFrame).
+    """
+    counts = counts.copy()
+    counts.columns = [str(c).strip().lower() for c in counts.columns]
+    if 'counted' not in counts.columns:
+        raise ValueError("Kolom 'counted' wajib ada")
+    if 'product_id' not in counts.columns:
+        counts['product_id'] = pd.NA
+
+    counts['product_id'] = pd.to_numeric(counts['product_id'], errors='coerce')
+    if 'barcode' in counts.columns:
+        counts['barcode'] = counts['barcode'].astype('string').str.strip()
+
+    conn = get_db_connection()
+    with conn.get_cursor() as cursor:
+        if 'barcode' in counts.columns:
+            barcodes = counts.loc[counts['product_id'].isna(), 'barcode'].dropna()
+            by_barcode = _lookup_products(cursor, "barcode", barcodes[barcodes != ""].unique())
+            counts['product_id'] = counts['product_id'].fillna(counts['barcode'].map(by_barcode))
+        # Ids given directly must still be existing products
+        ids = counts['product_id'].dropna().astype('int64').unique()
+        existing = set(_lookup_products(cursor, "id", [int(i) for i in ids]))
+
+    counts['counted'] = pd.to_numeric(counts['counted'], errors='coerce')
+    valid = (
+        counts['product_id'].isin(existing)
+        & counts['counted'].notna()
+        & (counts['counted'] >= 0)
+    )
+
+    # Repeated rows for the same product (e.g. several shelves) are summed
+    resolved = (
+        counts.loc[valid, ['product_id', 'counted']]
+        .astype('int64')
+        .groupby('product_id', as_index=False)['counted'].sum()
+    )
+    return resolved, counts.loc[~valid]
+
+def record_counts(stock_take_id, resolved, add=False):
+    """Store counted quantities for a stock-take session in one transaction
+
+    The expected stock of each counted line is re-read from products at the
+    moment the count is recorded, so sales rung up between opening the session
+    and counting a shelf do not show up as variance. With `add=True` the
+    quantities are added to what was already counted (scanning item by item);
+    the expected stock is then only captured on the first scan.
+
+    Products created after the session was opened have no line yet; their
+    line is added here, with the expected stock taken the same way.
+    """
+    conn = get_db_connection()
+    rows = [(int(counted), stock_take_id, int(product_id))
+            for product_id, counted in zip(resolved['product_id'], resolved['counted'])]
+
+    if add:
+        query = """
+            UPDATE stock_take_lines
+            SET expected_stock = CASE WHEN counted_stock IS NULL
+                    THEN (SELECT stock FROM products WHERE id = stock_take_lines.product_id)
+                    ELSE expected_stock END,
+                counted_stock = COALESCE(counted_stock, 0) + ?,
+                counted_at = CURRENT_TIMESTAMP
+            WHERE stock_take_id = ? AND product_id = ?
+        """
+    else:
+        query = """
+            UPDATE stock_take_lines
+            SET counted_stock = ?,
+                expected_stock = (SELECT stock FROM products WHERE id = stock_take_lines.product_id),
+                counted_at = CURRENT_TIMESTAMP
+            WHERE stock_take_id = ? AND product_id = ?
+        """
+
+    try:
+        with conn.get_cursor() as cursor:
+            cursor.executemany("""
+                INSERT OR IGNORE INTO stock_take_lines (stock_take_id, product_id, expected_stock)
+                SELECT ?, id, stock FROM products WHERE id = ?
+            """, [(stock_take_id, product_id) for _, stock_take_id, product_id in rows])
+            cursor.executemany(query, rows)
+            updated = cursor.rowcount
+        return True, f"{updated} hitungan produk tersimpan"
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+
+def get_stock_take_variance(stock_take_id):
+    """Compute the variance of every line of a session in one vectorized pass"""
+    conn = get_db_connection()
+    lines = pd.read_sql_query("""
+        SELECT l.product_id, p.name, p.category, p.price,
+               l.expected_stock, l.counted_stock, l.counted_at
+        FROM stock_take_lines l
+        JOIN products p ON p.id = l.product_id
+        WHERE l.stock_take_id = ?
+    """, conn.connection, params=(stock_take_id,))
+
+    lines['counted_stock'] = lines['counted_stock'].astype('Int64')
+    lines['variance'] = lines['counted_stock'] - lines['expected_stock']
+    lines['variance_value'] = lines['variance'] * lines['price']
+    return lines
+
+def approve_stock_take(stock_take_id):
+    """Apply all counted variances to product stock in a single transaction
+
+    Corrections are applied as deltas (stock + counted - expected) rather than
+    by overwriting stock with the counted figure, so sales made after a shelf
+    was counted are preserved.
+    """
+    conn = get_db_connection()
+
+    try:
+        with conn.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT status FROM stock_takes WHERE id = ?", (stock_take_id,)
+            )
+            stock_take = cursor.fetchone()
+            if not stock_take or stock_take['status'] != 'open':
+                return False, "Sesi stock opname tidak aktif"
+
+            cursor.execute("""
+                UPDATE products
+                SET stock = MAX(0, stock + (
+                        SELECT l.counted_stock - l.expected_stock
+                        FROM stock_take_lines l
+                        WHERE l.stock_take_id = ? AND l.product_id = products.id
+                    )),
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id IN (
+                    SELECT product_id FROM stock_take_lines
+                    WHERE stock_take_id = ?
+                      AND counted_stock IS NOT NULL
+                      AND counted_stock != expected_stock
+                )
+            """, (stock_take_id, stock_take_id))
+            corrected = cursor.rowcount
+
+            cursor.execute(
+                "UPDATE stock_takes SET status = 'approved', closed_at = CURRENT_TIMESTAMP WHERE id = ?",
+                (stock_take_id,)
+            )
+        return True, f"Stock opname disetujui, {corrected} produk dikoreksi"
+    except Exception as e:
+        return False, f"Error: {str(e)}"
+
+def cancel_stock_take(stock_take_id):
+    """Cancel a stock-take session without touching product stock"""
+    conn = get_db_connection()
+    return conn.update(
+        'stock_takes',
+        {'status': 'cancelled'},
+        "id = ? AND status = 'open'",
+        (stock_take_id,)
+    )
+
+@fragment
+def stock_take_page():
+    """Stock-take (stock opname) UI: open a session, record counts, approve"""
+    st.subheader("Stock Opname")
+
+    stock_take = get_open_stock_take()
+    if not stock_take:
+        note = st.text_input("Catatan (Opsional)", key="stock_take_note")
+        if st.button("Mulai Stock Opname"):
+            user_id = st.session_state.get("user", {}).get("id")
+            success, result = start_stock_take(user_id, note)
+            if success:
+                st.success(f"Sesi stock opname #{result} dimulai")
+                st.experimental_rerun()
+            else:
+                st.error(result)
+        return
+
+    stock_take_id = stock_take['id']
+    st.write(f"Sesi #{stock_take_id} dibuka {stock_take['created_at']}")
+
+    # Bulk upload
+    upload = st.file_uploader(
+        "Unggah hasil hitung (CSV dengan kolom barcode atau product_id, dan counted)",
+        type=["csv"],
+        key=f"stock_take_upload_{stock_take_id}"
+    )
+    if upload is not None and st.button("Simpan Hasil Unggahan"):
+        try:
+            resolved, unknown = resolve_counts(pd.read_csv(upload, dtype={'barcode': 'string'}))
+        except ValueError as e:
+            st.error(str(e))
+        else:
+            success, message = record_counts(stock_take_id, resolved)
+            (st.success if success else st.error)(message)
+            if len(unknown):
+                st.warning(f"{len(unknown)} baris tidak dikenali")
+                st.dataframe(unknown, hide_index=True)
+
+    # Scanning
+    with st.form("stock_take_scan", clear_on_submit=True):
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            barcode = st.text_input("Scan Barcode")
+        with col2:
+            quantity = st.number_input("Jumlah", min_value=1, value=1)
+        if st.form_submit_button("Tambah Hitungan") and barcode:
+            resolved, unknown = resolve_counts(pd.DataFrame({'barcode': [barcode], 'counted': [quantity]}))
+            if len(unknown):
+                st.error(f"Barcode {barcode} tidak ditemukan")
+            else:
+                success, message = record_counts(stock_take_id, resolved, add=True)
+                (st.success if success else st.error)(message)
+
+    # Variance
+    variance = get_stock_take_variance(stock_take_id)
+    counted = variance['counted_stock'].notna()
+    differences = variance[counted & (variance['variance'] != 0)]
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Produk Dihitung", f"{int(counted.sum())} / {len(variance)}")
+    with col2:
+        st.metric("Produk Selisih", f"{len(differences)}")
+    with col3:
+        st.metric("Nilai Selisih", f"Rp {differences['variance_value'].sum():,.0f}")
+
+    if not differences.empty:
+        st.dataframe(
+            differences.sort_values('variance_value')[
+                ['product_id', 'name', 'category', 'expected_stock', 'counted_stock', 'variance', 'variance_value']
+            ],
+            hide_index=True
+        )
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Setujui & Terapkan Koreksi", type="primary"):
+            success, message = approve_stock_take(stock_take_id)
+            if success:
+                st.success(message)
+                st.experimental_rerun()
+            else:
+                st.error(message)
+    with col2:
+        if st.button("Batalkan Sesi"):
+            cancel_stock_take(stock_take_id)
+            st.experimental_rerun()
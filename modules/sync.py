@@ -0,0 +1,487 @@
+import argparse
+import json
+import zlib
+
+from .checkout import TERMINAL_ID, terminal_dari_invoice
+from .promotions import KOLOM_PROMOSI
+from .schema import init_schema, open_connection
+
+# Sinkronisasi delta terminal <-> pusat berbasis change_log:
+#   python -m modules.sync --terminal data/pos_database.db --pusat /mnt/pusat/pos.db --terminal-id 01
+#
+# - Terminal mengirim transaksi (header + seluruh itemnya) dan pelanggan baru/
+#   berubah sejak seq terakhir yang di-ack pusat, dalam batch JSON terkompresi.
+# - Pusat mengirim balik perubahan katalog (produk dan promosi) sejak seq
+#   katalog terakhir yang diterima terminal.
+# - Katalog dan stok dimiliki pusat: stok terminal = stok pusat dikurangi
+#   penjualan lokal yang belum terkirim.
+# - Nomor invoice unik antar terminal karena memuat id terminal
+#   (POS_TERMINAL_ID); sync menolak jalan bila id itu berbeda dengan
+#   --terminal-id, dan pusat menolak invoice yang bentrok dengan isi berbeda.
+#
+# Paket hanyalah bytes, jadi transport lain (HTTP, flashdisk) tinggal
+# memanggil ekspor_*/terapkan_*/ack_* yang sama.
+
+PEER_PUSAT = "pusat"
+
+class SyncError(Exception):
+    """Sinkronisasi ditolak: id terminal tidak cocok, invoice bentrok di pusat, atau produk lokal bentrok"""
+
+KOLOM_TRANSAKSI = """invoice_number, customer_id, customer_name, total_amount, discount_amount,
+    payment_amount, payment_method, cashier_id, created_at"""
+KOLOM_ITEM = """product_id, product_name, category, barcode, quantity, price_per_unit, subtotal,
+    discount_amount, promotion_id, created_at"""
+KOLOM_PRODUK_SYNC = "id, name, price, stock, category, description, barcode, reorder_level, created_at, updated_at"
+KOLOM_PROMOSI_SYNC = KOLOM_PROMOSI + ", active, created_at"
+
+def _kolom(kolom):
+    return [k.strip() for k in kolom.split(",")]
+
+def _json(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False, default=str).encode("utf-8")
+
+def kemas(data):
+    """Dict paket -> bytes terkompresi"""
+    return zlib.compress(_json(data), 9)
+
+def buka(paket):
+    return json.loads(zlib.decompress(paket))
+
+def status_sync(cursor, peer):
+    """(last_sent_seq, last_received_seq) untuk satu peer"""
+    cursor.execute("SELECT last_sent_seq, last_received_seq FROM sync_state WHERE peer = ?", (peer,))
+    row = cursor.fetchone()
+    return (row[0], row[1]) if row else (0, 0)
+
+def _simpan_status(cursor, peer, terkirim=0, diterima=0):
+    cursor.execute("""
+        INSERT INTO sync_state (peer, last_sent_seq, last_received_seq) VALUES (?, ?, ?)
+        ON CONFLICT (peer) DO UPDATE SET
+            last_sent_seq = MAX(last_sent_seq, excluded.last_sent_seq),
+            last_received_seq = MAX(last_received_seq, excluded.last_received_seq),
+            updated_at = CURRENT_TIMESTAMP
+    """, (peer, terkirim, diterima))
+
+def adalah_terminal(cursor):
+    """Apakah database ini terminal yang katalognya dikelola pusat (sudah pernah sinkron)"""
+    cursor.execute("SELECT 1 FROM sync_state WHERE peer = ?", (PEER_PUSAT,))
+    return cursor.fetchone() is not None
+
+def _seq_terakhir(cursor):
+    cursor.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log")
+    return cursor.fetchone()[0]
+
+def _ambil_per_id(cursor, kolom, tabel, ids):
+    if not ids:
+        return []
+    placeholders = ', '.join(['?'] * len(ids))
+    cursor.execute(f"SELECT {kolom} FROM {tabel} WHERE id IN ({placeholders}) ORDER BY id", list(ids))
+    return [dict(row) for row in cursor.fetchall()]
+
+# --- Terminal -> pusat -------------------------------------------------------
+
+def ekspor_delta(cursor, terminal_id, batas=500):
+    """Paket transaksi dan pelanggan yang belum di-ack pusat; None bila tidak ada
+
+    Batas atas seq diambil lebih dulu, jadi penjualan yang di-commit selama
+    ekspor berjalan masuk ke batch berikutnya, bukan ikut ter-ack.
+    """
+    sejak, _ = status_sync(cursor, PEER_PUSAT)
+    puncak = _seq_terakhir(cursor)
+    cursor.execute("""
+        SELECT seq, table_name, row_id FROM change_log
+        WHERE seq > ? AND seq <= ? AND table_name IN ('transactions', 'customers')
+        ORDER BY seq
+        LIMIT ?
+    """, (sejak, puncak, batas))
+    log = cursor.fetchall()
+    if not log:
+        return None
+    # Batch terakhir meng-ack sampai puncak; ack hanya memangkas entri
+    # transaksi/pelanggan, entri produk/promosi lokal tetap di log
+    sampai = puncak if len(log) < batas else log[-1]['seq']
+
+    transaksi = _ambil_per_id(
+        cursor, f"id, {KOLOM_TRANSAKSI}", "transactions",
+        [row['row_id'] for row in log if row['table_name'] == 'transactions']
+    )
+    if transaksi:
+        invoices = [t['invoice_number'] for t in transaksi]
+        placeholders = ', '.join(['?'] * len(invoices))
+        cursor.execute(f"""
+            SELECT transaction_id, {KOLOM_ITEM} FROM transaction_items
+            WHERE transaction_id IN ({placeholders})
+            ORDER BY id
+        """, invoices)
+        items = {}
+        for row in cursor.fetchall():
+            item = dict(row)
+            items.setdefault(item.pop('transaction_id'), []).append(item)
+        for t in transaksi:
+            del t['id']
+            t['items'] = items.get(t['invoice_number'], [])
+
+    # Pelanggan yang dirujuk transaksi selalu ikut, supaya pusat bisa
+    # memetakan customer_id walaupun entri log pelanggannya di batch lain
+    id_pelanggan = {row['row_id'] for row in log if row['table_name'] == 'customers'}
+    id_pelanggan.update(t['customer_id'] for t in transaksi if t['customer_id'])
+    pelanggan = _ambil_per_id(cursor, "id, name, phone, member_code", "customers", sorted(id_pelanggan))
+
+    return {
+        'terminal': terminal_id,
+        'dari_seq': sejak,
+        'sampai_seq': sampai,
+        'pelanggan': pelanggan,
+        'transaksi': transaksi,
+    }
+
+def invoice_asing(cursor, terminal_id):
+    """Invoice lokal belum terkirim yang tidak bernomor `terminal_id` (None bila semua cocok)"""
+    sejak, _ = status_sync(cursor, PEER_PUSAT)
+    cursor.execute("""
+        SELECT t.invoice_number FROM change_log c
+        JOIN transactions t ON t.id = c.row_id
+        WHERE c.table_name = 'transactions' AND c.seq > ?
+        ORDER BY c.seq
+    """, (sejak,))
+    for row in cursor.fetchall():
+        if terminal_dari_invoice(row[0]) != terminal_id:
+            return row[0]
+    return None
+
+def _sidik(t, items):
+    """Isi penjualan yang dibandingkan saat invoice yang sama datang lagi"""
+    return (
+        t['created_at'], round(t['total_amount'], 2), round(t['payment_amount'], 2), t['payment_method'],
+        sorted((i['product_id'], i['quantity'], round(i['subtotal'], 2)) for i in items),
+    )
+
+def _terapkan_pelanggan(cursor, terminal_id, p):
+    """Upsert satu pelanggan terminal; mengembalikan id-nya di pusat
+
+    Dicocokkan lewat peta id terminal, lalu kode member, lalu nomor HP. Bila
+    data terminal bentrok dengan pelanggan pusat lain, data pusat dipertahankan.
+    """
+    cursor.execute("""
+        SELECT local_id FROM sync_id_map
+        WHERE peer = ? AND table_name = 'customers' AND remote_id = ?
+    """, (terminal_id, p['id']))
+    row = cursor.fetchone()
+    customer_id = row[0] if row else None
+    for kolom in ('member_code', 'phone'):
+        if customer_id is None and p[kolom]:
+            cursor.execute(f"SELECT id FROM customers WHERE {kolom} = ?", (p[kolom],))
+            row = cursor.fetchone()
+            customer_id = row[0] if row else None
+
+    if customer_id is None:
+        cursor.execute(
+            "INSERT INTO customers (name, phone, member_code) VALUES (?, ?, ?)",
+            (p['name'], p['phone'], p['member_code'])
+        )
+        customer_id = cursor.lastrowid
+    else:
+        cursor.execute("""
+            UPDATE OR IGNORE customers
+            SET name = ?, phone = COALESCE(?, phone), member_code = COALESCE(?, member_code),
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (p['name'], p['phone'], p['member_code'], customer_id))
+    cursor.execute("""
+        INSERT OR REPLACE INTO sync_id_map (peer, table_name, remote_id, local_id)
+        VALUES (?, 'customers', ?, ?)
+    """, (terminal_id, p['id'], customer_id))
+    return customer_id
+
+def terapkan_delta(cursor, data):
+    """Terapkan paket terminal di database pusat (idempoten); mengembalikan seq ack
+
+    Invoice yang sudah ada dengan isi yang sama dilewati, jadi paket yang
+    terkirim ulang setelah ack hilang tidak tercatat ganda. Invoice yang bukan
+    bernomor terminal ini, atau yang sudah ada dengan isi berbeda (dua terminal
+    memakai id yang sama), menggagalkan seluruh paket dengan SyncError. Stok
+    pusat dikurangi paling rendah sampai 0 karena barang sudah diserahkan di
+    terminal.
+    """
+    terminal_id = data['terminal']
+    transaksi = data['transaksi']
+    for t in transaksi:
+        if terminal_dari_invoice(t['invoice_number']) != terminal_id:
+            raise SyncError(f"Invoice {t['invoice_number']} bukan bernomor terminal {terminal_id}.")
+    if transaksi:
+        invoices = [t['invoice_number'] for t in transaksi]
+        placeholders = ', '.join(['?'] * len(invoices))
+        cursor.execute(f"""
+            SELECT invoice_number, created_at, total_amount, payment_amount, payment_method
+            FROM transactions WHERE invoice_number IN ({placeholders})
+        """, invoices)
+        sudah_ada = {row['invoice_number']: dict(row) for row in cursor.fetchall()}
+        if sudah_ada:
+            cursor.execute(f"""
+                SELECT transaction_id, product_id, quantity, subtotal FROM transaction_items
+                WHERE transaction_id IN ({', '.join(['?'] * len(sudah_ada))})
+            """, list(sudah_ada))
+            items_ada = {}
+            for row in cursor.fetchall():
+                items_ada.setdefault(row['transaction_id'], []).append(row)
+            for t in transaksi:
+                lama = sudah_ada.get(t['invoice_number'])
+                if lama and _sidik(lama, items_ada.get(t['invoice_number'], [])) != _sidik(t, t['items']):
+                    raise SyncError(
+                        f"Invoice {t['invoice_number']} sudah ada di pusat dengan isi berbeda; "
+                        f"pastikan setiap terminal memakai POS_TERMINAL_ID yang unik."
+                    )
+        transaksi = [t for t in transaksi if t['invoice_number'] not in sudah_ada]
+
+    _, diterima = status_sync(cursor, terminal_id)
+    if data['sampai_seq'] <= diterima:
+        if transaksi:
+            # Seq ini sudah diterima tetapi penjualannya belum ada: paket dari
+            # terminal lain yang memakai id yang sama
+            raise SyncError(
+                f"Paket seq {data['sampai_seq']} dari terminal {terminal_id} sudah diterima tetapi "
+                f"invoice {transaksi[0]['invoice_number']} belum ada; id terminal dipakai ganda."
+            )
+        return diterima
+    sebelum = _seq_terakhir(cursor)
+
+    peta = {p['id']: _terapkan_pelanggan(cursor, terminal_id, p) for p in data['pelanggan']}
+
+    kolom_transaksi, kolom_item = _kolom(KOLOM_TRANSAKSI), _kolom(KOLOM_ITEM)
+    cursor.executemany(f"""
+        INSERT INTO transactions ({KOLOM_TRANSAKSI})
+        VALUES ({', '.join(['?'] * len(kolom_transaksi))})
+    """, [
+        [peta.get(t['customer_id']) if k == 'customer_id' else t[k] for k in kolom_transaksi]
+        for t in transaksi
+    ])
+    cursor.executemany(f"""
+        INSERT INTO transaction_items (transaction_id, {KOLOM_ITEM})
+        VALUES (?, {', '.join(['?'] * len(kolom_item))})
+    """, [
+        [t['invoice_number'], *(item[k] for k in kolom_item)]
+        for t in transaksi
+        for item in t['items']
+    ])
+
+    terjual = {}
+    for t in transaksi:
+        for item in t['items']:
+            terjual[item['product_id']] = terjual.get(item['product_id'], 0) + item['quantity']
+    cursor.executemany("""
+        UPDATE products
+        SET stock = MAX(stock - ?, 0), updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, [(jumlah, product_id) for product_id, jumlah in terjual.items()])
+
+    # Penjualan dan pelanggan yang baru dikonsolidasi tidak dicatat ulang;
+    # perubahan stok tetap di log supaya sampai ke semua terminal
+    cursor.execute(
+        "DELETE FROM change_log WHERE seq > ? AND table_name IN ('transactions', 'customers')",
+        (sebelum,)
+    )
+    _simpan_status(cursor, terminal_id, diterima=data['sampai_seq'])
+    return data['sampai_seq']
+
+def ack_delta(cursor, seq):
+    """Terminal: catat ack pusat lalu pangkas log transaksi/pelanggan yang sudah terkirim
+
+    Entri produk/promosi lokal tidak dikirim ke pusat, jadi tidak ikut dipangkas.
+    """
+    _simpan_status(cursor, PEER_PUSAT, terkirim=seq)
+    cursor.execute(
+        "DELETE FROM change_log WHERE seq <= ? AND table_name IN ('transactions', 'customers')",
+        (seq,)
+    )
+
+# --- Pusat -> terminal -------------------------------------------------------
+
+def ekspor_katalog(cursor, terminal_id):
+    """Perubahan produk dan promosi di pusat sejak yang terakhir diterima terminal"""
+    sejak, _ = status_sync(cursor, terminal_id)
+    puncak = _seq_terakhir(cursor)
+    cursor.execute("""
+        SELECT table_name, row_id, op FROM change_log
+        WHERE seq > ? AND seq <= ? AND table_name IN ('products', 'promotions')
+    """, (sejak, puncak))
+    berubah = {'products': set(), 'promotions': set()}
+    for row in cursor.fetchall():
+        berubah[row['table_name']].add(row['row_id'])
+    if not any(berubah.values()):
+        return None
+
+    produk = _ambil_per_id(cursor, KOLOM_PRODUK_SYNC, "products", sorted(berubah['products']))
+    promosi = _ambil_per_id(cursor, KOLOM_PROMOSI_SYNC, "promotions", sorted(berubah['promotions']))
+    return {
+        'sampai_seq': puncak,
+        'produk': produk,
+        # Baris yang sudah tidak ada (op D, atau dihapus setelah diubah) dihapus di terminal
+        'produk_hapus': sorted(berubah['products'] - {p['id'] for p in produk}),
+        'promosi': promosi,
+        'promosi_hapus': sorted(berubah['promotions'] - {p['id'] for p in promosi}),
+    }
+
+def _penjualan_belum_terkirim(cursor):
+    """{product_id: jumlah} dari transaksi lokal yang belum di-ack pusat"""
+    sejak, _ = status_sync(cursor, PEER_PUSAT)
+    cursor.execute("""
+        SELECT ti.product_id, SUM(ti.quantity)
+        FROM change_log c
+        JOIN transactions t ON t.id = c.row_id
+        JOIN transaction_items ti ON ti.transaction_id = t.invoice_number
+        WHERE c.table_name = 'transactions' AND c.seq > ?
+        GROUP BY ti.product_id
+    """, (sejak,))
+    return {row[0]: row[1] for row in cursor.fetchall()}
+
+def _upsert(cursor, tabel, kolom, rows):
+    # Sengaja bukan INSERT ... ON CONFLICT: klausa konflik statement luar
+    # menimpa INSERT OR REPLACE di dalam trigger (low_stock_alerts, change_log)
+    nama = _kolom(kolom)
+    ada = {row['id'] for row in _ambil_per_id(cursor, "id", tabel, [row['id'] for row in rows])}
+    cursor.executemany(f"""
+        UPDATE {tabel} SET {', '.join(f'{k} = ?' for k in nama[1:])} WHERE id = ?
+    """, [[row[k] for k in nama[1:]] + [row['id']] for row in rows if row['id'] in ada])
+    cursor.executemany(f"""
+        INSERT INTO {tabel} ({', '.join(nama)}) VALUES ({', '.join(['?'] * len(nama))})
+    """, [[row[k] for k in nama] for row in rows if row['id'] not in ada])
+
+def terapkan_katalog(cursor, data):
+    """Terminal: terapkan katalog pusat (upsert per id) dan catat seq yang diterima
+
+    Pada katalog pertama, produk lokal yang idnya dipakai produk pusat lain
+    (nama/barcode berbeda) menggagalkan paket dengan SyncError.
+    """
+    _, diterima = status_sync(cursor, PEER_PUSAT)
+    if data['sampai_seq'] <= diterima:
+        return diterima
+    sebelum = _seq_terakhir(cursor)
+
+    # Produk yang dibuat di terminal tidak pernah dikirim ke pusat; produk
+    # pusat dengan id yang sama tidak boleh diam-diam menimpanya. Setelah
+    # katalog pertama, add_product menolak produk baru di terminal.
+    masuk = {p['id']: p for p in data['produk']}
+    if masuk and diterima == 0:
+        lokal = _ambil_per_id(cursor, "id, name, barcode", "products", list(masuk))
+        bentrok = [
+            row['id'] for row in lokal
+            if (row['name'], row['barcode'] or None) != (masuk[row['id']]['name'], masuk[row['id']]['barcode'] or None)
+        ]
+        if bentrok:
+            raise SyncError(
+                f"Produk lokal dengan id {', '.join(map(str, bentrok))} bentrok dengan produk pusat; "
+                f"tambahkan produk tersebut di pusat lalu hapus versi lokalnya."
+            )
+
+    belum_terkirim = _penjualan_belum_terkirim(cursor)
+    produk = [
+        dict(p, stock=max(p['stock'] - belum_terkirim.get(p['id'], 0), 0))
+        for p in data['produk']
+    ]
+    # Barcode milik pusat: lepas dari produk lokal lain agar UNIQUE tidak bentrok
+    cursor.executemany(
+        "UPDATE products SET barcode = NULL WHERE barcode = ? AND id != ?",
+        [(p['barcode'], p['id']) for p in produk if p['barcode']]
+    )
+    _upsert(cursor, "products", KOLOM_PRODUK_SYNC, produk)
+    _upsert(cursor, "promotions", KOLOM_PROMOSI_SYNC, data['promosi'])
+    cursor.executemany("DELETE FROM promotions WHERE id = ?", [(i,) for i in data['promosi_hapus']])
+    cursor.executemany("DELETE FROM products WHERE id = ?", [(i,) for i in data['produk_hapus']])
+
+    # Perubahan dari pusat tidak dicatat ulang di log terminal
+    cursor.execute(
+        "DELETE FROM change_log WHERE seq > ? AND table_name IN ('products', 'promotions')",
+        (sebelum,)
+    )
+    _simpan_status(cursor, PEER_PUSAT, diterima=data['sampai_seq'])
+    return data['sampai_seq']
+
+def ack_katalog(cursor, terminal_id, seq):
+    """Pusat: catat seq katalog yang sudah diterapkan terminal"""
+    _simpan_status(cursor, terminal_id, terkirim=seq)
+
+# --- Orkestrasi --------------------------------------------------------------
+
+def sinkronkan(terminal_path, pusat_path, terminal_id, batas=500):
+    """Kirim semua delta terminal ke pusat lalu tarik katalog; mengembalikan statistik"""
+    terminal = open_connection(terminal_path)
+    pusat = open_connection(pusat_path)
+    statistik = {
+        'batch': 0, 'transaksi': 0, 'item': 0, 'pelanggan': 0,
+        'produk': 0, 'promosi': 0, 'dihapus': 0,
+        'bytes_mentah': 0, 'bytes_terkirim': 0,
+    }
+
+    def catat_paket(data):
+        paket = kemas(data)
+        statistik['bytes_mentah'] += len(_json(data))
+        statistik['bytes_terkirim'] += len(paket)
+        return paket
+
+    try:
+        for conn in (terminal, pusat):
+            with conn:
+                init_schema(conn.cursor())
+
+        # Tolak sebelum mengirim apa pun: invoice dari id terminal lain bisa
+        # bentrok dengan penjualan terminal itu di pusat
+        asing = invoice_asing(terminal.cursor(), terminal_id)
+        if asing:
+            raise SyncError(
+                f"Invoice {asing} tidak bernomor terminal {terminal_id}. Samakan POS_TERMINAL_ID "
+                f"terminal ini dengan --terminal-id (dan unik per terminal)."
+            )
+
+        while True:
+            with terminal:
+                data = ekspor_delta(terminal.cursor(), terminal_id, batas)
+            if data is None:
+                break
+            paket = catat_paket(data)
+            with pusat:
+                ack = terapkan_delta(pusat.cursor(), buka(paket))
+            with terminal:
+                ack_delta(terminal.cursor(), ack)
+            statistik['batch'] += 1
+            statistik['transaksi'] += len(data['transaksi'])
+            statistik['item'] += sum(len(t['items']) for t in data['transaksi'])
+            statistik['pelanggan'] += len(data['pelanggan'])
+
+        with pusat:
+            katalog = ekspor_katalog(pusat.cursor(), terminal_id)
+        if katalog:
+            paket = catat_paket(katalog)
+            with terminal:
+                seq = terapkan_katalog(terminal.cursor(), buka(paket))
+            with pusat:
+                ack_katalog(pusat.cursor(), terminal_id, seq)
+            statistik['produk'] += len(katalog['produk'])
+            statistik['promosi'] += len(katalog['promosi'])
+            statistik['dihapus'] += len(katalog['produk_hapus']) + len(katalog['promosi_hapus'])
+    finally:
+        terminal.close()
+        pusat.close()
+    return statistik
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sinkronisasi delta terminal POS dengan database pusat")
+    parser.add_argument("--terminal", required=True, help="path database terminal")
+    parser.add_argument("--pusat", required=True, help="path database pusat")
+    parser.add_argument(
+        "--terminal-id", default=TERMINAL_ID,
+        help="identitas terminal di pusat, sama dengan awalan invoice (default: POS_TERMINAL_ID)"
+    )
+    parser.add_argument("--batas", type=int, default=500, help="entri log per batch")
+    args = parser.parse_args(argv)
+
+    try:
+        s = sinkronkan(args.terminal, args.pusat, args.terminal_id, args.batas)
+    except SyncError as e:
+        parser.exit(1, f"Sinkronisasi ditolak: {e}\n")
+    print(f"Terkirim: {s['transaksi']} transaksi ({s['item']} item), {s['pelanggan']} pelanggan "
+          f"dalam {s['batch']} batch")
+    print(f"Diterima: {s['produk']} produk, {s['promosi']} promosi, {s['dihapus']} dihapus")
+    print(f"Ukuran: {s['bytes_mentah']:,} bytes -> {s['bytes_terkirim']:,} bytes terkompresi")
+
+if __name__ == "__main__":
+    main()
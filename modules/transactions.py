@@ -1,276 +1,556 @@
+import os
+import sqlite3
 import streamlit as st
 import pandas as pd
-from datetime import datetime
-import uuid
-from modules.database import get_db_connection
-from modules.products import ambil_produk_berdasarkan_id, perbarui_stok_produk
+from datetime import datetime, timedelta
+from modules.checkout import CheckoutError, GeneratorInvoice, Keranjang, LayananCheckout
+from modules.customers import riwayat_pembelian, simpan_pelanggan
+from modules.database import get_db_connection, open_connection
+from modules.hooks import RegistriHook
+from modules.journal import JurnalCheckout, PemutarJurnal
+from modules.promotions import CAKUPAN_PROMOSI, JENIS_PROMOSI, KOLOM_PROMOSI, MesinPromosi
+from modules.receipt import TEMPLATE_STRUK, ambil_struk, buat_printer
+from modules.search import (
+    cari_pelanggan_typeahead, cari_produk_typeahead, get_customer_index, get_product_index,
+    perbarui_indeks_pelanggan
+)
 
-def proses_transaksi(nama_pelanggan, metode_pembayaran, jumlah_pembayaran):
+METODE_PEMBAYARAN = ["Tunai", "QRIS", "Kartu Debit", "Kartu Kredit"]
+CETAK_OTOMATIS = os.environ.get("POS_CETAK_OTOMATIS", "0") == "1"
+
+def proses_transaksi(nama_pelanggan, metode_pembayaran, jumlah_pembayaran, member=False, customer_id=None):
     """Memproses transaksi dan menyimpan ke database"""
-    if 'keranjang' not in st.session_state or not st.session_state.keranjang:
-        st.error("Keranjang belanja kosong.")
-        return False
-    
-    id_transaksi = hasilkan_id_transaksi()
-    total_belanja = dapatkan_total_keranjang()
-    
-    if jumlah_pembayaran < total_belanja:
-        st.error("Pembayaran kurang dari total belanja.")
-        return False
-    
-    jumlah_kembalian = jumlah_pembayaran - total_belanja
-    tanggal_transaksi = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    
-    # Masukkan header transaksi
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+    kasir_id = st.session_state.get("user", {}).get("id", 1)
     try:
-        # Masukkan header transaksi
-        cursor.execute("""
-            INSERT INTO transactions 
-            (invoice_number, total_amount, payment_method, cashier_id, created_at) 
-            VALUES (?, ?, ?, ?, ?)
-        """, (id_transaksi, total_belanja, metode_pembayaran, 1, tanggal_transaksi))  # Asumsikan cashier_id adalah 1
-        
-        # Masukkan detail transaksi dan update stok
-        stock_update_failed = False
-        for item in st.session_state.keranjang:
-            cursor.execute("""
-                INSERT INTO transaction_items
-                (transaction_id, product_id, quantity, price_per_unit, subtotal)
-                VALUES (?, ?, ?, ?, ?)
-            """, (id_transaksi, item['id'], item['quantity'], item['price'], item['subtotal']))
-            berhasil, pesan = perbarui_stok_produk(item['id'], -item['quantity'])  # Mengurangi stok berdasarkan jumlah produk
-
-            print(f"Hasil perbarui_stok_produk: Berhasil={berhasil}, Pesan={pesan}")
-            if not berhasil:
-                st.error(pesan)
-                stock_update_failed = True
-                break  # Hentikan proses jika ada masalah stok
-
-        if stock_update_failed:
-            conn.rollback() # Rollback jika ada kesalahan stok
-            return False
-        else:
-            conn.commit()  # Simpan semua perubahan jika tidak ada kesalahan stok
-        bersihkan_keranjang()  # Kosongkan keranjang setelah transaksi selesai
-        return {
-            'id_transaksi': id_transaksi,
-            'total': total_belanja,
-            'pembayaran': jumlah_pembayaran,
-            'kembalian': jumlah_kembalian,
-            'tanggal': tanggal_transaksi
-        }
-    
+        return get_layanan_checkout().checkout(
+            dapatkan_keranjang(), metode_pembayaran, jumlah_pembayaran, kasir_id, nama_pelanggan,
+            member, customer_id
+        )
+    except CheckoutError as e:
+        st.error(str(e))
     except Exception as e:
-        conn.rollback()
         st.error(f"Error dalam transaksi: {str(e)}")
-        return False
-    finally:
-        conn.close()
+    return False
+
+@st.cache_resource(show_spinner=False)
+def get_layanan_checkout():
+    """Layanan checkout bersama; UI ini hanya klien tipisnya"""
+    return LayananCheckout(
+        get_db_connection().get_cursor,
+        generator=get_generator_invoice(),
+        jurnal=get_pemutar_jurnal(),
+        hooks=get_hook_checkout()
+    )
+
+@st.cache_resource(show_spinner=False)
+def get_hook_checkout():
+    """Hook pasca-commit checkout (satu thread pool per proses)"""
+    hooks = RegistriHook()
+    indeks = get_product_index()
+    indeks_pelanggan = get_customer_index()
+
+    @hooks.daftar("checkout", nama="skor_typeahead")
+    def perbarui_skor(penjualan):
+        # Frekuensi penjualan menentukan peringkat saran typeahead
+        for item in penjualan['items']:
+            indeks.tambah_skor(item['id'], item['quantity'])
+        if penjualan.get('customer_id'):
+            indeks_pelanggan.tambah_skor(penjualan['customer_id'])
+
+    if CETAK_OTOMATIS:
+        printer = get_printer()
+
+        @hooks.daftar("checkout", nama="cetak_struk")
+        def cetak_otomatis(penjualan):
+            if penjualan.get('offline'):
+                return  # Belum ada di database; dicetak manual setelah jurnal diputar
+            conn = open_connection()
+            try:
+                struk = ambil_struk(conn.cursor(), penjualan['id_transaksi'])
+            finally:
+                conn.close()
+            printer.cetak(TEMPLATE_STRUK.render_escpos(struk), penjualan['id_transaksi'])
+
+    return hooks
+
+@st.cache_resource(show_spinner=False)
+def get_pemutar_jurnal():
+    """Jurnal checkout lokal dan thread pemutar ulangnya (satu per proses)"""
+    pemutar = PemutarJurnal(JurnalCheckout(), open_connection)
+    pemutar.start()
+    return pemutar
+
+@st.cache_resource(show_spinner=False)
+def get_printer():
+    """Printer struk terminal ini (POS_PRINTER)"""
+    return buat_printer()
+
+def cetak_struk(struk):
+    """Kirim struk ke printer; mengembalikan (berhasil, pesan)"""
+    try:
+        tujuan = get_printer().cetak(TEMPLATE_STRUK.render_escpos(struk), struk['invoice_number'])
+        return True, f"Struk dikirim ke {tujuan}"
+    except Exception as e:
+        return False, f"Gagal mencetak struk: {str(e)}"
 
 def show_receipt(transaction_id):
     """Menampilkan struk transaksi"""
-    # Ambil data transaksi berdasarkan ID
-    query = '''
-    SELECT t.invoice_number, t.total_amount, t.payment_method, t.created_at, u.username AS cashier
-    FROM transactions t
-    JOIN users u ON t.cashier_id = u.id
-    WHERE t.invoice_number = ?
-    '''
+    # Header dan semua item diambil dengan satu kueri
+    with get_db_connection().get_cursor() as cursor:
+        struk = ambil_struk(cursor, transaction_id)
+    
+    if not struk:
+        st.error(f"Transaksi dengan ID {transaction_id} tidak ditemukan.")
+        return
+    
+    st.subheader(f"Struk Transaksi {transaction_id}")
+    st.code(TEMPLATE_STRUK.render_teks(struk), language=None)
     
+    if st.button("Cetak Struk", key=f"cetak_{transaction_id}"):
+        berhasil, pesan = cetak_struk(struk)
+        (st.success if berhasil else st.error)(pesan)
+
+UKURAN_HALAMAN_RIWAYAT = 50
+
+def dapatkan_halaman_transaksi(filter_riwayat, setelah=None, batas=UKURAN_HALAMAN_RIWAYAT):
+    """Ambil satu halaman riwayat transaksi dengan keyset pagination
+
+    Halaman diurutkan (created_at, id) menurun; `setelah` adalah pasangan
+    (created_at, id) baris terakhir halaman sebelumnya. Semua filter dijalankan
+    di database sehingga hanya baris yang ditampilkan yang dibaca. Mengembalikan
+    (baris, ada_halaman_berikutnya).
+    """
+    kondisi = []
+    params = []
+    
+    if filter_riwayat.get('tanggal_mulai'):
+        kondisi.append("t.created_at >= ?")
+        params.append(filter_riwayat['tanggal_mulai'])
+    if filter_riwayat.get('tanggal_akhir'):
+        kondisi.append("t.created_at <= ?")
+        params.append(filter_riwayat['tanggal_akhir'] + " 23:59:59")
+    if filter_riwayat.get('cashier_id'):
+        kondisi.append("t.cashier_id = ?")
+        params.append(filter_riwayat['cashier_id'])
+    if filter_riwayat.get('payment_method'):
+        kondisi.append("t.payment_method = ?")
+        params.append(filter_riwayat['payment_method'])
+    if filter_riwayat.get('total_min') is not None:
+        kondisi.append("t.total_amount >= ?")
+        params.append(filter_riwayat['total_min'])
+    if filter_riwayat.get('total_max') is not None:
+        kondisi.append("t.total_amount <= ?")
+        params.append(filter_riwayat['total_max'])
+    if filter_riwayat.get('awalan_invoice'):
+        # Rentang, bukan LIKE, agar indeks UNIQUE invoice_number terpakai
+        kondisi.append("t.invoice_number >= ? AND t.invoice_number < ?")
+        params += [filter_riwayat['awalan_invoice'], filter_riwayat['awalan_invoice'] + "\uffff"]
+    if setelah:
+        kondisi.append("(t.created_at, t.id) < (?, ?)")
+        params += list(setelah)
+    
+    where = ("WHERE " + " AND ".join(kondisi)) if kondisi else ""
     conn = get_db_connection()
-    transaction = pd.read_sql_query(query, conn, params=(transaction_id,))
-    conn.close()
+    baris = conn.execute_query(f"""
+        SELECT t.id, t.invoice_number, t.total_amount, t.payment_method, t.created_at, u.username AS cashier
+        FROM transactions t
+        LEFT JOIN users u ON t.cashier_id = u.id
+        {where}
+        ORDER BY t.created_at DESC, t.id DESC
+        LIMIT ?
+    """, tuple(params + [batas + 1])) or []
     
-    if transaction.empty:
-        st.error(f"Transaksi dengan ID {transaction_id} tidak ditemukan.")
-    else:
-        st.subheader(f"Struk Transaksi {transaction_id}")
-        st.write(f"Nomor Faktur: {transaction.iloc[0]['invoice_number']}")
-        st.write(f"Total: Rp {transaction.iloc[0]['total_amount']:,.0f}")
-        st.write(f"Metode Pembayaran: {transaction.iloc[0]['payment_method']}")
-        st.write(f"Tanggal: {transaction.iloc[0]['created_at']}")
-        st.write(f"Kasir: {transaction.iloc[0]['cashier']}")
-        
-        # Tampilkan detail produk dalam transaksi
-        query_details = '''
-        SELECT ti.product_id, p.name, ti.quantity, ti.price_per_unit, ti.subtotal
-        FROM transaction_items ti
-        JOIN products p ON ti.product_id = p.id
-        WHERE ti.transaction_id = ?
-        '''
-        conn = get_db_connection()
-        items = pd.read_sql_query(query_details, conn, params=(transaction_id,))
-        conn.close()
-
-        if not items.empty:
-            st.write("**Detail Produk**")
-            for index, item in items.iterrows():
-                st.write(f"**{item['name']}** x {item['quantity']} - Rp {item['subtotal']:,.0f}")
-        else:
-            st.info("Tidak ada produk dalam transaksi.")
+    return baris[:batas], len(baris) > batas
+
+def cari_transaksi_invoice(invoice_number):
+    """Cari satu transaksi berdasarkan nomor invoice (lookup indeks UNIQUE)"""
+    conn = get_db_connection()
+    baris = conn.execute_query("""
+        SELECT t.id, t.invoice_number, t.total_amount, t.payment_method, t.created_at, u.username AS cashier
+        FROM transactions t
+        LEFT JOIN users u ON t.cashier_id = u.id
+        WHERE t.invoice_number = ?
+    """, (invoice_number.strip(),))
+    return baris[0] if baris else None
+
+def dapatkan_item_transaksi(invoice_number):
+    """Detail item satu transaksi"""
+    conn = get_db_connection()
+    return conn.execute_query("""
+        SELECT product_id, product_name AS name, quantity, price_per_unit, subtotal
+        FROM transaction_items
+        WHERE transaction_id = ?
+    """, (invoice_number,)) or []
 
 def transaction_history():
     """Menampilkan riwayat transaksi"""
     st.title("Riwayat Transaksi")
-
-    # Ambil data transaksi dari database
-    query = '''
-    SELECT t.id, t.invoice_number, t.total_amount, t.payment_method, t.created_at, u.username AS cashier
-    FROM transactions t
-    JOIN users u ON t.cashier_id = u.id
-    ORDER BY t.created_at DESC
-    '''
-    
     conn = get_db_connection()
-    df = pd.read_sql_query(query, conn)
-    conn.close()
 
-    if df.empty:
-        st.info("Belum ada transaksi yang dilakukan.")
+    # Cari langsung berdasarkan nomor invoice
+    invoice_dicari = st.text_input("Cari Nomor Invoice")
+    if invoice_dicari:
+        transaksi = cari_transaksi_invoice(invoice_dicari)
+        if transaksi:
+            st.write(pd.DataFrame([transaksi]))
+            tampilkan_detail_transaksi(transaksi['invoice_number'])
+        else:
+            st.info(f"Transaksi {invoice_dicari} tidak ditemukan.")
+        return
+
+    # Filter (dijalankan di database)
+    with st.expander("Filter", expanded=False):
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            hari_ini = datetime.now().date()
+            tanggal_mulai = st.date_input("Dari Tanggal", hari_ini - timedelta(days=30))
+            tanggal_akhir = st.date_input("Sampai Tanggal", hari_ini)
+        with col2:
+            kasir = conn.execute_query("SELECT id, username FROM users ORDER BY username") or []
+            pilihan_kasir = st.selectbox(
+                "Kasir", [None] + kasir,
+                format_func=lambda k: "Semua" if k is None else k['username']
+            )
+            metode = st.selectbox("Metode Pembayaran", ["Semua"] + METODE_PEMBAYARAN)
+        with col3:
+            total_min = st.number_input("Total Minimum (Rp)", min_value=0.0, step=10000.0)
+            total_max = st.number_input("Total Maksimum (Rp, 0 = tanpa batas)", min_value=0.0, step=10000.0)
+            awalan_invoice = st.text_input("Awalan Invoice")
+
+    filter_riwayat = {
+        'tanggal_mulai': tanggal_mulai.strftime("%Y-%m-%d"),
+        'tanggal_akhir': tanggal_akhir.strftime("%Y-%m-%d"),
+        'cashier_id': pilihan_kasir['id'] if pilihan_kasir else None,
+        'payment_method': None if metode == "Semua" else metode,
+        'total_min': total_min or None,
+        'total_max': total_max or None,
+        'awalan_invoice': awalan_invoice.strip(),
+    }
+
+    # Kursor halaman disimpan per kombinasi filter; filter baru = kembali ke halaman 1
+    if st.session_state.get('riwayat_filter') != filter_riwayat:
+        st.session_state.riwayat_filter = filter_riwayat
+        st.session_state.riwayat_kursor = [None]
+    kursor = st.session_state.riwayat_kursor
+
+    baris, ada_berikutnya = dapatkan_halaman_transaksi(filter_riwayat, kursor[-1])
+    if not baris:
+        st.info("Belum ada transaksi yang dilakukan." if len(kursor) == 1 else "Tidak ada transaksi lagi.")
+        return
+
+    df = pd.DataFrame(baris)
+    st.dataframe(df, hide_index=True)
+
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("← Sebelumnya", disabled=len(kursor) == 1):
+            kursor.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Halaman {len(kursor)}")
+    with col3:
+        if st.button("Berikutnya →", disabled=not ada_berikutnya):
+            kursor.append((baris[-1]['created_at'], baris[-1]['id']))
+            st.rerun()
+
+    # Pilih transaksi (hanya dari halaman ini) untuk melihat detail
+    transaction_id = st.selectbox("Pilih Transaksi", df['invoice_number'])
+    if transaction_id:
+        tampilkan_detail_transaksi(transaction_id)
+
+def tampilkan_detail_transaksi(transaction_id):
+    """Tampilkan detail item satu transaksi"""
+    transaction_items = dapatkan_item_transaksi(transaction_id)
+    
+    if transaction_items:
+        st.subheader(f"Detail Transaksi {transaction_id}")
+        st.write(pd.DataFrame(transaction_items))
+        # Cetak ulang struk dari riwayat
+        with st.expander("Struk"):
+            show_receipt(transaction_id)
     else:
-        st.write(df)
-        
-        # Pilih transaksi untuk melihat detail
-        transaction_id = st.selectbox("Pilih Transaksi", df['invoice_number'])
-        
-        if transaction_id:
-            # Tampilkan detail transaksi berdasarkan ID
-            query_details = '''
-            SELECT ti.product_id, p.name, ti.quantity, ti.price_per_unit, ti.subtotal
-            FROM transaction_items ti
-            JOIN products p ON ti.product_id = p.id
-            WHERE ti.transaction_id = ?
-            '''
-            conn = get_db_connection()
-            transaction_items = pd.read_sql_query(query_details, conn, params=(transaction_id,))
-            conn.close()
-            
-            if not transaction_items.empty:
-                st.subheader(f"Detail Transaksi {transaction_id}")
-                st.write(transaction_items)
-            else:
-                st.info(f"Tidak ada detail transaksi untuk {transaction_id}")
+        st.info(f"Tidak ada detail transaksi untuk {transaction_id}")
 
 def pos_interface():
     """Antarmuka untuk Point of Sale"""
     st.title("Point of Sale")
 
-    # Pastikan 'keranjang' ada di session state
-    if 'keranjang' not in st.session_state:
-        st.session_state.keranjang = []
+    keranjang = dapatkan_keranjang()
 
-    # Form untuk memilih produk
-    produk_id = st.number_input("ID Produk", min_value=1, step=1)
+    # Pencarian produk (typeahead dari indeks in-memory)
+    kueri = st.text_input("Cari Produk (nama, barcode, atau kode)", key="pos_cari_produk")
+    saran = cari_produk_typeahead(kueri) if kueri else []
+    produk_id = None
+    if saran:
+        pilihan = st.selectbox(
+            "Produk",
+            options=range(len(saran)),
+            format_func=lambda i: f"{saran[i]['name']} - Rp {saran[i]['price']:,.0f} (kode {saran[i]['id']})"
+        )
+        produk_id = saran[pilihan]['id']
+    elif kueri:
+        st.info("Produk tidak ditemukan.")
     jumlah = st.number_input("Jumlah", min_value=1, step=1)
 
     # Tombol untuk menambah produk ke keranjang
-    if st.button("Tambahkan ke Keranjang"):
-        produk = ambil_produk_berdasarkan_id(produk_id)
-
-        if produk:
-            if produk["stock"] >= jumlah:
-                subtotal = produk["price"] * jumlah
-                st.session_state.keranjang.append({
-                    "id": produk["id"],
-                    "name": produk["name"],
-                    "quantity": jumlah,
-                    "price": produk["price"],
-                    "subtotal": subtotal
-                })
-                st.success(f"{produk['name']} berhasil ditambahkan ke keranjang.")
-            else:
-                st.warning("Stok tidak cukup.")
-        else:
-            st.error("Produk tidak ditemukan.")
+    if st.button("Tambahkan ke Keranjang", disabled=produk_id is None):
+        if tambah_ke_keranjang(produk_id, jumlah):
+            st.success(f"{keranjang.produk[produk_id]['name']} berhasil ditambahkan ke keranjang.")
     
     # Menampilkan keranjang belanja
-    if "keranjang" in st.session_state and st.session_state.keranjang:
+    if keranjang:
         st.subheader("Keranjang Belanja")
-        for item in st.session_state.keranjang:
-            st.write(f"**{item['name']}** x {item['quantity']} - Rp {item['subtotal']:,.0f}")
+        pelanggan = pilih_pelanggan()
+        member = bool(pelanggan and pelanggan['member_code'])
+        baris_harga, total = dapatkan_harga_keranjang(member)
+        for item in baris_harga:
+            col1, col2, col3, col4 = st.columns([4, 2, 2, 1])
+            with col1:
+                st.write(f"**{item['name']}** @ Rp {item['price']:,.0f}")
+            with col2:
+                jumlah_baru = st.number_input(
+                    "Jumlah", min_value=0, value=item['quantity'], step=1,
+                    key=f"jumlah_{item['id']}", label_visibility="collapsed"
+                )
+                if jumlah_baru != item['quantity']:
+                    perbarui_item_keranjang(item['id'], jumlah_baru)
+            with col3:
+                if item['discount_amount']:
+                    st.write(f"~~Rp {item['subtotal']:,.0f}~~ Rp {item['subtotal'] - item['discount_amount']:,.0f}")
+                    st.caption(item['promotion_name'])
+                else:
+                    st.write(f"Rp {item['subtotal']:,.0f}")
+            with col4:
+                if st.button("✕", key=f"hapus_{item['id']}"):
+                    hapus_dari_keranjang(item['id'])
+                    st.rerun()
         
-        total = sum(item['subtotal'] for item in st.session_state.keranjang)
         st.write(f"**Total: Rp {total:,.0f}**")
 
-        # Tombol untuk memproses transaksi
-        if st.button("Proses Transaksi"):
-            if total > 0:
-                st.session_state.keranjang = []
-                st.success("Transaksi berhasil diproses.")
-            else:
-                st.warning("Keranjang belanja kosong.")
+        # Pembayaran
+        if pelanggan:
+            nama_pelanggan = pelanggan['name']
+        else:
+            nama_pelanggan = st.text_input("Nama Pelanggan (Opsional)")
+        metode_pembayaran = st.selectbox("Metode Pembayaran", METODE_PEMBAYARAN)
+        jumlah_pembayaran = st.number_input("Jumlah Pembayaran (Rp)", min_value=0.0, value=float(total), step=1000.0)
+
+        # Tombol untuk memproses atau membatalkan transaksi
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Proses Transaksi", type="primary"):
+                hasil = proses_transaksi(
+                    nama_pelanggan, metode_pembayaran, jumlah_pembayaran, member,
+                    pelanggan['id'] if pelanggan else None
+                )
+                if hasil:
+                    st.session_state.pop('pos_pelanggan', None)
+                if hasil and hasil.get('offline'):
+                    st.warning(
+                        f"Database sedang tidak tersedia. Transaksi {hasil['id_transaksi']} disimpan "
+                        f"di jurnal lokal dan akan dicatat otomatis. Kembalian: Rp {hasil['kembalian']:,.0f}"
+                    )
+                elif hasil:
+                    st.success(f"Transaksi berhasil diproses. Kembalian: Rp {hasil['kembalian']:,.0f}")
+                    # Disimpan di sesi: tombol cetak memicu rerun tanpa tombol proses
+                    st.session_state.pos_struk_terakhir = hasil['id_transaksi']
+        with col2:
+            if st.button("Batalkan Transaksi"):
+                bersihkan_keranjang()
+                st.rerun()
+
+    # Struk transaksi terakhir tetap tampil (dan bisa dicetak) sampai ditutup
+    invoice_terakhir = st.session_state.get('pos_struk_terakhir')
+    if invoice_terakhir:
+        show_receipt(invoice_terakhir)
+        if st.button("Tutup Struk", key="pos_tutup_struk"):
+            st.session_state.pop('pos_struk_terakhir')
+            st.rerun()
 
-def hasilkan_id_transaksi():
-    """Menghasilkan ID transaksi unik dengan awalan timestamp"""
-    timestamp = datetime.now().strftime("%Y%m%d")
-    id_unik = str(uuid.uuid4()).split('-')[0]
-    return f"TRX-{timestamp}-{id_unik}"
+@st.cache_resource(show_spinner=False)
+def get_generator_invoice():
+    """Generator nomor invoice bersama untuk seluruh sesi di terminal ini"""
+    return GeneratorInvoice()
+
+def dapatkan_keranjang():
+    """Ambil keranjang sesi ini (dibuat bila belum ada)"""
+    if not isinstance(st.session_state.get('keranjang'), Keranjang):
+        st.session_state.keranjang = Keranjang()
+    return st.session_state.keranjang
 
 def tambah_ke_keranjang(id_produk, jumlah):
     """Menambahkan produk ke keranjang belanja"""
-    if 'keranjang' not in st.session_state:
-        st.session_state.keranjang = []
-    
-    produk = ambil_produk_berdasarkan_id(id_produk)
-    
-    if not produk:
-        st.error("Produk tidak ditemukan.")
-        return False
-    
-    if produk['stok'] < jumlah:
-        st.error(f"Stok tidak mencukupi. Tersedia: {produk['stok']}")
+    try:
+        get_layanan_checkout().tambah(dapatkan_keranjang(), id_produk, jumlah)
+    except CheckoutError as e:
+        st.error(str(e))
         return False
-    
-    # Periksa apakah produk sudah ada di keranjang
-    for item in st.session_state.keranjang:
-        if item['id_produk'] == id_produk:
-            item['jumlah'] += jumlah
-            item['subtotal'] = item['jumlah'] * item['harga']
-            return True
-    
-    # Tambahkan item baru ke keranjang
-    st.session_state.keranjang.append({
-        'id_produk': id_produk,
-        'nama': produk['nama'],
-        'harga': produk['harga'],
-        'jumlah': jumlah,
-        'subtotal': produk['harga'] * jumlah
-    })
     return True
 
-def perbarui_item_keranjang(indeks, jumlah):
+def perbarui_item_keranjang(id_produk, jumlah):
     """Memperbarui jumlah item di keranjang"""
-    if 'keranjang' not in st.session_state or indeks >= len(st.session_state.keranjang):
-        return False
-    
-    item = st.session_state.keranjang[indeks]
-    produk = ambil_produk_berdasarkan_id(item['id_produk'])
-    
-    if produk['stok'] < jumlah:
-        st.error(f"Stok tidak mencukupi. Tersedia: {produk['stok']}")
+    try:
+        get_layanan_checkout().ubah_jumlah(dapatkan_keranjang(), id_produk, jumlah)
+    except CheckoutError as e:
+        st.error(str(e))
         return False
-    
-    item['jumlah'] = jumlah
-    item['subtotal'] = jumlah * item['harga']
     return True
 
-def hapus_dari_keranjang(indeks):
+def hapus_dari_keranjang(id_produk):
     """Menghapus item dari keranjang"""
-    if 'keranjang' in st.session_state and indeks < len(st.session_state.keranjang):
-        st.session_state.keranjang.pop(indeks)
-        return True
-    return False
+    return get_layanan_checkout().hapus(dapatkan_keranjang(), id_produk)
 
 def bersihkan_keranjang():
-    """Menghapus semua item dari keranjang"""
-    if 'keranjang' in st.session_state:
-        st.session_state.keranjang = []
+    """Menghapus semua item dari keranjang (dan melepas reservasinya)"""
+    get_layanan_checkout().batalkan(dapatkan_keranjang())
 
 def dapatkan_total_keranjang():
-    """Menghitung total jumlah semua item di keranjang"""
-    if 'keranjang' not in st.session_state or not st.session_state.keranjang:
-        return 0
-    return sum(item['subtotal'] for item in st.session_state.keranjang)
+    """Total keranjang (dipelihara inkremental oleh Keranjang)"""
+    return dapatkan_keranjang().total
+
+def dapatkan_harga_keranjang(member=False):
+    """Baris keranjang setelah promosi dan total neto"""
+    keranjang = dapatkan_keranjang()
+    try:
+        return get_layanan_checkout().hitung_harga(keranjang, member)
+    except sqlite3.OperationalError:
+        return MesinPromosi().hitung(keranjang.items())
+
+def pilih_pelanggan():
+    """Autocomplete pelanggan (nama, HP, kode member); mengembalikan pelanggan terpilih atau None"""
+    pelanggan = st.session_state.get('pos_pelanggan')
+    if pelanggan:
+        col1, col2 = st.columns([5, 1])
+        with col1:
+            label_member = f" · Member {pelanggan['member_code']}" if pelanggan['member_code'] else ""
+            st.write(f"Pelanggan: **{pelanggan['name']}** {pelanggan['phone'] or ''}{label_member}")
+        with col2:
+            if st.button("Ganti", key="pos_ganti_pelanggan"):
+                st.session_state.pop('pos_pelanggan')
+                st.rerun()
+        with st.expander("Riwayat Pembelian"):
+            with get_db_connection().get_cursor() as cursor:
+                riwayat = riwayat_pembelian(cursor, pelanggan['id'])
+            if riwayat:
+                st.dataframe(pd.DataFrame(riwayat), use_container_width=True, hide_index=True)
+            else:
+                st.caption("Belum ada pembelian.")
+        return pelanggan
+
+    kueri = st.text_input("Cari Pelanggan (nama, nomor HP, atau kode member)", key="pos_cari_pelanggan")
+    saran = cari_pelanggan_typeahead(kueri) if kueri else []
+    if saran:
+        pilihan = st.selectbox(
+            "Pelanggan", options=range(len(saran)),
+            format_func=lambda i: f"{saran[i]['name']} - {saran[i]['phone'] or '-'}"
+                                  + (f" (member {saran[i]['member_code']})" if saran[i]['member_code'] else "")
+        )
+        if st.button("Pilih Pelanggan"):
+            st.session_state.pos_pelanggan = saran[pilihan]
+            st.rerun()
+    elif kueri:
+        st.caption("Pelanggan tidak ditemukan.")
+
+    with st.expander("Pelanggan Baru"):
+        with st.form("form_pelanggan_baru", clear_on_submit=True):
+            nama = st.text_input("Nama")
+            telepon = st.text_input("Nomor HP")
+            kode_member = st.text_input("Kode Member (opsional)")
+            if st.form_submit_button("Simpan Pelanggan"):
+                if not nama.strip():
+                    st.error("Nama pelanggan wajib diisi.")
+                else:
+                    try:
+                        with get_db_connection().get_cursor() as cursor:
+                            customer_id = simpan_pelanggan(cursor, nama, telepon, kode_member)
+                    except sqlite3.IntegrityError:
+                        st.error("Nomor HP atau kode member sudah terdaftar.")
+                    else:
+                        perbarui_indeks_pelanggan(customer_id)
+                        st.session_state.pos_pelanggan = get_layanan_checkout().pelanggan(customer_id)
+                        st.rerun()
+    return None
+
+HARI = ["Senin", "Selasa", "Rabu", "Kamis", "Jumat", "Sabtu", "Minggu"]
+
+def promotion_management():
+    """Kelola aturan promosi (diskon, beli X gratis Y, happy hour, harga member)"""
+    st.title("Promosi")
+    conn = get_db_connection()
+
+    with st.expander("Tambah Promosi", expanded=False):
+        with st.form("form_promosi", clear_on_submit=True):
+            nama = st.text_input("Nama Promosi")
+            col1, col2 = st.columns(2)
+            with col1:
+                jenis = st.selectbox("Jenis", list(JENIS_PROMOSI), format_func=JENIS_PROMOSI.get)
+                nilai = st.number_input(
+                    "Nilai (persen / potongan Rp / harga khusus Rp)", min_value=0.0, step=500.0
+                )
+                beli = st.number_input("Beli (X)", min_value=1, value=2, step=1)
+                gratis = st.number_input("Gratis (Y)", min_value=1, value=1, step=1)
+            with col2:
+                cakupan = st.selectbox("Berlaku untuk", list(CAKUPAN_PROMOSI), format_func=CAKUPAN_PROMOSI.get)
+                product_id = st.number_input("ID Produk (cakupan produk)", min_value=0, step=1)
+                kategori = st.text_input("Kategori (cakupan kategori)")
+                prioritas = st.number_input("Prioritas", value=0, step=1)
+            hanya_member = st.checkbox("Hanya untuk member")
+            hari = st.multiselect("Hari (kosong = setiap hari)", range(7), format_func=lambda h: HARI[h])
+            pakai_jam = st.checkbox("Batasi jam (happy hour)")
+            col1, col2 = st.columns(2)
+            with col1:
+                jam_mulai = st.time_input("Jam Mulai", value=None)
+                tanggal_mulai = st.date_input("Mulai Tanggal", value=None)
+            with col2:
+                jam_akhir = st.time_input("Jam Selesai", value=None)
+                tanggal_akhir = st.date_input("Sampai Tanggal", value=None)
+
+            if st.form_submit_button("Simpan Promosi"):
+                if not nama:
+                    st.error("Nama promosi wajib diisi.")
+                elif cakupan == 'produk' and not product_id:
+                    st.error("Isi ID produk untuk promosi satu produk.")
+                elif cakupan == 'kategori' and not kategori:
+                    st.error("Isi kategori untuk promosi satu kategori.")
+                elif pakai_jam and (jam_mulai is None or jam_akhir is None):
+                    st.error("Isi jam mulai dan jam selesai.")
+                else:
+                    conn.insert('promotions', {
+                        'name': nama,
+                        'promo_type': jenis,
+                        'scope': cakupan,
+                        'product_id': int(product_id) if cakupan == 'produk' else None,
+                        'category': kategori if cakupan == 'kategori' else None,
+                        'value': nilai,
+                        'buy_qty': int(beli) if jenis == 'beli_gratis' else None,
+                        'free_qty': int(gratis) if jenis == 'beli_gratis' else None,
+                        'members_only': int(hanya_member),
+                        'start_time': jam_mulai.strftime("%H:%M") if pakai_jam else None,
+                        'end_time': jam_akhir.strftime("%H:%M") if pakai_jam else None,
+                        'days': "".join(str(h) for h in sorted(hari)) or None,
+                        'starts_at': tanggal_mulai.strftime("%Y-%m-%d") if tanggal_mulai else None,
+                        'ends_at': tanggal_akhir.strftime("%Y-%m-%d") if tanggal_akhir else None,
+                        'priority': int(prioritas),
+                    })
+                    st.success(f"Promosi {nama} disimpan.")
+
+    promosi = conn.execute_query(f"SELECT {KOLOM_PROMOSI}, active FROM promotions ORDER BY active DESC, priority DESC, id") or []
+    if not promosi:
+        st.info("Belum ada promosi.")
+        return
+
+    st.dataframe(pd.DataFrame(promosi), use_container_width=True, hide_index=True)
+    pilihan = st.selectbox(
+        "Pilih Promosi", options=range(len(promosi)),
+        format_func=lambda i: f"#{promosi[i]['id']} {promosi[i]['name']} ({'aktif' if promosi[i]['active'] else 'nonaktif'})"
+    )
+    terpilih = promosi[pilihan]
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("Nonaktifkan" if terpilih['active'] else "Aktifkan"):
+            conn.update('promotions', {'active': 0 if terpilih['active'] else 1}, "id = ?", (terpilih['id'],))
+            st.rerun()
+    with col2:
+        if st.button("Hapus Promosi"):
+            conn.delete('promotions', "id = ?", (terpilih['id'],))
+            st.rerun()
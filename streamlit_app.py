@@ -5,8 +5,10 @@ import os
 # Mengimpor fungsi-fungsi yang diperlukan dari modul
 from modules.auth import init_auth, login_form, logout, user_management
 from modules.database import init_database
-from modules.products import get_low_stock_products, product_management
-from modules.transactions import pos_interface, transaction_history
+from modules.products import get_low_stock_alerts, product_management
+from modules.transactions import (
+    get_hook_checkout, get_pemutar_jurnal, pos_interface, promotion_management, transaction_history
+)
 from modules.reports import reports_dashboard
 
 # Konfigurasi Halaman
@@ -20,6 +22,7 @@ st.set_page_config(
 # Inisialisasi database dan otentikasi
 init_database()
 init_auth()  # Fungsi ini menginisialisasi otentikasi, termasuk membuat tabel pengguna jika perlu
+get_pemutar_jurnal()  # Memutar ulang penjualan offline yang tertunda di jurnal lokal
 
 # Cek apakah pengguna sudah login
 if "authenticated" not in st.session_state:
@@ -36,7 +39,7 @@ else:
     # Navigasi
     halaman = st.sidebar.radio(
         "Navigasi",
-        ["Point of Sale", "Produk", "Transaksi", "Laporan", "Manajemen Pengguna"]
+        ["Point of Sale", "Produk", "Transaksi", "Promosi", "Laporan", "Manajemen Pengguna"]
     )
     
      # Konten berdasarkan halaman yang dipilih
@@ -49,6 +52,12 @@ else:
     elif halaman == "Transaksi":
         transaction_history()
     
+    elif halaman == "Promosi":
+        if st.session_state.user.get("role") == "admin":
+            promotion_management()
+        else:
+            st.warning("Anda tidak memiliki izin untuk mengelola Promosi")
+    
     elif halaman == "Laporan":
         reports_dashboard()
     
@@ -58,17 +67,36 @@ else:
         else:
             st.warning("Anda tidak memiliki izin untuk mengakses Manajemen Pengguna")
     
+    pemutar = get_pemutar_jurnal()
+    tertunda = pemutar.jurnal.jumlah_tertunda()
+    if tertunda:
+        st.sidebar.warning(f"{tertunda} transaksi offline menunggu dicatat ke database.")
+    gagal = pemutar.jurnal.jumlah_gagal()
+    if gagal:
+        st.sidebar.error(
+            f"{gagal} transaksi offline gagal dicatat dan dipindah ke {pemutar.jurnal.path_gagal}. "
+            f"{pemutar.error_terakhir or ''}"
+        )
+
     # Tombol logout
     if st.sidebar.button("Logout"):
         logout()
 
     # Opsional - Tampilkan peringatan stok rendah untuk pengguna admin
     if st.session_state.user.get("role") == "admin":
-        low_stock_df = get_low_stock_products(threshold=10)
+        # Dibaca dari set stok rendah yang dipelihara trigger, bukan scan seluruh produk
+        stok_rendah = get_low_stock_alerts()
         
-        if not low_stock_df.empty:
-            with st.sidebar.expander("⚠️ Peringatan Stok Menipis"):
-                st.warning(f"{len(low_stock_df)} produk dengan stok rendah!")
-                
-                for index, product in low_stock_df.iterrows():
-                    st.write(f"**{product['name']}**: {product['stock']} tersisa")
+        if stok_rendah:
+            with st.sidebar.expander(f"⚠️ Peringatan Stok Menipis ({len(stok_rendah)})"):
+                st.warning(f"{len(stok_rendah)} produk dengan stok rendah!")
+                st.markdown("\n".join(
+                    f"- **{product['name']}**: {product['stock']} tersisa (min. {product['reorder_level']})"
+                    for product in stok_rendah
+                ))
+
+        with st.sidebar.expander("Hook Pasca-Checkout"):
+            st.dataframe(
+                pd.DataFrame.from_dict(get_hook_checkout().metrik(), orient="index"),
+                use_container_width=True
+            )
@@ -0,0 +1,25 @@
+from contextlib import contextmanager
+
+import pytest
+
+from modules.schema import init_schema, open_connection
+
+
+@pytest.fixture
+def db(tmp_path):
+    """Database SQLite baru dengan skema lengkap"""
+    connection = open_connection(str(tmp_path / "pos.db"))
+    with connection:
+        init_schema(connection.cursor())
+    yield connection
+    connection.close()
+
+
+@pytest.fixture
+def buka_cursor(db):
+    """Pembuka cursor ala DatabaseConnection.get_cursor di atas fixture `db`"""
+    @contextmanager
+    def buka():
+        with db:
+            yield db.cursor()
+    return buka
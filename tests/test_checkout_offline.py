@@ -0,0 +1,77 @@
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+
+from modules.checkout import CheckoutError, LayananCheckout, validasi_penjualan
+
+
+class JurnalDaftar:
+    def __init__(self):
+        self.entri = []
+
+    def tulis(self, entri):
+        self.entri.append(entri)
+
+
+@pytest.fixture
+def layanan(db, buka_cursor):
+    with db:
+        db.execute("INSERT INTO products (id, name, price, stock, category) VALUES (1, 'Kopi', 5000, 10, 'Minuman')")
+        db.execute("INSERT INTO customers (id, name, member_code) VALUES (7, 'Budi', 'M7')")
+    status = {'terkunci': False}
+
+    @contextmanager
+    def buka():
+        if status['terkunci']:
+            raise sqlite3.OperationalError("database is locked")
+        with buka_cursor() as cursor:
+            yield cursor
+
+    layanan = LayananCheckout(buka, jurnal=JurnalDaftar())
+    layanan.status = status
+    return layanan
+
+
+def keranjang_terisi(layanan, jumlah=2):
+    keranjang = layanan.buat_keranjang()
+    layanan.tambah(keranjang, product_id=1, jumlah=jumlah)
+    layanan.hitung_harga(keranjang)  # mengompilasi mesin promosi selagi database tersedia
+    return keranjang
+
+
+def test_validasi_penjualan():
+    baris = [{'id': 1, 'name': "Kopi", 'price': 5000, 'quantity': 2, 'subtotal': 10000, 'discount_amount': 1000}]
+    assert validasi_penjualan(baris, 9000) == (9000, 1000)
+    with pytest.raises(CheckoutError):
+        validasi_penjualan(baris, 8999)
+    with pytest.raises(CheckoutError):
+        validasi_penjualan([], 0)
+    for rusak in ({'quantity': 0, 'subtotal': 0}, {'subtotal': 1}, {'discount_amount': 20000}, {'id': None}):
+        with pytest.raises(CheckoutError):
+            validasi_penjualan([dict(baris[0], **rusak)], 10 ** 6)
+
+
+def test_offline_sale_is_journaled(layanan):
+    keranjang = keranjang_terisi(layanan)
+    layanan.status['terkunci'] = True
+    hasil = layanan.checkout(keranjang, "Tunai", 12000, cashier_id=1)
+    assert hasil['offline'] and hasil['total'] == 10000 and hasil['kembalian'] == 2000
+    assert len(layanan.jurnal.entri) == 1
+
+
+def test_underpaid_offline_sale_is_rejected(layanan):
+    keranjang = keranjang_terisi(layanan)
+    layanan.status['terkunci'] = True
+    with pytest.raises(CheckoutError):
+        layanan.checkout(keranjang, "Tunai", 9000, cashier_id=1)
+    assert layanan.jurnal.entri == []
+    assert keranjang.total == 10000  # keranjang tetap ada untuk dibayar ulang
+
+
+def test_offline_sale_with_unreadable_customer_is_rejected(layanan):
+    keranjang = keranjang_terisi(layanan)
+    layanan.status['terkunci'] = True
+    with pytest.raises(CheckoutError):
+        layanan.checkout(keranjang, "Tunai", 10000, cashier_id=1, customer_id=7)
+    assert layanan.jurnal.entri == []
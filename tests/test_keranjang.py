@@ -0,0 +1,56 @@
+import pytest
+
+from modules.checkout import CheckoutError, Keranjang
+
+
+def produk(id, price, stock=10, name=None):
+    return {'id': id, 'name': name or f"Produk {id}", 'price': price, 'stock': stock, 'category': "Umum"}
+
+
+def test_same_product_merges_into_one_line():
+    keranjang = Keranjang()
+    keranjang.tambah(produk(1, 2500))
+    keranjang.tambah(produk(1, 2500), 2)
+    keranjang.tambah(produk(2, 1000))
+    assert len(keranjang) == 2
+    assert keranjang.jumlah(1) == 3
+    assert [(b['id'], b['quantity'], b['subtotal']) for b in keranjang.items()] == [(1, 3, 7500), (2, 1, 1000)]
+
+
+def test_running_total_follows_every_change():
+    keranjang = Keranjang()
+    keranjang.tambah(produk(1, 2500), 2)
+    keranjang.tambah(produk(2, 1000), 3)
+    assert keranjang.total == 8000
+    keranjang.ubah_jumlah(1, 1)
+    assert keranjang.total == 5500
+    keranjang.ubah_jumlah(2, 0)
+    assert keranjang.total == 2500 and 2 not in keranjang
+    keranjang.hapus(1)
+    assert keranjang.total == 0 and not keranjang
+    assert keranjang.total == sum(b['subtotal'] for b in keranjang.items())
+
+
+def test_price_is_snapshotted_on_first_add():
+    keranjang = Keranjang()
+    keranjang.tambah(produk(1, 2500))
+    keranjang.tambah(produk(1, 9999))
+    assert keranjang.items()[0]['price'] == 2500
+    assert keranjang.total == 5000
+
+
+def test_stock_check_rejects_without_changing_the_line():
+    keranjang = Keranjang()
+    keranjang.tambah(produk(1, 1000, stock=2), 2)
+    with pytest.raises(CheckoutError):
+        keranjang.tambah(produk(1, 1000, stock=2))
+    assert keranjang.jumlah(1) == 2 and keranjang.total == 2000
+    keranjang.tambah(produk(1, 1000, stock=2), periksa_stok=False)
+    assert keranjang.jumlah(1) == 3
+
+
+def test_kosongkan():
+    keranjang = Keranjang()
+    keranjang.tambah(produk(1, 1000))
+    keranjang.kosongkan()
+    assert not keranjang and keranjang.total == 0 and keranjang.produk == {}
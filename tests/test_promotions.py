@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from modules.promotions import MesinPromosi
+
+SENIN_SIANG = datetime(2026, 10, 19, 12, 30)
+
+
+def promosi(id, promo_type, value, scope='produk', product_id=None, category=None, **kolom):
+    row = {
+        'id': id, 'name': f"Promo {id}", 'promo_type': promo_type, 'scope': scope,
+        'product_id': product_id, 'category': category, 'value': value,
+        'buy_qty': None, 'free_qty': None, 'members_only': 0, 'start_time': None, 'end_time': None,
+        'days': None, 'starts_at': None, 'ends_at': None, 'priority': 0,
+    }
+    row.update(kolom)
+    return row
+
+
+def baris(id, price, quantity, category="Minuman"):
+    return {'id': id, 'name': f"Produk {id}", 'category': category,
+            'price': price, 'quantity': quantity, 'subtotal': price * quantity}
+
+
+def promosi_terpilih(mesin, items, **kwargs):
+    hasil, _ = mesin.hitung(items, SENIN_SIANG, **kwargs)
+    return {b['id']: (b['promotion_id'], b['discount_amount']) for b in hasil}
+
+
+def test_best_product_promotion_wins():
+    mesin = MesinPromosi([
+        promosi(1, 'persen', 10, product_id=1),
+        promosi(2, 'potongan', 1500, product_id=1),
+        promosi(3, 'beli_gratis', 0, product_id=1, buy_qty=2, free_qty=1),
+    ])
+    # 3 x 5000: 10% = 1500, potongan = 4500, beli 2 gratis 1 = 5000
+    assert promosi_terpilih(mesin, [baris(1, 5000, 3)]) == {1: (3, 5000)}
+    # 2 x 5000: beli 2 gratis 1 belum berlaku
+    assert promosi_terpilih(mesin, [baris(1, 5000, 2)]) == {1: (2, 3000)}
+
+
+def test_category_and_product_promotions_compete():
+    mesin = MesinPromosi([
+        promosi(1, 'persen', 5, product_id=1),
+        promosi(2, 'persen', 20, scope='kategori', category="Minuman"),
+        promosi(3, 'persen', 50, scope='kategori', category="Makanan"),
+    ])
+    hasil = promosi_terpilih(mesin, [baris(1, 10000, 1), baris(2, 10000, 1), baris(3, 10000, 1, "Sabun")])
+    assert hasil == {1: (2, 2000), 2: (2, 2000), 3: (None, 0)}
+
+
+def test_priority_beats_larger_discount():
+    mesin = MesinPromosi([
+        promosi(1, 'persen', 50, scope='semua'),
+        promosi(2, 'persen', 10, product_id=1, priority=1),
+    ])
+    assert promosi_terpilih(mesin, [baris(1, 10000, 1), baris(2, 10000, 1)]) == {1: (2, 1000), 2: (1, 5000)}
+
+
+def test_members_only_and_time_window():
+    mesin = MesinPromosi([
+        promosi(1, 'persen', 30, product_id=1, members_only=1),
+        promosi(2, 'harga_khusus', 8000, product_id=2, start_time="17:00", end_time="19:00"),
+    ])
+    items = [baris(1, 10000, 1), baris(2, 10000, 1)]
+    assert promosi_terpilih(mesin, items) == {1: (None, 0), 2: (None, 0)}
+    assert promosi_terpilih(mesin, items, member=True)[1] == (1, 3000)
+    hasil, _ = mesin.hitung(items, SENIN_SIANG.replace(hour=18))
+    assert hasil[1]['discount_amount'] == 2000
+
+
+def test_total_is_net_and_discount_capped_at_subtotal():
+    mesin = MesinPromosi([promosi(1, 'potongan', 99999, product_id=1)])
+    hasil, total = mesin.hitung([baris(1, 4000, 2), baris(2, 1000, 3)], SENIN_SIANG)
+    assert hasil[0]['discount_amount'] == 8000
+    assert total == 3000
@@ -0,0 +1,75 @@
+from datetime import date, datetime, timedelta
+
+import pandas as pd
+
+from modules.report_engine import CacheLaporan, kunci_validasi, watermark_laporan
+
+HARI_INI = date.today().isoformat()
+KEMARIN = (date.today() - timedelta(days=1)).isoformat()
+
+
+def penjualan(db, invoice, tanggal):
+    with db:
+        db.execute("""
+            INSERT INTO transactions (invoice_number, total_amount, payment_amount, payment_method, cashier_id, created_at)
+            VALUES (?, 1000, 1000, 'Tunai', 1, ?)
+        """, (invoice, tanggal))
+
+
+class Penghitung:
+    def __init__(self):
+        self.panggilan = 0
+
+    def __call__(self):
+        self.panggilan += 1
+        return pd.DataFrame({'n': [self.panggilan]})
+
+
+def ambil(cache, db, tanggal_akhir, hitung):
+    validasi = kunci_validasi(tanggal_akhir, watermark_laporan(db))
+    return cache.ambil(("ringkasan", "2026-01-01", tanggal_akhir, ()), validasi, hitung)
+
+
+def test_kunci_validasi_closed_range_ignores_new_sales():
+    assert kunci_validasi("2026-10-18", (10, 3), hari_ini="2026-10-19") == (3,)
+    assert kunci_validasi("2026-10-18", (11, 3), hari_ini="2026-10-19") == (3,)
+    assert kunci_validasi("2026-10-19", (11, 3), hari_ini="2026-10-19") == (3, 11)
+
+
+def test_closed_range_survives_todays_sales_but_not_backdated_ones(db):
+    cache, hitung = CacheLaporan(), Penghitung()
+    ambil(cache, db, KEMARIN, hitung)
+    penjualan(db, "A", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    ambil(cache, db, KEMARIN, hitung)
+    assert hitung.panggilan == 1
+
+    # Penjualan bertanggal lampau (jurnal offline, sinkronisasi) menaikkan versi
+    penjualan(db, "B", f"{KEMARIN} 10:00:00")
+    assert ambil(cache, db, KEMARIN, hitung)['n'][0] == 2
+    assert cache.statistik()['hit'] == 1 and cache.statistik()['miss'] == 2
+
+
+def test_open_range_invalidated_by_every_sale(db):
+    cache, hitung = CacheLaporan(), Penghitung()
+    ambil(cache, db, HARI_INI, hitung)
+    ambil(cache, db, HARI_INI, hitung)
+    assert hitung.panggilan == 1
+    penjualan(db, "A", datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+    ambil(cache, db, HARI_INI, hitung)
+    assert hitung.panggilan == 2
+
+
+def test_lru_bounded_by_entries_and_bytes():
+    cache = CacheLaporan(maks_entri=2)
+    for kunci in ("a", "b", "a", "c"):
+        cache.ambil(kunci, (0,), lambda: kunci)
+    assert cache.statistik()['entri'] == 2
+    # "b" paling lama tidak dipakai saat "c" masuk, jadi dibuang
+    dihitung = []
+    for kunci in ("a", "c", "b"):
+        cache.ambil(kunci, (0,), lambda: dihitung.append(kunci))
+    assert dihitung == ["b"]
+
+    kecil = CacheLaporan(maks_bytes=10)
+    kecil.ambil("besar", (0,), lambda: "x" * 100)
+    assert kecil.statistik() == {'entri': 0, 'bytes': 0, 'hit': 0, 'miss': 1}
@@ -0,0 +1,79 @@
+import pytest
+
+from modules.checkout import simpan_checkout
+from modules.schema import rebuild_sales_rollups
+
+PRODUK = {
+    1: ('Kopi', 5000, 'Minuman'),
+    2: ('Roti', 8000, 'Makanan'),
+    3: ('Plastik', 500, None),
+}
+
+PENJUALAN = [
+    ('INV-1', '2026-10-17 08:15:00', 'Tunai', [(1, 2), (2, 1)], 0),
+    ('INV-2', '2026-10-17 08:45:00', 'QRIS', [(1, 1), (3, 3)], 0),
+    ('INV-3', '2026-10-17 19:05:00', 'Tunai', [(2, 4)], 2000),
+    ('INV-4', '2026-10-18 08:30:00', 'Tunai', [(3, 1), (1, 5)], 0),
+    ('INV-5', '2026-10-18 23:59:30', 'Debit', [(2, 2), (1, 1), (3, 2)], 500),
+]
+
+
+def isi_rollup(db, tabel):
+    return sorted(tuple(baris) for baris in db.execute(f"SELECT * FROM {tabel}"))
+
+
+@pytest.fixture
+def db_penjualan(db):
+    with db:
+        db.executemany(
+            "INSERT INTO products (id, name, price, stock, category) VALUES (?, ?, ?, 100, ?)",
+            [(id_, nama, harga, kategori or 'Lainnya') for id_, (nama, harga, kategori) in PRODUK.items()])
+    for invoice, tanggal, metode, baris, diskon in PENJUALAN:
+        items = []
+        for product_id, jumlah in baris:
+            nama, harga, kategori = PRODUK[product_id]
+            items.append({'id': product_id, 'name': nama, 'price': harga, 'quantity': jumlah,
+                          'subtotal': harga * jumlah, 'category': kategori})
+        items[0]['discount_amount'] = diskon
+        with db:
+            simpan_checkout(db.cursor(), items, invoice, metode, 100000, 1, tanggal=tanggal)
+    return db
+
+
+@pytest.mark.parametrize('tabel', ['sales_daily', 'sales_hourly'])
+def test_trigger_rollups_match_full_rebuild(db_penjualan, tabel):
+    dari_trigger = isi_rollup(db_penjualan, tabel)
+    assert dari_trigger
+
+    with db_penjualan:
+        rebuild_sales_rollups(db_penjualan.cursor())
+
+    assert isi_rollup(db_penjualan, tabel) == dari_trigger
+
+
+@pytest.mark.parametrize('tabel', ['sales_daily', 'sales_hourly'])
+def test_range_rebuild_matches_triggers_and_keeps_other_dates(db_penjualan, tabel):
+    dari_trigger = isi_rollup(db_penjualan, tabel)
+    with db_penjualan:
+        db_penjualan.execute(f"UPDATE {tabel} SET count = -1, amount = -1, qty = -1 WHERE date = '2026-10-18'")
+        rebuild_sales_rollups(db_penjualan.cursor(), '2026-10-18', '2026-10-18')
+
+    assert isi_rollup(db_penjualan, tabel) == dari_trigger
+
+
+def test_daily_rollup_totals(db_penjualan):
+    semua = {
+        (tanggal, metode): (count, amount, qty)
+        for tanggal, _, metode, count, amount, qty in db_penjualan.execute(
+            "SELECT date, category, payment_method, count, amount, qty FROM sales_daily WHERE category = '*'")
+    }
+    kopi = db_penjualan.execute(
+        "SELECT count, qty FROM sales_daily WHERE date = '2026-10-17' AND category = 'Minuman'"
+        " AND payment_method = 'Tunai'").fetchone()
+    tanpa_kategori = db_penjualan.execute(
+        "SELECT SUM(qty) FROM sales_daily WHERE category = ''").fetchone()[0]
+
+    assert semua[('2026-10-17', 'Tunai')][0] == 2
+    assert semua[('2026-10-17', 'Tunai')][2] == 7
+    assert tuple(kopi) == (1, 2)
+    assert tanpa_kategori == 6
@@ -0,0 +1,73 @@
+from modules import search
+from modules.search import IndeksPrefiks, kunci_produk
+
+
+def produk(id, name, barcode=None, price=1000):
+    return {'id': id, 'name': name, 'price': price, 'category': "Umum", 'barcode': barcode}
+
+
+def indeks_contoh():
+    indeks = IndeksPrefiks(kunci_produk)
+    indeks.muat((p['id'], p) for p in [
+        produk(1, "Kopi Susu", "8991001"),
+        produk(2, "Susu Kental Manis", "8991002"),
+        produk(3, "Teh Manis"),
+    ])
+    return indeks
+
+
+def ids(hasil):
+    return [p['id'] for p in hasil]
+
+
+def test_prefix_matches_start_of_each_word_barcode_and_id():
+    indeks = indeks_contoh()
+    assert ids(indeks.cari("kop")) == [1]
+    assert sorted(ids(indeks.cari("susu"))) == [1, 2]
+    assert sorted(ids(indeks.cari("  MANIS "))) == [2, 3]
+    assert sorted(ids(indeks.cari("89910"))) == [1, 2]
+    assert ids(indeks.cari("3")) == [3]
+    assert indeks.cari("usu") == []
+    assert indeks.cari("") == []
+
+
+def test_results_ordered_by_score_then_name():
+    indeks = indeks_contoh()
+    assert ids(indeks.cari("susu")) == [1, 2]
+    indeks.tambah_skor(2, 5)
+    assert ids(indeks.cari("susu")) == [2, 1]
+    indeks.atur_skor({1: 10})
+    assert ids(indeks.cari("susu")) == [1, 2]
+    assert ids(indeks.cari("susu", batas=1)) == [1]
+
+
+def test_upsert_replaces_keys_of_existing_entry():
+    indeks = indeks_contoh()
+    indeks.upsert(1, produk(1, "Kopi Hitam", "8991001", price=1500))
+    assert ids(indeks.cari("susu")) == [2]
+    assert ids(indeks.cari("hitam")) == [1]
+    assert indeks.cari("kopi")[0]['price'] == 1500
+    assert len(indeks) == 3
+
+    indeks.upsert(4, produk(4, "Kopi Susu Gula Aren"))
+    assert sorted(ids(indeks.cari("kopi"))) == [1, 4]
+    assert len(indeks) == 4
+
+
+def test_hapus_removes_entry_and_its_keys():
+    indeks = indeks_contoh()
+    indeks.hapus(2)
+    assert ids(indeks.cari("susu")) == [1]
+    assert ids(indeks.cari("89910")) == [1]
+    assert len(indeks) == 2
+    indeks.tambah_skor(2)  # entri yang sudah dihapus diabaikan
+    assert ids(indeks.cari("susu")) == [1]
+
+
+def test_dense_prefix_walks_ranking(monkeypatch):
+    monkeypatch.setattr(search, "BATAS_RENTANG", 4)
+    indeks = IndeksPrefiks(kunci_produk)
+    indeks.muat((i, produk(i, f"Roti {i:02d}")) for i in range(1, 21))
+    indeks.atur_skor({7: 3, 15: 2})
+    assert ids(indeks.cari("roti", batas=3)) == [7, 15, 1]
+    assert ids(indeks.cari("roti 1", batas=2)) == [15, 10]
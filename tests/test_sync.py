@@ -0,0 +1,150 @@
+import pytest
+
+from modules import sync
+from modules.checkout import simpan_checkout
+from modules.schema import init_schema, open_connection
+
+
+@pytest.fixture
+def jalur(tmp_path):
+    """Path database terminal dan pusat; pusat berisi katalog awal"""
+    terminal, pusat = str(tmp_path / "terminal.db"), str(tmp_path / "pusat.db")
+    conn = open_connection(pusat)
+    with conn:
+        cursor = conn.cursor()
+        init_schema(cursor)
+        cursor.executemany(
+            "INSERT INTO products (id, name, price, stock, category, barcode) VALUES (?, ?, ?, ?, ?, ?)",
+            [(1, "Kopi", 5000, 100, "Minuman", "B1"), (2, "Teh", 3000, 50, "Minuman", "B2")]
+        )
+    conn.close()
+    return terminal, pusat
+
+
+def query(path, sql, params=()):
+    conn = open_connection(path)
+    try:
+        return [tuple(row) for row in conn.execute(sql, params).fetchall()]
+    finally:
+        conn.close()
+
+
+def jual(path, invoice, product_id, jumlah, harga=5000):
+    conn = open_connection(path)
+    with conn:
+        simpan_checkout(
+            conn.cursor(),
+            [{'id': product_id, 'name': "x", 'price': harga, 'quantity': jumlah, 'subtotal': harga * jumlah}],
+            invoice, "Tunai", harga * jumlah, 1
+        )
+    conn.close()
+
+
+def test_push_pull_and_ack_by_seq(jalur):
+    terminal, pusat = jalur
+    statistik = sync.sinkronkan(terminal, pusat, "01")
+    assert statistik['produk'] == 2
+    assert query(terminal, "SELECT id, price, stock FROM products ORDER BY id") == [(1, 5000, 100), (2, 3000, 50)]
+
+    jual(terminal, "TRX-01-261019-00001", 1, 2)
+    jual(terminal, "TRX-01-261019-00002", 2, 1, harga=3000)
+    with open_connection(pusat) as conn:
+        conn.execute("UPDATE products SET price = 5500 WHERE id = 1")
+
+    statistik = sync.sinkronkan(terminal, pusat, "01")
+    assert statistik['transaksi'] == 2 and statistik['batch'] == 1
+    assert query(pusat, "SELECT invoice_number, total_amount FROM transactions ORDER BY invoice_number") == [
+        ("TRX-01-261019-00001", 10000), ("TRX-01-261019-00002", 3000)
+    ]
+    assert query(pusat, "SELECT id, stock FROM products ORDER BY id") == [(1, 98), (2, 49)]
+    assert query(terminal, "SELECT price, stock FROM products WHERE id = 1") == [(5500, 98)]
+
+    # Ack: log penjualan terminal dipangkas dan seq tercatat di kedua sisi
+    assert query(terminal, "SELECT COUNT(*) FROM change_log WHERE table_name = 'transactions'") == [(0,)]
+    terkirim, _ = query(terminal, "SELECT last_sent_seq, last_received_seq FROM sync_state WHERE peer = 'pusat'")[0]
+    assert query(pusat, "SELECT last_received_seq FROM sync_state WHERE peer = '01'") == [(terkirim,)]
+    assert sync.sinkronkan(terminal, pusat, "01")['transaksi'] == 0
+
+
+def test_lost_ack_resend_is_applied_once(jalur):
+    terminal, pusat = jalur
+    sync.sinkronkan(terminal, pusat, "01")
+    jual(terminal, "TRX-01-261019-00001", 1, 3)
+
+    t, p = open_connection(terminal), open_connection(pusat)
+    with t:
+        data = sync.ekspor_delta(t.cursor(), "01")
+    with p:
+        ack = sync.terapkan_delta(p.cursor(), data)
+    with p:
+        assert sync.terapkan_delta(p.cursor(), data) == ack  # ack hilang, paket dikirim ulang
+    with t:
+        sync.ack_delta(t.cursor(), ack)
+        assert sync.ekspor_delta(t.cursor(), "01") is None
+    t.close()
+    p.close()
+    assert query(pusat, "SELECT COUNT(*) FROM transactions") == [(1,)]
+    assert query(pusat, "SELECT stock FROM products WHERE id = 1") == [(97,)]
+
+
+def test_terminal_stock_is_central_minus_unsent_sales(jalur):
+    terminal, pusat = jalur
+    sync.sinkronkan(terminal, pusat, "01")
+    jual(terminal, "TRX-01-261019-00001", 1, 3)  # belum terkirim
+    with open_connection(pusat) as conn:
+        conn.execute("UPDATE products SET stock = stock + 10 WHERE id = 1")
+
+    t, p = open_connection(terminal), open_connection(pusat)
+    with p:
+        katalog = sync.ekspor_katalog(p.cursor(), "01")
+    with t:
+        sync.terapkan_katalog(t.cursor(), katalog)
+    t.close()
+    p.close()
+    assert query(pusat, "SELECT stock FROM products WHERE id = 1") == [(110,)]
+    assert query(terminal, "SELECT stock FROM products WHERE id = 1") == [(107,)]
+
+
+def test_conflicting_invoice_from_second_till_is_rejected(jalur, tmp_path):
+    terminal, pusat = jalur
+    kedua = str(tmp_path / "kedua.db")
+    sync.sinkronkan(terminal, pusat, "01")
+    sync.sinkronkan(kedua, pusat, "02")
+    # Till kedua lupa diberi POS_TERMINAL_ID sendiri: nomornya sama dengan till pertama
+    jual(terminal, "TRX-01-261019-00001", 1, 1)
+    jual(kedua, "TRX-01-261019-00001", 2, 2, harga=3000)
+
+    sync.sinkronkan(terminal, pusat, "01")
+    with pytest.raises(sync.SyncError):
+        sync.sinkronkan(kedua, pusat, "01")
+    with pytest.raises(sync.SyncError):
+        sync.sinkronkan(kedua, pusat, "02")  # awalan invoice bukan milik terminal 02
+    assert query(pusat, "SELECT invoice_number, total_amount FROM transactions") == [("TRX-01-261019-00001", 5000)]
+    assert query(pusat, "SELECT id, stock FROM products ORDER BY id") == [(1, 99), (2, 50)]
+
+
+def test_local_product_colliding_with_central_id_is_rejected(jalur):
+    terminal, pusat = jalur
+    conn = open_connection(terminal)
+    with conn:
+        init_schema(conn.cursor())
+        conn.execute("INSERT INTO products (id, name, price, stock, category) VALUES (2, 'Gula', 9000, 5, 'Dapur')")
+        assert not sync.adalah_terminal(conn.cursor())
+    conn.close()
+
+    with pytest.raises(sync.SyncError):
+        sync.sinkronkan(terminal, pusat, "01")
+    assert query(terminal, "SELECT name FROM products WHERE id = 2") == [("Gula",)]
+
+    with open_connection(terminal) as conn:
+        conn.execute("DELETE FROM products WHERE id = 2")
+    sync.sinkronkan(terminal, pusat, "01")
+    conn = open_connection(terminal)
+    assert sync.adalah_terminal(conn.cursor())
+    conn.close()
+    # Perubahan produk lokal tidak dipangkas oleh ack
+    with open_connection(terminal) as conn:
+        conn.execute("UPDATE products SET price = 1 WHERE id = 1")
+    jual(terminal, "TRX-01-261019-00001", 2, 1, harga=3000)
+    sync.sinkronkan(terminal, pusat, "01")
+    assert query(terminal, "SELECT table_name, row_id FROM change_log") == [("products", 1)]